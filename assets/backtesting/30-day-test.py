@@ -7,8 +7,10 @@ import datetime
 import json
 import os
 
-from components.prediction.prediction import make_predictions
-from components.preprocess.preprocess_data import preprocess_data
+from components.preprocess.as_of_features import build_as_of_features
+from components.backtesting.backtest_predictions import predict_backtest
+from components.backtesting.backtest_cache import prediction_matrix
+from components.backtesting.backtest_engine import load_price_matrix, run_backtest
 
 # Move file to main if run. 
 
@@ -85,164 +87,32 @@ commodity_scaler = MinMaxScaler()
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # suppress TensorFlow logs
 os.environ['KMP_AFFINITY'] = 'noverbose'  # suppress OpenMP logs
 
-# get all predictions 
-if os.path.exists(f"assets/backtesting/predictions.json"):
-    with open('assets/backtesting/predictions.json', 'r') as file:
-        predictions = json.load(file)
-        file.close()
-        
-else: 
-    predictions = {}
-
-    # Initialize the predictions dictionary
-    for company in company_names:
-        predictions[company] = {
-            "mean": [], 
-            "std": []
-        }
-
-    # Loop over the days to make predictions
-    for i in range(DAYS): 
-        date = datetime.datetime.now() - datetime.timedelta(days=(DAYS - i))
-        TODAYS_DATE = date.strftime('%Y-%m-%d')
-            
-        price_data, news_data, commodity_1_data, commodity_2_data, commodity_3_data, name_data, rsi_data, macd_data, obv_data = preprocess_data(company_names, commodity_names, company_index, HISTORICAL_DAYS, TODAYS_DATE)
-        prediction = make_predictions(price_data, news_data, commodity_1_data, commodity_2_data, commodity_3_data, name_data, rsi_data, macd_data, obv_data, model, company_names)
-
-        # Process predictions for each company
-        for company in prediction: 
-            # Extract scalar values from NumPy arrays
-            mean_value = prediction[company]["mean"].item()
-            std_value = prediction[company]["std"].item()
-            
-            # Append to the correct lists
-            predictions[company]["mean"].append(mean_value)
-            predictions[company]["std"].append(std_value)
-
-    # Save to JSON file
-    with open("assets/backtesting/predictions.json", "w") as file:
-        json.dump(predictions, file, indent=4)
-        file.close()
-        
-day = 0
-money = 2000
-money_graph = []
-portfolio = {}
-
-for i in range(DAYS): 
-    print(f"Day {day + 1}, Money: {money}")
-    
-    top_stocks = []
-    
-    for company in company_names:
-        predicted_price = predictions[company]['mean'][i]
-        predicted_std = predictions[company]['std'][i]
-        
-        # adjust prediction based on uncertainty
-        confidence = 1 / (1 + predicted_std)
-        risk_factor = 1 - RISK_TOLERANCE
-        adjusted_price = predicted_price * risk_factor * confidence
-        
-        top_stocks.append((company, adjusted_price, confidence))
-    
-    top_stocks.sort(key=lambda x: x[1], reverse=True)
-    top_stocks = top_stocks[:DIVERSIFICATION]
-    
-    # update portfolio
-    new_portfolio = {}
-    
-    for company in portfolio:
-        try:
-            last_price = pd.read_csv(f"data/historical/{company}.csv")["Adj Close"].values[day]
-            if not np.isnan(last_price):
-                # check stop loss, take profit, and trailing stop loss conditions
-                if last_price <= portfolio[company]["price"] * (1 - STOP_LOSS):
-                    money += last_price * portfolio[company]["amount"]
-                    print(f"Stop loss triggered for {company}. Sold at {last_price}")
-                    
-                elif last_price >= portfolio[company]["price"] * (1 + TAKE_PROFIT):
-                    money += last_price * portfolio[company]["amount"]
-                    print(f"Take profit triggered for {company}. Sold at {last_price}")
-                    
-                elif last_price <= portfolio[company]["trailing_stop"]:
-                    money += last_price * portfolio[company]["amount"]
-                    print(f"Trailing stop loss triggered for {company}. Sold at {last_price}")
-                    
-                else:
-                    new_portfolio[company] = portfolio[company]
-                    new_portfolio[company]["trailing_stop"] = max(portfolio[company]["trailing_stop"], last_price * (1 - TRAILING_STOP_LOSS))
-                    
-        except IndexError:
-            continue
-    
-    portfolio = new_portfolio
-    
-    # rebalance portfolio if necessary
-    portfolio_value = sum([portfolio[company]["amount"] * portfolio[company]["price"] for company in portfolio])
-    
-    if portfolio_value > 0:
-        for company in portfolio:
-            current_weight = portfolio[company]["amount"] * portfolio[company]["price"] / portfolio_value
-            target_weight = 1 / len(portfolio)
-            
-            if abs(current_weight - target_weight) > REBALANCE_THRESHOLD:
-                try:
-                    last_price = pd.read_csv(f"data/historical/{company}.csv")["Adj Close"].values[day]
-                    
-                    if not np.isnan(last_price):
-                        target_value = portfolio_value * target_weight
-                        target_amount = target_value / last_price
-                        
-                        if target_amount < portfolio[company]["amount"]:
-                            sell_amount = portfolio[company]["amount"] - target_amount
-                            money += sell_amount * last_price
-                            portfolio[company]["amount"] = target_amount
-                            print(f"Rebalanced portfolio by selling {sell_amount} shares of {company}")
-                            
-                        else:
-                            buy_amount = target_amount - portfolio[company]["amount"]
-                            
-                            if buy_amount * last_price <= money:
-                                money -= buy_amount * last_price
-                                portfolio[company]["amount"] = target_amount
-                                print(f"Rebalanced portfolio by buying {buy_amount} shares of {company}")
-                                
-                except IndexError:
-                    continue
-    
-    # invest in top stocks
-    for company, predicted_price, confidence in top_stocks:
-        if predicted_price > 0 and confidence > CONFIDENCE_THRESHOLD:
-            try:
-                last_price = pd.read_csv(f"data/historical/{company}.csv")["Adj Close"].values[day]
-                
-                if not np.isnan(last_price) and last_price != 0:
-                    amount_to_invest = int(MONEY_TO_INVEST * money * confidence / last_price)
-                    
-                    if company not in portfolio and last_price * amount_to_invest <= money:
-                        portfolio[company] = {
-                            "price": last_price,
-                            "amount": amount_to_invest,
-                            "trailing_stop": last_price * (1 - TRAILING_STOP_LOSS)
-                        }
-                        money -= last_price * amount_to_invest
-                        print(f"Invested {last_price * amount_to_invest} in {company} with confidence {confidence:.2f}")
-                        
-                    elif company in portfolio and last_price * amount_to_invest <= money:
-                        portfolio[company]["amount"] += amount_to_invest
-                        
-                        if portfolio[company]["amount"] != 0:
-                            portfolio[company]["price"] = (portfolio[company]["price"] * portfolio[company]["amount"] + last_price * amount_to_invest) / (portfolio[company]["amount"] + amount_to_invest)
-                        money -= last_price * amount_to_invest
-                        print(f"Invested additional {last_price * amount_to_invest} in {company} with confidence {confidence:.2f}")
-                        
-            except IndexError:
-                continue
-    
-    day += 1
-    total_value = money + sum([portfolio[company]["amount"] * portfolio[company]["price"] for company in portfolio])
-    print(f"Total value: {total_value}")
-    money_graph.append(total_value)
+# the inputs for every day are built in one pass over the data, the same as preprocess_data for each day 
+dates = [(datetime.datetime.now() - datetime.timedelta(days=(DAYS - i))).date() for i in range(DAYS)]
+features = build_as_of_features(company_names, commodity_names, company_index, HISTORICAL_DAYS, dates)
+
+# get all predictions, only the (date, company) pairs missing from assets/backtesting/predictions.npz go through the model 
+cache = predict_backtest(model, features)
+mean, std = prediction_matrix(cache, dates, company_names)
+
+# run the strategy over the price matrix, every csv is read once
+prices = load_price_matrix(company_names)
+
+settings = {
+    "DIVERSIFICATION": DIVERSIFICATION,
+    "STOP_LOSS": STOP_LOSS,
+    "TAKE_PROFIT": TAKE_PROFIT,
+    "RISK_TOLERANCE": RISK_TOLERANCE,
+    "MONEY_TO_INVEST": MONEY_TO_INVEST,
+    "CONFIDENCE_THRESHOLD": CONFIDENCE_THRESHOLD,
+    "TRAILING_STOP_LOSS": TRAILING_STOP_LOSS,
+    "REBALANCE_THRESHOLD": REBALANCE_THRESHOLD,
+}
+
+money_graph = run_backtest(prices, mean, std, settings, money=2000)["equity"]
+
+for day, total_value in enumerate(money_graph):
+    print(f"Day {day + 1}, Total value: {total_value}")
     
 # plot results
 plt.figure(figsize=(12, 6))
@@ -0,0 +1,105 @@
+import numpy as np
+import datetime
+import json
+import os
+
+from components.logging.logging import write_to_log
+
+# the backtest prediction cache on its own, a .npz with one row per (date, company) with the mean and
+# std of the model, the hash of the inputs of the row and the sha256 of the model file. it only needs
+# numpy so the backtest engine and the sweep workers can read it without keras or the progress window,
+# backtest_predictions.py fills it with the model.
+
+CACHE_PATH = "assets/backtesting/predictions.npz"
+MODEL_PATH = "assets/model.h5"
+LEGACY_PATH = "assets/backtesting/predictions.json"
+
+def load_prediction_cache(path=CACHE_PATH, model_hash=None):
+    # {(date, company): (mean, std, input hash)}, dates as yyyy-mm-dd strings. with model_hash set a
+    # cache that was made by another model is not used
+    if not os.path.exists(path):
+        return {}
+
+    with np.load(path) as data:
+        saved_hash = str(data["model_hash"]) if "model_hash" in data else ""
+
+        if model_hash is not None and saved_hash != model_hash:
+            write_to_log(f"""Dropped the backtest prediction cache {path}, it was made by another model at: {datetime.datetime.now()}
+Cache model: {saved_hash or 'unknown'}
+Current model: {model_hash}""")
+            return {}
+
+        input_hashes = data["inputs"].tolist() if "inputs" in data else [""] * len(data["dates"])
+
+        return {
+            (date, company): (mean, std, inputs)
+            for date, company, mean, std, inputs in zip(data["dates"].tolist(), data["companies"].tolist(), data["mean"], data["std"], input_hashes)
+        }
+
+def cache_model_hash(path=CACHE_PATH):
+    # the model the cache was made with, "" when it is not known
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path) as data:
+        return str(data["model_hash"]) if "model_hash" in data else ""
+
+def save_prediction_cache(cache, path=CACHE_PATH, model_hash=""):
+    keys = sorted(cache)
+
+    # write to a temp file first so a crash never leaves half a cache
+    tmp_path = path[:-len(".npz")] + ".tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        dates=np.array([date for date, _ in keys], dtype="U10"),
+        companies=np.array([company for _, company in keys], dtype=str),
+        mean=np.array([cache[key][0] for key in keys], dtype=np.float32).reshape(len(keys), -1),
+        std=np.array([cache[key][1] for key in keys], dtype=np.float32).reshape(len(keys), -1),
+        inputs=np.array([cache[key][2] if len(cache[key]) > 2 else "" for key in keys], dtype="U64"),
+        model_hash=np.array(model_hash)
+    )
+    os.replace(tmp_path, path)
+
+def convert_legacy_predictions(json_path=LEGACY_PATH, path=CACHE_PATH, days=30):
+    # the old predictions.json has DAYS values per company for the days up to the day before it was
+    # written, by position. they are stored under those dates with an unknown model so predict_backtest
+    # makes them again with the current model, the sweeps can use them until then
+    with open(json_path, "r") as file:
+        predictions = json.load(file)
+        file.close()
+
+    end_date = datetime.datetime.fromtimestamp(os.path.getmtime(json_path)).date()
+    cache = {}
+
+    for company in predictions:
+        values = list(zip(predictions[company]["mean"], predictions[company]["std"]))[:days]
+
+        for i, (mean, std) in enumerate(values):
+            date = (end_date - datetime.timedelta(days=len(values) - i)).strftime("%Y-%m-%d")
+            cache[(date, company)] = ([mean], [std], "")
+
+    save_prediction_cache(cache, path)
+    write_to_log(f"Converted {json_path} to {path} with {len(cache)} predictions at: {datetime.datetime.now()}")
+
+    return cache
+
+def prediction_matrix(cache, dates, company_names):
+    # (dates x companies) mean and std of the first model output, nan where there is no prediction
+    mean = np.full((len(dates), len(company_names)), np.nan)
+    std = np.full((len(dates), len(company_names)), np.nan)
+
+    for d, date in enumerate(dates):
+        date = date if isinstance(date, str) else date.strftime("%Y-%m-%d")
+
+        for n, company in enumerate(company_names):
+            if (date, company) in cache:
+                mean[d, n] = np.ravel(cache[(date, company)][0])[0]
+                std[d, n] = np.ravel(cache[(date, company)][1])[0]
+
+    return mean, std
+
+def cached_dates(cache, days=None):
+    # the dates in the cache in order, the last days of them when days is set
+    dates = sorted({date for date, _ in cache})
+
+    return dates[-days:] if days else dates
@@ -0,0 +1,175 @@
+import numpy as np
+import datetime
+import csv
+import os
+
+from components.backtesting.backtest_cache import load_prediction_cache, prediction_matrix, convert_legacy_predictions, cache_model_hash, cached_dates, CACHE_PATH, MODEL_PATH, LEGACY_PATH
+from components.prediction.prediction_cache import file_hash
+from components.logging.logging import write_to_log
+
+# the strategy from assets/backtesting/30-day-test.py run over arrays loaded once, instead of
+# reading the csv files inside the day and holding loops. prices, mean and std are (days x companies),
+# a nan price is treated like the missing row the script skips.
+
+DEFAULT_SETTINGS = {
+    "DIVERSIFICATION": 6,                         # number of stocks to invest in each day
+    "STOP_LOSS": 0.17591568344978034,             # stop loss percentage
+    "TAKE_PROFIT": 0.2656486232205517,            # take profit percentage
+    "RISK_TOLERANCE": 0.19140403603152611,        # maximum acceptable risk level
+    "MONEY_TO_INVEST": 0.3392394782708459,        # % that can be invested per day
+    "CONFIDENCE_THRESHOLD": 0.71149793900788,     # minimum confidence level required for investment
+    "TRAILING_STOP_LOSS": 0.010217685163146514,   # trailing stop loss percentage
+    "REBALANCE_THRESHOLD": 0.28232967833124156,   # portfolio rebalance threshold
+}
+
+def load_price_matrix(company_names, column="Adj Close", directory="data/historical"):
+    # (rows x companies), row n is the n:th row of every csv like pd.read_csv(...)[column].values[n]
+    columns = []
+
+    for company in company_names:
+        values = []
+
+        with open(f"{directory}/{company}.csv", "r") as file:
+            reader = csv.reader(file)
+            index = next(reader).index(column)
+
+            for row in reader:
+                try:
+                    values.append(float(row[index]))
+
+                except (ValueError, IndexError):
+                    values.append(np.nan)
+
+            file.close()
+
+        columns.append(values)
+
+    prices = np.full((max((len(values) for values in columns), default=0), len(company_names)), np.nan)
+
+    for n, values in enumerate(columns):
+        prices[:len(values), n] = values
+
+    return prices
+
+def load_predictions(company_names, path=CACHE_PATH, days=30, model_path=MODEL_PATH):
+    # (days x companies) mean and std of the last days in the prediction cache that 30-day-test.py
+    # writes. the old predictions.json is converted the first time
+    if not os.path.exists(path) and os.path.exists(LEGACY_PATH):
+        convert_legacy_predictions(LEGACY_PATH, path, days)
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No backtest predictions in {path}, run assets/backtesting/30-day-test.py first.")
+
+    model_hash = cache_model_hash(path)
+
+    if os.path.exists(model_path) and model_hash != file_hash(model_path):
+        write_to_log(f"""The backtest predictions in {path} were not made by {model_path}, run assets/backtesting/30-day-test.py to update them at: {datetime.datetime.now()}""")
+
+    cache = load_prediction_cache(path)
+
+    return prediction_matrix(cache, cached_dates(cache, days), company_names)
+
+def rank_days(mean, std, settings):
+    # the top stocks of every day at once, (days x DIVERSIFICATION) company indices and their scores
+    confidence = 1 / (1 + std)
+    adjusted = mean * (1 - settings["RISK_TOLERANCE"]) * confidence
+
+    # stable sort on the negated score keeps ties in company order like list.sort(reverse=True)
+    order = np.argsort(-adjusted, axis=1, kind="stable")[:, :settings["DIVERSIFICATION"]]
+
+    return order, np.take_along_axis(adjusted, order, axis=1), np.take_along_axis(confidence, order, axis=1)
+
+def run_backtest(prices, mean, std, settings=None, money=2000):
+    # gives back {"equity": value per day, "money": cash left, "portfolio": {company index: position}}
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    days = mean.shape[0]
+
+    STOP_LOSS = settings["STOP_LOSS"]
+    TAKE_PROFIT = settings["TAKE_PROFIT"]
+    TRAILING_STOP_LOSS = settings["TRAILING_STOP_LOSS"]
+    REBALANCE_THRESHOLD = settings["REBALANCE_THRESHOLD"]
+    CONFIDENCE_THRESHOLD = settings["CONFIDENCE_THRESHOLD"]
+    MONEY_TO_INVEST = settings["MONEY_TO_INVEST"]
+
+    order, scores, confidences = rank_days(mean, std, settings)
+
+    # rows past the end of the price data are missing, like the IndexError in the script
+    padded = np.full((max(days, prices.shape[0]), prices.shape[1]), np.nan)
+    padded[:prices.shape[0]] = prices
+
+    equity = np.empty(days)
+    portfolio = {}
+
+    for day in range(days):
+        day_prices = padded[day]
+
+        # exit checks for all holdings at once, a missing price drops the holding like the script does
+        held = np.fromiter(portfolio, dtype=np.int64, count=len(portfolio))
+        last = day_prices[held]
+        entry = np.array([portfolio[company]["price"] for company in held])
+        trailing = np.array([portfolio[company]["trailing_stop"] for company in held])
+
+        sell = (last <= entry * (1 - STOP_LOSS)) | (last >= entry * (1 + TAKE_PROFIT)) | (last <= trailing)
+        keep = ~np.isnan(last) & ~sell
+
+        new_portfolio = {}
+        for n, company in enumerate(held):
+            if keep[n]:
+                new_portfolio[company] = portfolio[company]
+                new_portfolio[company]["trailing_stop"] = max(trailing[n], last[n] * (1 - TRAILING_STOP_LOSS))
+
+            elif not np.isnan(last[n]):
+                money += last[n] * portfolio[company]["amount"]
+
+        portfolio = new_portfolio
+
+        # rebalance portfolio if necessary
+        portfolio_value = sum([portfolio[company]["amount"] * portfolio[company]["price"] for company in portfolio])
+
+        if portfolio_value > 0:
+            target_weight = 1 / len(portfolio)
+
+            for company in portfolio:
+                current_weight = portfolio[company]["amount"] * portfolio[company]["price"] / portfolio_value
+                last_price = day_prices[company]
+
+                if abs(current_weight - target_weight) > REBALANCE_THRESHOLD and not np.isnan(last_price):
+                    target_amount = portfolio_value * target_weight / last_price
+
+                    if target_amount < portfolio[company]["amount"]:
+                        money += (portfolio[company]["amount"] - target_amount) * last_price
+                        portfolio[company]["amount"] = target_amount
+
+                    elif (target_amount - portfolio[company]["amount"]) * last_price <= money:
+                        money -= (target_amount - portfolio[company]["amount"]) * last_price
+                        portfolio[company]["amount"] = target_amount
+
+        # invest in top stocks
+        for company, predicted_price, confidence in zip(order[day], scores[day], confidences[day]):
+            last_price = day_prices[company]
+
+            if predicted_price > 0 and confidence > CONFIDENCE_THRESHOLD and not np.isnan(last_price) and last_price != 0:
+                amount_to_invest = int(MONEY_TO_INVEST * money * confidence / last_price)
+
+                if last_price * amount_to_invest > money:
+                    continue
+
+                if company not in portfolio:
+                    portfolio[company] = {
+                        "price": last_price,
+                        "amount": amount_to_invest,
+                        "trailing_stop": last_price * (1 - TRAILING_STOP_LOSS)
+                    }
+
+                else:
+                    # same order of updates as the script, the amount is raised before the average price is taken
+                    portfolio[company]["amount"] += amount_to_invest
+
+                    if portfolio[company]["amount"] != 0:
+                        portfolio[company]["price"] = (portfolio[company]["price"] * portfolio[company]["amount"] + last_price * amount_to_invest) / (portfolio[company]["amount"] + amount_to_invest)
+
+                money -= last_price * amount_to_invest
+
+        equity[day] = money + sum([portfolio[company]["amount"] * portfolio[company]["price"] for company in portfolio])
+
+    return {"equity": equity, "money": money, "portfolio": portfolio}
@@ -0,0 +1,62 @@
+import numpy as np
+import datetime
+import hashlib
+
+from components.backtesting.backtest_cache import load_prediction_cache, save_prediction_cache, CACHE_PATH, MODEL_PATH
+from components.prediction.prediction_cache import file_hash
+from components.preprocess.as_of_features import FEATURES
+from components.logging.logging import write_to_log
+
+# predictions for every (date, company) of a backtest in a few large model calls. the inputs come from
+# build_as_of_features, only the pairs that are not in the cache yet are run through the model and the
+# cache is a .npz with one row per (date, company) instead of the indented predictions.json.
+# the npz holds the sha256 of the model file and every row the hash of its inputs, a cache made by
+# another model is dropped and a row whose inputs changed is predicted again. the cache itself is in
+# backtest_cache.py.
+
+def input_hash(window, name, num_iterations):
+    digest = hashlib.sha256(f"{num_iterations}:{name}".encode())
+    digest.update(np.ascontiguousarray(window, dtype=np.float64).tobytes())
+
+    return digest.hexdigest()
+
+def predict_backtest(model, features, path=CACHE_PATH, num_iterations=100, max_batch_size=4096, model_path=MODEL_PATH):
+    # runs the model for the valid (date, company) pairs of features that are missing from the cache
+    # or whose inputs changed, gives back the updated cache. predict_batched is imported here so
+    # importing the cache functions does not load keras and the progress window
+    from components.prediction.prediction import predict_batched
+
+    model_hash = file_hash(model_path)
+    cache = load_prediction_cache(path, model_hash)
+    dates = [date.strftime("%Y-%m-%d") for date in features["dates"]]
+    tensor = features["tensor"]
+
+    # windows shorter than HISTORICAL_DAYS are nan padded and can not go through the model
+    complete = features["valid"] & ~np.isnan(tensor).any(axis=(2, 3))
+    hashes = {(d, n): input_hash(tensor[d, n], features["names"][n], num_iterations) for d, n in zip(*np.nonzero(complete))}
+    pairs = [
+        (d, n) for (d, n), inputs in hashes.items()
+        if (dates[d], features["companies"][n]) not in cache or cache[(dates[d], features["companies"][n])][2] != inputs
+    ]
+
+    write_to_log(f"""Backtest prediction start at: {datetime.datetime.now()}
+Pairs: {int(features['valid'].sum())} valid, {int(complete.sum())} with full windows, {len(pairs)} not cached""")
+
+    if pairs:
+        d, n = np.array(pairs).T
+        windows = tensor[d, n].astype(np.float32)
+
+        X = [windows[:, :, FEATURES.index(feature), None] for feature in FEATURES[:5]]
+        X.append(features["names"][n].reshape(-1, 1))
+        X += [windows[:, :, FEATURES.index(feature), None] for feature in FEATURES[5:]]
+
+        mean, std = predict_batched(model, X, num_iterations, max_batch_size)
+
+        for k, (date_index, company_index) in enumerate(pairs):
+            cache[(dates[date_index], features["companies"][company_index])] = (mean[k], std[k], hashes[(date_index, company_index)])
+
+        save_prediction_cache(cache, path, model_hash)
+
+    write_to_log(f"Backtest prediction done with {len(pairs)} new predictions at: {datetime.datetime.now()}")
+
+    return cache
@@ -0,0 +1,220 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import itertools
+import datetime
+import random
+import json
+import csv
+import sys
+import os
+
+from components.backtesting.backtest_engine import DEFAULT_SETTINGS, load_price_matrix, load_predictions, run_backtest
+from components.logging.logging import write_to_log
+
+# searches the trading constants in main.py with the backtest engine over the cached predictions and
+# prices in assets/backtesting. the price and prediction arrays are put in shared memory once and every
+# worker process reads them from there. every finished candidate is appended to a checkpoint file, a
+# sweep that is started again with the same settings skips the candidates that are already done.
+# the ranked results are written to a csv, the best candidate first.
+
+SWEEP_DIR = "assets/backtesting/sweeps"
+
+# (low, high) for every constant, DIVERSIFICATION is an int
+PARAMETER_RANGES = {
+    "DIVERSIFICATION": (1, 12),
+    "STOP_LOSS": (0.01, 0.5),
+    "TAKE_PROFIT": (0.01, 0.5),
+    "RISK_TOLERANCE": (0.0, 0.5),
+    "MONEY_TO_INVEST": (0.05, 1.0),
+    "CONFIDENCE_THRESHOLD": (0.3, 0.95),
+    "TRAILING_STOP_LOSS": (0.001, 0.1),
+    "REBALANCE_THRESHOLD": (0.01, 0.5),
+}
+
+START_MONEY = 2000
+
+_arrays = {}
+
+def grid_candidates(ranges=PARAMETER_RANGES, steps=3):
+    values = []
+
+    for name, (low, high) in ranges.items():
+        if name == "DIVERSIFICATION":
+            values.append(sorted(set(int(round(value)) for value in np.linspace(low, high, steps))))
+        else:
+            values.append([float(value) for value in np.linspace(low, high, steps)])
+
+    return [dict(zip(ranges, combination)) for combination in itertools.product(*values)]
+
+def random_candidates(ranges=PARAMETER_RANGES, count=1000, seed=0):
+    # the same seed gives the same candidates, that is what lets a random sweep resume
+    rng = random.Random(seed)
+    candidates = []
+
+    for _ in range(count):
+        candidates.append({name: rng.randint(low, high) if name == "DIVERSIFICATION" else rng.uniform(low, high) for name, (low, high) in ranges.items()})
+
+    return candidates
+
+def candidate_key(candidate, days):
+    return json.dumps({"settings": candidate, "days": days}, sort_keys=True)
+
+def share_arrays(arrays):
+    # copies the arrays into shared memory blocks, gives back the blocks and what a worker needs to find them
+    blocks = []
+    specs = {}
+
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=np.float64, buffer=block.buf)[:] = array
+
+        blocks.append(block)
+        specs[name] = (block.name, array.shape)
+
+    return blocks, specs
+
+def attach_arrays(specs):
+    # runs once in every worker, the blocks stay open for the life of the process
+    for name, (block_name, shape) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _arrays[name] = (block, np.ndarray(shape, dtype=np.float64, buffer=block.buf))
+
+def evaluate(candidate, days):
+    prices = _arrays["prices"][1]
+    mean = _arrays["mean"][1][:days]
+    std = _arrays["std"][1][:days]
+
+    equity = run_backtest(prices, mean, std, candidate, money=START_MONEY)["equity"]
+    values = np.concatenate([[START_MONEY], equity])
+
+    return {
+        "settings": candidate,
+        "days": days,
+        "final_value": float(equity[-1]),
+        "return": float(equity[-1] / START_MONEY - 1),
+        "max_drawdown": float(np.max(1 - values / np.maximum.accumulate(values))),
+    }
+
+def load_checkpoint(path):
+    done = {}
+
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            for line in file:
+                try:
+                    result = json.loads(line)
+
+                except ValueError:
+                    # a line cut off by a crash, that candidate is just run again
+                    continue
+
+                done[candidate_key(result["settings"], result["days"])] = result
+
+            file.close()
+
+    return done
+
+def evaluate_all(candidates, days, executor, checkpoint_path, done):
+    todo = [candidate for candidate in candidates if candidate_key(candidate, days) not in done]
+
+    with open(checkpoint_path, "a") as file:
+        for result in executor.map(evaluate, todo, itertools.repeat(days), chunksize=max(1, len(todo) // 64)):
+            done[candidate_key(result["settings"], result["days"])] = result
+
+            file.write(json.dumps(result) + "\n")
+            file.flush()
+
+        file.close()
+
+    return [done[candidate_key(candidate, days)] for candidate in candidates]
+
+def successive_halving(candidates, max_days, executor, checkpoint_path, done, min_days=5, eta=3):
+    # every round runs the survivors over eta times more days and keeps the best 1 / eta of them
+    days = min_days
+    results = []
+
+    while candidates:
+        days = min(days, max_days)
+        results = evaluate_all(candidates, days, executor, checkpoint_path, done)
+
+        if days == max_days or len(candidates) == 1:
+            break
+
+        results.sort(key=lambda result: result["final_value"], reverse=True)
+        candidates = [result["settings"] for result in results[:max(1, len(results) // eta)]]
+        days *= eta
+
+    return results
+
+def write_results(results, path):
+    results = sorted(results, key=lambda result: result["final_value"], reverse=True)
+
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Rank", "Final Value", "Return", "Max Drawdown", "Days"] + list(PARAMETER_RANGES))
+
+        for rank, result in enumerate(results, 1):
+            writer.writerow([rank, result["final_value"], result["return"], result["max_drawdown"], result["days"]] + [result["settings"][name] for name in PARAMETER_RANGES])
+
+        file.close()
+
+    return results
+
+def run_sweep(company_names, method="random", count=1000, steps=3, seed=0, name=None, max_workers=None, sweep_dir=SWEEP_DIR):
+    # gives back the results ranked by final value, the current settings in main.py are always included
+    if method == "grid":
+        candidates = grid_candidates(steps=steps)
+    elif method in ("random", "halving"):
+        candidates = random_candidates(count=count, seed=seed)
+    else:
+        raise ValueError(f"Unknown sweep method {method}, use grid, random or halving.")
+
+    candidates = [dict(DEFAULT_SETTINGS)] + candidates
+
+    name = name or (f"{method}_{steps}" if method == "grid" else f"{method}_{count}_{seed}")
+    os.makedirs(sweep_dir, exist_ok=True)
+    checkpoint_path = f"{sweep_dir}/{name}.jsonl"
+    done = load_checkpoint(checkpoint_path)
+
+    prices = load_price_matrix(company_names)
+    mean, std = load_predictions(company_names)
+    blocks, specs = share_arrays({"prices": prices, "mean": mean, "std": std})
+
+    write_to_log(f"Parameter sweep {name} started with {len(candidates)} candidates, {len(done)} results already done at: {datetime.datetime.now()}")
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=attach_arrays, initargs=(specs,)) as executor:
+            if method == "halving":
+                results = successive_halving(candidates, mean.shape[0], executor, checkpoint_path, done)
+            else:
+                results = evaluate_all(candidates, mean.shape[0], executor, checkpoint_path, done)
+
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    results = write_results(results, f"{sweep_dir}/{name}.csv")
+
+    write_to_log(f"""Parameter sweep {name} done at: {datetime.datetime.now()}
+Best final value: {results[0]['final_value']:.2f} with {json.dumps(results[0]['settings'])}""")
+
+    return results
+
+if __name__ == "__main__":
+    # run from the project root with: python -m components.backtesting.parameter_sweep [grid|random|halving] [count or steps]
+    with open("assets/companies.json") as file:
+        company_info = json.load(file)
+        file.close()
+
+    company_names = [company_info[f"{n}"]["name"] for n in range(len(company_info))]
+
+    method = sys.argv[1] if len(sys.argv) > 1 else "random"
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else (3 if method == "grid" else 1000)
+
+    results = run_sweep(company_names, method, count=size, steps=size)
+
+    for result in results[:10]:
+        print(f"{result['final_value']:.2f} {result['return']:.2%} {json.dumps(result['settings'])}")
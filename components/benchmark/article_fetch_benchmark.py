@@ -0,0 +1,84 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import threading
+import random
+import time
+
+from components.get_data.article_fetcher import ArticleFetcher, download
+
+# run from the project root with: python -m components.benchmark.article_fetch_benchmark
+# local http servers stand in for the news sites, every server is one domain. a page takes latency
+# seconds and every failure_rate:th request fails with a 503 so the retries are part of the run.
+
+class StandInHandler(BaseHTTPRequestHandler):
+    latency = 0.3
+    failure_rate = 0.05
+
+    def do_GET(self):
+        time.sleep(self.latency)
+
+        if random.random() < self.failure_rate:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        body = f"<html><body><article><p>Article at {self.path}.</p></article></body></html>".encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_servers(domains):
+    servers = [ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler) for _ in range(domains)]
+
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return servers
+
+def fetch_sequential(urls, delay=(1, 3)):
+    # the old way, one link at a time with a random delay after each
+    texts = []
+
+    for url in urls:
+        try:
+            texts.append(download(url))
+
+        except Exception:
+            texts.append("")
+
+        time.sleep(random.uniform(*delay))
+
+    return texts
+
+def benchmark_article_fetch(articles=60, domains=10, delay=(1, 3), sequential_articles=20):
+    servers = start_servers(domains)
+    urls = [f"http://127.0.0.1:{servers[n % domains].server_address[1]}/article/{n}" for n in range(articles)]
+
+    try:
+        # the sequential run is slow, so it is timed on fewer links and scaled up
+        start_time = time.time()
+        fetch_sequential(urls[:sequential_articles], delay)
+        sequential_time = (time.time() - start_time) * articles / sequential_articles
+
+        fetcher = ArticleFetcher(fetch=download, backoff=0.2)
+
+        start_time = time.time()
+        texts = fetcher.fetch_all(urls)
+        concurrent_time = time.time() - start_time
+
+    finally:
+        for server in servers:
+            server.shutdown()
+
+    print(f"Articles: {articles} over {domains} domains")
+    print(f"Sequential: {sequential_time:.1f} s (timed on {sequential_articles} articles)")
+    print(f"Concurrent: {concurrent_time:.1f} s, fetched {fetcher.counts['fetched']}, failed {fetcher.counts['failed']}, retries {fetcher.counts['retries']}")
+    print(f"Speedup: {sequential_time / concurrent_time:.1f}x, {sum(1 for text in texts if text is not None)} pages with content")
+
+if __name__ == "__main__":
+    benchmark_article_fetch()
@@ -0,0 +1,28 @@
+import json
+import time
+
+from components.backtesting.backtest_engine import load_price_matrix, load_predictions, run_backtest
+
+# run from the project root with: python -m components.benchmark.backtest_benchmark
+
+def benchmark_backtest(repeats=100):
+    with open("assets/companies.json") as file:
+        company_info = json.load(file)
+        file.close()
+
+    company_names = [company_info[f"{n}"]["name"] for n in range(len(company_info))]
+
+    start_time = time.time()
+    prices = load_price_matrix(company_names)
+    mean, std = load_predictions(company_names)
+    load_time = time.time() - start_time
+
+    start_time = time.time()
+    for _ in range(repeats):
+        equity = run_backtest(prices, mean, std)["equity"]
+    run_time = (time.time() - start_time) / repeats
+
+    print(f"load {load_time * 1000:.1f} ms, {len(equity)} days in {run_time * 1000:.2f} ms ({run_time / len(equity) * 1000:.3f} ms per day), final value {equity[-1]:.2f}")
+
+if __name__ == "__main__":
+    benchmark_backtest()
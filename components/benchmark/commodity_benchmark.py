@@ -0,0 +1,122 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import threading
+import random
+import json
+import time
+import sys
+import os
+
+from components.get_data.commodity_fetcher import CommodityFetcher, parse_commodity_page, commodity_file_name
+
+# run from the project root with: python -m components.benchmark.commodity_benchmark
+# a local http server serves saved commodity pages, so the fetcher and the parser are measured without
+# the site. pages rendered by chrome are saved to the fixture directory with:
+#   python -m components.benchmark.commodity_benchmark save
+# without saved pages the benchmark makes pages with a random chart in the same html layout.
+
+FIXTURE_DIR = "data/fixtures/commodity"
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    latency = 1.5   # seconds, about what a page of the site takes
+    pages = {}
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = self.pages.get(self.path.rsplit("/", 1)[-1])
+
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def make_page(points=365):
+    price = random.uniform(10, 2000)
+    ys = []
+
+    for _ in range(points):
+        price *= 1 + random.gauss(0, 0.01)
+        ys.append(price)
+
+    low, high = min(ys), max(ys)
+    path = " ".join(f"{'M' if n == 0 else 'L'} {n * 2.5:.1f} {300 - (y - low) / (high - low) * 280:.2f}" for n, y in enumerate(ys))
+
+    return f"""<html><body><table class="table"><tbody><tr><td>Commodity</td><td>{ys[-1]:.2f}</td></tr></tbody></table>
+<svg><g class="highcharts-series highcharts-series-0 highcharts-line-series"><path fill="none" d="{path}"></path></g></svg></body></html>"""
+
+def load_fixtures(commodities, directory=FIXTURE_DIR):
+    pages = {}
+
+    for commodity in commodities:
+        name = commodity_file_name(commodity)
+
+        if os.path.exists(f"{directory}/{name}.html"):
+            with open(f"{directory}/{name}.html", "r", encoding="utf-8") as file:
+                pages[name] = file.read().encode("utf-8")
+                file.close()
+
+        else:
+            pages[name] = make_page().encode("utf-8")
+
+    return pages
+
+def save_fixtures(commodities, directory=FIXTURE_DIR):
+    from components.get_data.get_commodity_data import start_browser, render_page
+
+    os.makedirs(directory, exist_ok=True)
+    driver = start_browser()
+
+    for commodity in commodities:
+        try:
+            html = render_page(driver, commodity)
+
+            with open(f"{directory}/{commodity_file_name(commodity)}.html", "w", encoding="utf-8") as file:
+                file.write(html)
+                file.close()
+
+        except Exception as e:
+            print(f"Could not save {commodity}: {e}")
+
+        time.sleep(1)
+
+    driver.quit()
+
+def benchmark_commodities(commodities):
+    FixtureHandler.pages = load_fixtures(commodities)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/commodity"
+
+    start_time = time.time()
+    rows = [parse_commodity_page(page.decode("utf-8")) for page in FixtureHandler.pages.values()]
+    print(f"Parsing {len(rows)} pages: {(time.time() - start_time) / len(rows) * 1000:.2f} ms per page, {sum(len(r) for r in rows)} rows")
+
+    # one page at a time with a second between them, like the browser loop without its page load
+    for name, fetcher in [("sequential", CommodityFetcher(base_url, max_workers=1, rate=1.0, burst=1)),
+                          ("concurrent", CommodityFetcher(base_url))]:
+        start_time = time.time()
+        pages = fetcher.fetch_all(commodities)
+        parsed = sum(1 for page in pages.values() if page is not None and parse_commodity_page(page))
+        print(f"{name}: {len(commodities)} commodities in {time.time() - start_time:.1f} s, {parsed} parsed")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    with open("assets/commodities.json") as file:
+        commodity_names = json.load(file)
+        file.close()
+
+    if sys.argv[1:] == ["save"]:
+        save_fixtures(commodity_names)
+
+    else:
+        benchmark_commodities(commodity_names)
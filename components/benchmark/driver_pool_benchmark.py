@@ -0,0 +1,78 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from components.get_data.driver_pool import DriverPool
+
+# run from the project root with: python -m components.benchmark.driver_pool_benchmark
+# a local http server stands in for the google news result page, the page links an image, a font
+# and a stylesheet so the benchmark also shows how many of them chrome still downloads.
+# the old way starts chrome for every company, the pool keeps size of them alive.
+
+class StandInHandler(BaseHTTPRequestHandler):
+    assets = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        if self.path.startswith("/search"):
+            body = b"""<html><head><link rel="stylesheet" href="/style.css"><style>@font-face {font-family: f; src: url(/font.woff2);} body {font-family: f;}</style></head>
+<body><img src="/logo.png"><div class="SoAPf"><div class="n0jPhd">Headline</div></div><a class="WlydOe" href="/article">link</a></body></html>"""
+            content_type = "text/html"
+
+        else:
+            with self.lock:
+                StandInHandler.assets += 1
+
+            body = b"x" * 20000
+            content_type = "application/octet-stream"
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def scrape(pool, url, pages):
+    pooled = pool.acquire()
+
+    try:
+        for n in range(pages):
+            pooled.get(pool, f"{url}/search?q={n}")
+
+    finally:
+        pool.release(pooled)
+
+def run(pool, url, companies, pages):
+    start_time = time.time()
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        list(executor.map(lambda company: scrape(pool, url, pages), range(companies)))
+
+    pool.close()
+
+    return time.time() - start_time
+
+def benchmark_driver_pool(companies=12, pages=8, size=3):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # max_pages equal to the pages of one company replaces the driver after every company, like before
+    for name, max_pages in [("chrome per company", pages), ("driver pool", 1000)]:
+        StandInHandler.assets = 0
+        pool = DriverPool(size, max_pages=max_pages, proxy=None)
+        seconds = run(pool, url, companies, pages)
+        counts = pool.counts
+
+        print(f"""{name}: {companies} companies of {pages} pages in {seconds:.1f} s
+  {counts['started']} drivers started in {counts['startup_seconds']:.1f} s, {counts['startup_seconds'] / max(counts['started'], 1):.2f} s each
+  {counts['pages']} pages in {counts['page_seconds']:.1f} s, {counts['page_seconds'] / max(counts['pages'], 1):.3f} s each, {StandInHandler.assets} assets downloaded""")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    benchmark_driver_pool()
@@ -0,0 +1,59 @@
+import numpy as np
+import time
+import csv
+import os
+
+from components.store.feature_store import FeatureStore, KINDS, import_csv
+
+# run from the project root with: python -m components.benchmark.feature_store_benchmark
+
+HISTORICAL_DAYS = 20
+
+def read_csv_windows(kind, days):
+    directory = KINDS[kind]["directory"]
+    windows = []
+
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".csv"):
+            continue
+
+        values = []
+
+        with open(f"{directory}/{filename}", "r") as file:
+            reader = csv.reader(file)
+            next(reader)  # skip header
+
+            for row in reader:
+                try:
+                    values.append(float(row[1]))
+
+                except (ValueError, IndexError):
+                    continue
+
+            file.close()
+
+        windows.append(values[-days:])
+
+    return windows
+
+def benchmark_feature_store(days=HISTORICAL_DAYS, repeats=10):
+    for kind in KINDS:
+        start_time = time.time()
+        import_csv(kind)
+        import_time = time.time() - start_time
+
+        start_time = time.time()
+        for _ in range(repeats):
+            read_csv_windows(kind, days)
+        csv_time = (time.time() - start_time) / repeats
+
+        start_time = time.time()
+        for _ in range(repeats):
+            store = FeatureStore(kind)
+            np.asarray(store.window(KINDS[kind]["fields"][0], days))
+        store_time = (time.time() - start_time) / repeats
+
+        print(f"{kind}: import {import_time:.2f} s, csv window {csv_time * 1000:.1f} ms, store window {store_time * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    benchmark_feature_store()
@@ -0,0 +1,74 @@
+import pandas as pd
+import numpy as np
+import tempfile
+import datetime
+import shutil
+import time
+import json
+import os
+
+from components.get_data.get_historical_data import get_historical_data
+
+# run from the project root with: python -m components.benchmark.historical_benchmark
+# uses a stand in for yfinance.download so it runs offline on a copy of data/raw_data/raw_historical
+
+class FakeDownloader:
+    # answers like yfinance.download, every call costs call_latency and every symbol symbol_latency
+    def __init__(self, call_latency=0.3, symbol_latency=0.01, today=None):
+        self.call_latency = call_latency
+        self.symbol_latency = symbol_latency
+        self.today = today or datetime.date.today()
+        self.calls = 0
+        self.rows = 0
+
+    def __call__(self, tickers, period=None, start=None, interval="1d", progress=False, group_by="column"):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        start = self.today - datetime.timedelta(days=365) if start is None else datetime.datetime.strptime(start, "%Y-%m-%d").date()
+
+        dates = pd.bdate_range(start, self.today)
+        columns = pd.MultiIndex.from_product([["Open", "High", "Low", "Close", "Volume"], tickers], names=["Price", "Ticker"])
+
+        # the same value for the same ticker, field and day no matter how it is requested
+        days = np.array([date.toordinal() for date in dates])[:, None]
+        cells = np.array([sum(map(ord, field + ticker)) for field, ticker in columns])[None, :]
+        data = pd.DataFrame(10 + (days * 7919 + cells * 104729) % 49000 / 100, index=pd.DatetimeIndex(dates, name="Date"), columns=columns)
+        data["Volume"] = data["Volume"].round() * 1000
+
+        self.calls += 1
+        self.rows += len(dates) * len(tickers)
+        time.sleep(self.call_latency + self.symbol_latency * len(tickers))
+
+        return data
+
+def benchmark_historical(symbols, names, chunk_size=50, today=None):
+    results = {}
+    root = os.getcwd()
+
+    for mode, bulk in (("per symbol", False), ("bulk", True)):
+        with tempfile.TemporaryDirectory() as directory:
+            shutil.copytree(f"{root}/data/raw_data/raw_historical", f"{directory}/data/raw_data/raw_historical")
+            downloader = FakeDownloader(today=today)
+
+            os.chdir(directory)
+            try:
+                start_time = time.time()
+                get_historical_data(symbols, names, "1y", bulk=bulk, chunk_size=chunk_size, downloader=downloader)
+                elapsed = time.time() - start_time
+
+            finally:
+                os.chdir(root)
+
+            results[mode] = {"seconds": elapsed, "calls": downloader.calls, "rows": downloader.rows}
+            print(f"{mode}: {elapsed:.2f} s, {downloader.calls} downloads, {downloader.rows} rows downloaded")
+
+    return results
+
+if __name__ == "__main__":
+    with open("assets/companies.json") as file:
+        company_info = json.load(file)
+        file.close()
+
+    company_names = [company_info[f"{n}"]["name"] for n in range(len(company_info))]
+    company_tickers = [company_info[f"{n}"]["ticker"] for n in range(len(company_info))]
+
+    benchmark_historical(company_tickers, company_names)
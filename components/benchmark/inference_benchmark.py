@@ -0,0 +1,44 @@
+from keras.models import load_model
+import numpy as np
+import time
+
+from components.prediction.compiled_model import CompiledModel, TFLiteModel, export_tflite, check_accuracy, TFLITE_PATH
+from components.prediction.prediction import probe_inputs
+
+# run from the project root with: python -m components.benchmark.inference_benchmark
+
+def time_predict(model, X, repeats):
+    model.predict(X, batch_size=len(X[0]), verbose=0)
+
+    start_time = time.time()
+    for _ in range(repeats):
+        model.predict(X, batch_size=len(X[0]), verbose=0)
+
+    return (time.time() - start_time) / repeats
+
+def benchmark_inference(model, batch_sizes=(1, 100, 4096), repeats=20):
+    start_time = time.time()
+    compiled = CompiledModel(model)
+    print(f"Compile and warm up: {time.time() - start_time:.2f} s")
+
+    runtimes = {"keras predict": model, "compiled": compiled}
+
+    try:
+        export_tflite(model)
+        runtimes["tflite"] = TFLiteModel(model, TFLITE_PATH)
+
+    except Exception as e:
+        print(f"TFLite export failed: {e}")
+
+    for name, runtime in runtimes.items():
+        if runtime is not model:
+            print(f"{name}: largest difference to keras {check_accuracy(model, runtime):.2e}")
+
+    for batch_size in batch_sizes:
+        X = probe_inputs(model, rows=batch_size)
+        times = {name: time_predict(runtime, X, repeats if batch_size < 1000 else max(1, repeats // 10)) for name, runtime in runtimes.items()}
+
+        print(f"Batch {batch_size}: " + ", ".join(f"{name} {seconds * 1000:.2f} ms" for name, seconds in times.items()))
+
+if __name__ == "__main__":
+    benchmark_inference(load_model("assets/model.h5"))
@@ -0,0 +1,52 @@
+from keras.models import load_model
+import numpy as np
+import time
+import json
+
+from components.preprocess.preprocess_data import preprocess_data
+from components.prediction.prediction import make_predictions
+
+# run from the project root with: python -m components.benchmark.prediction_benchmark
+
+HISTORICAL_DAYS = 20
+
+def benchmark_predictions(model, company_names, inputs, max_batch_size=4096):
+    results = {}
+
+    for mode, batched in (("per company", False), ("batched", True)):
+        start_time = time.time()
+        predictions = make_predictions(*inputs, model, company_names, batched=batched, max_batch_size=max_batch_size)
+        results[mode] = {"seconds": time.time() - start_time, "predictions": predictions}
+
+    # the passes are stochastic if the model is, so the means only have to be close, not equal
+    max_mean_diff = max(
+        float(np.max(np.abs(results["per company"]["predictions"][company]["mean"] - results["batched"]["predictions"][company]["mean"])))
+        for company in company_names
+    )
+
+    print(f"Companies: {len(company_names)}")
+    for mode in results:
+        print(f"{mode}: {results[mode]['seconds']:.2f} s")
+    print(f"Speedup: {results['per company']['seconds'] / results['batched']['seconds']:.1f}x")
+    print(f"Max difference in mean prediction: {max_mean_diff:.6f}")
+
+    return results
+
+if __name__ == "__main__":
+    with open("assets/companies.json") as file:
+        company_info = json.load(file)
+        file.close()
+
+    with open("assets/commodities.json") as file:
+        commodity_names = json.load(file)
+        file.close()
+
+    company_names = [company_info[f"{n}"]["name"] for n in range(len(company_info))]
+    company_index = [company_info[f"{n}"]["index"] for n in range(len(company_info))]
+
+    inputs = preprocess_data(company_names, commodity_names, company_index, HISTORICAL_DAYS, time.strftime("%Y-%m-%d"))
+
+    # only companies that preprocessed without errors can be predicted
+    company_names = [company for company in company_names if company in inputs[0]]
+
+    benchmark_predictions(load_model("assets/model.h5"), company_names, inputs)
@@ -0,0 +1,88 @@
+import time
+
+from components.sentiment.sentiment_engine import SentimentEngine, clean_text
+from components.sentiment.sentiment_backends import BACKENDS
+from components.store.news_store import get_news_store
+
+# run from the project root with: python -m components.benchmark.sentiment_benchmark
+
+def load_headlines(limit=2000):
+    headlines = []
+
+    store = get_news_store()
+
+    for company in store.companies():
+        json_data = store.load(company)
+
+        for date in json_data:
+            for article in json_data[date]:
+                title = json_data[date][article].get("title")
+
+                if isinstance(title, str):
+                    headlines.append(clean_text(title))
+
+        if len(headlines) >= limit:
+            break
+
+    return headlines[:limit]
+
+def benchmark_sentiment(headlines, batch_sizes=(1, 8, 32, 64)):
+    start_time = time.time()
+    engine = SentimentEngine(cache_path=None)  # without the cache every batch size scores every headline
+    print(f"Model load: {time.time() - start_time:.2f} s")
+
+    results = {}
+
+    for batch_size in batch_sizes:
+        engine.batch_size = batch_size
+
+        start_time = time.time()
+        engine.score(headlines)
+        elapsed = time.time() - start_time
+
+        results[batch_size] = len(headlines) / elapsed
+        print(f"Batch size {batch_size}: {results[batch_size]:.1f} headlines/s")
+
+    return results
+
+def benchmark_backends(headlines, backends=BACKENDS, batch_size=32, min_agreement=0.99):
+    # headlines per second of every backend and how often it gives the same label as fp32,
+    # gives back the fastest backend that agrees often enough
+    results = {}
+    reference = None
+
+    for backend in backends:
+        try:
+            start_time = time.time()
+            engine = SentimentEngine(batch_size=batch_size, cache_path=None, backend=backend)
+            load_time = time.time() - start_time
+
+        except Exception as e:
+            print(f"{backend}: could not load, {e}")
+            continue
+
+        start_time = time.time()
+        scores = engine.score(headlines)
+        elapsed = time.time() - start_time
+
+        if reference is None:
+            reference = scores if backend == "fp32" else SentimentEngine(batch_size=batch_size, cache_path=None).score(headlines)
+
+        agreement = sum(label == reference_label for (_, label), (_, reference_label) in zip(scores, reference)) / max(len(headlines), 1)
+        max_difference = max((abs(score - reference_score) for (score, _), (reference_score, _) in zip(scores, reference)), default=0)
+
+        results[backend] = {"headlines_per_second": len(headlines) / elapsed, "agreement": agreement}
+        print(f"{backend}: load {load_time:.1f} s, {len(headlines) / elapsed:.1f} headlines/s, {agreement:.2%} same label as fp32, largest score difference {max_difference:.4f}")
+
+    within = [backend for backend in results if results[backend]["agreement"] >= min_agreement]
+    best = max(within, key=lambda backend: results[backend]["headlines_per_second"], default=None)
+    print(f"Fastest backend with at least {min_agreement:.0%} agreement: {best}")
+
+    return best, results
+
+if __name__ == "__main__":
+    headlines = load_headlines()
+    print(f"Headlines: {len(headlines)}")
+
+    benchmark_sentiment(headlines)
+    benchmark_backends(headlines)
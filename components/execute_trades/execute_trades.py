@@ -4,6 +4,7 @@ import json
 import csv
 import os
 
+from components.store.feature_store import open_store
 from components.logging.logging import write_to_log
 from components.logging.transaction_logging import write_to_transaction_log
 
@@ -37,8 +38,14 @@ Trading start at: {datetime.datetime.now()}
     print(money)
     current_prices = {}
 
+    historical_store = open_store("historical")
+
     # try:
     for company in company_names:
+        if historical_store is not None and company in historical_store: 
+            current_prices[company_symbols[company_names.index(company)]] = float(historical_store.rows(company)[0][0])
+            continue 
+        
         with open(f"data/historical/{company}.csv", "r") as file:
             reader = csv.reader(file)
             next(reader)  # skip header
@@ -0,0 +1,173 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import urllib.request
+import urllib.error
+import threading
+import datetime
+import random
+import time
+
+from components.get_data.content_cache import canonical_url
+from components.logging.logging import write_to_log
+
+# fetches article pages for many links at the same time instead of one link and a 1-3 s sleep at a time.
+# the number of workers is the global limit on open requests, every domain has a token bucket so no
+# site gets more than its rate, every request has a timeout and failed requests are retried with
+# exponential backoff. a link that still fails gets "" as content, the same as before.
+# content_fetched in the article is False until its content has been fetched, so articles that were
+# skipped or failed can be filled in by a later run.
+
+MAX_WORKERS = 16        # requests open at the same time over all domains
+DOMAIN_RATE = 0.5       # requests per second per domain
+DOMAIN_BURST = 2        # requests a domain can get at once before the rate applies
+TIMEOUT = 10            # seconds per request
+RETRIES = 3             # attempts per link
+BACKOFF = 1.0           # seconds before the first retry, doubled every retry
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.75 Safari/537.36"
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # blocks until a token is free
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+def download(url, timeout=TIMEOUT):
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read().decode(response.headers.get_content_charset() or "utf-8", errors="replace")
+
+def fetch_text(url, timeout=TIMEOUT):
+    # the article text newspaper finds in the page, like GNews.get_full_article
+    from newspaper import Article
+
+    article = Article(url)
+    article.download(input_html=download(url, timeout))
+    article.parse()
+
+    return article.text
+
+def should_retry(error):
+    # client errors other than rate limiting will not go away by asking again
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code == 429 or error.code >= 500
+
+    return True
+
+class ArticleFetcher:
+    def __init__(self, max_workers=MAX_WORKERS, domain_rate=DOMAIN_RATE, domain_burst=DOMAIN_BURST,
+                 timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF, fetch=fetch_text):
+        self.max_workers = max_workers
+        self.domain_rate = domain_rate
+        self.domain_burst = domain_burst
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.fetch = fetch
+
+        self.buckets = {}
+        self.buckets_lock = threading.Lock()
+        self.counts = {"fetched": 0, "failed": 0, "retries": 0}
+        self.counts_lock = threading.Lock()
+
+    def bucket(self, url):
+        domain = urlparse(url).netloc.lower()
+
+        with self.buckets_lock:
+            if domain not in self.buckets:
+                self.buckets[domain] = TokenBucket(self.domain_rate, self.domain_burst)
+
+            return self.buckets[domain]
+
+    def count(self, name):
+        with self.counts_lock:
+            self.counts[name] += 1
+
+    def fetch_one(self, url):
+        bucket = self.bucket(url)
+
+        for attempt in range(self.retries):
+            bucket.acquire()
+
+            try:
+                text = self.fetch(url, self.timeout)
+                self.count("fetched")
+
+                return text
+
+            except Exception as e:
+                if attempt == self.retries - 1 or not should_retry(e):
+                    break
+
+                self.count("retries")
+                time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+        self.count("failed")
+
+        return None
+
+    def fetch_all(self, urls):
+        # gives back the text of every url in the same order, None for the ones that failed
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self.fetch_one, urls))
+
+def fetch_contents(news, fetcher=None, cache=None):
+    # news is {company: {date: {article: {...}}}}, fills in the content of every article that has none
+    # or is marked as not fetched and gives back the companies that changed.
+    # every canonical url is only downloaded once, and not at all when it is in the content cache
+    fetcher = fetcher or ArticleFetcher()
+    pending = []
+
+    for company in news:
+        for date in news[company]:
+            for article in news[company][date]:
+                article_data = news[company][date][article]
+
+                if (article_data.get("content") is None or article_data.get("content_fetched") is False) and article_data.get("link"):
+                    pending.append((company, date, article))
+
+    start_time = time.time()
+
+    # the first link of every canonical url is the one that is downloaded
+    links = {}
+
+    for company, date, article in pending:
+        links.setdefault(canonical_url(news[company][date][article]["link"]), news[company][date][article]["link"])
+
+    texts = cache.get_many(list(links)) if cache is not None else {}
+    missing = [url for url in links if url not in texts]
+    fetched = dict(zip(missing, fetcher.fetch_all([links[url] for url in missing])))
+
+    if cache is not None:
+        cache.put_many(fetched)
+
+    texts.update(fetched)
+
+    for company, date, article in pending:
+        text = texts[canonical_url(news[company][date][article]["link"])]
+        news[company][date][article]["content"] = text if text is not None else ""
+        news[company][date][article]["content_fetched"] = text is not None
+
+    write_to_log(f"""Fetched {len(pending)} articles, {len(links)} unique links of which {len(links) - len(missing)} were cached, in {time.time() - start_time:.1f} s at: {datetime.datetime.now()}
+Fetched: {fetcher.counts['fetched']}, failed: {fetcher.counts['failed']}, retries: {fetcher.counts['retries']}""")
+
+    return sorted({company for company, _, _ in pending})
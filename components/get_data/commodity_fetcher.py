@@ -0,0 +1,170 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta, datetime, timezone
+from re import findall, finditer, search, sub, DOTALL
+import json
+import os
+
+from components.get_data.article_fetcher import TokenBucket, download, should_retry
+
+# gets the commodity charts without a browser where it can. the page html is downloaded with plain
+# http and the chart is read from it, either from the series data in its scripts or from a highcharts
+# path that is already in the html. the pages the browser has rendered have that path too, so the
+# same parser reads page_source for the commodities plain http could not do.
+# a series whose csv already has today's row is not fetched at all.
+
+BASE_URL = "https://tradingeconomics.com/commodity"
+COMMODITY_DIR = "data/raw_data/raw_commodity"
+MAX_WORKERS = 4      # pages downloaded at the same time
+RATE = 1.0           # pages per second, every page is on the same site
+BURST = 2
+RETRIES = 2
+PRICE_TOLERANCE = 0.05  # how far the last point of a series from the scripts may be from the latest price
+
+class NoDataError(Exception):
+    pass
+
+def commodity_file_name(commodity):
+    return commodity.replace(" ", "-").lower()
+
+def last_saved_date(commodity, directory=COMMODITY_DIR):
+    # the date of the last row of the csv, only the end of the file is read
+    try:
+        with open(f"{directory}/{commodity_file_name(commodity)}.csv", "rb") as file:
+            file.seek(0, os.SEEK_END)
+            file.seek(max(file.tell() - 256, 0))
+            lines = file.read().decode("utf-8", errors="replace").strip().splitlines()
+            file.close()
+
+        return datetime.strptime(lines[-1].split(",")[0][:10], "%Y-%m-%d").date()
+
+    except Exception:
+        return None
+
+def is_up_to_date(commodity, today=None, directory=COMMODITY_DIR):
+    saved = last_saved_date(commodity, directory)
+
+    return saved is not None and saved >= (today or date.today())
+
+def transform_price(latest_price, data_points):
+    # the chart is drawn with y going down, flipped and scaled so the last point is the latest price
+    max_y = max(y for _, y in data_points)
+    inverted_points = [(x, max_y - y + 1) for x, y in data_points]
+    scale_factor = latest_price / inverted_points[-1][1]
+
+    return [(x, y * scale_factor) for x, y in inverted_points]
+
+def get_date(x, end_date, num_points):
+    return end_date - timedelta(days=int(num_points - x - 1))
+
+def strip_tags(html):
+    return sub(r"<[^>]+>", "", html).replace("&nbsp;", " ").strip()
+
+def parse_latest_price(html):
+    # the second cell of the first row of the price table, like the xpath the browser used
+    table = search(r"<table[^>]*class=\"table\"[^>]*>.*?<tbody[^>]*>(.*?)</tbody>", html, DOTALL)
+
+    if not table:
+        return None
+
+    row = search(r"<tr[^>]*>(.*?)</tr>", table.group(1), DOTALL)
+    cells = findall(r"<td[^>]*>(.*?)</td>", row.group(1), DOTALL) if row else []
+
+    try:
+        return float(strip_tags(cells[1]).replace(",", ""))
+
+    except Exception:
+        return None
+
+def parse_script_series(html, end_date):
+    # [x, price] pairs of the first series in the chart settings of the scripts, x is a timestamp in ms
+    # or a position. only a data array inside a series object counts, other widgets of the page have
+    # data arrays too
+    match = search(r"[\"']?series[\"']?\s*:\s*\[\s*\{[^{}]*?[\"']?data[\"']?\s*:\s*(\[\s*\[\s*-?\d[^\]]*\](?:\s*,\s*\[[^\]]*\])*\s*\])", html)
+
+    if not match:
+        return None
+
+    points = [point for point in json.loads(match.group(1)) if len(point) >= 2 and point[1] is not None]
+
+    if len(points) < 2:
+        return None
+
+    if points[0][0] > 1e11:
+        return [(datetime.fromtimestamp(x / 1000, timezone.utc).strftime("%Y-%m-%d"), float(y)) for x, y, *_ in points]
+
+    return [(get_date(i, end_date, len(points)).strftime("%Y-%m-%d"), float(y)) for i, (_, y, *_) in enumerate(points)]
+
+def parse_svg_series(html, end_date):
+    # the path of the first line series, its y values are pixels that are scaled to the latest price
+    series = next((match.group(2) for match in finditer(r"<g\s[^>]*class=\"([^\"]*)\"[^>]*>(.*?)</g>", html, DOTALL)
+                   if {"highcharts-series", "highcharts-series-0", "highcharts-line-series"} <= set(match.group(1).split())), None)
+    path = search(r"<path[^>]*\sd=\"([^\"]+)\"", series) if series else None
+    latest_price = parse_latest_price(html)
+
+    if not path or latest_price is None:
+        return None
+
+    data_points = [(float(x), float(y)) for _, x, y in findall(r"([ML]) (-?\d+\.?\d*) (-?\d+\.?\d*)", path.group(1))]
+
+    if len(data_points) < 2:
+        return None
+
+    return [
+        (get_date(i, end_date, len(data_points)).strftime("%Y-%m-%d"), y)
+        for i, (_, y) in enumerate(transform_price(latest_price, data_points))
+    ]
+
+def matches_latest_price(rows, html, tolerance=PRICE_TOLERANCE):
+    latest_price = parse_latest_price(html)
+
+    return latest_price is not None and abs(rows[-1][1] - latest_price) <= tolerance * abs(latest_price)
+
+def parse_commodity_page(html, end_date=None):
+    # [(date, price)] oldest first, NoDataError when the site has no chart for it, ValueError when the
+    # chart is not in this html so the browser is tried. a series from the scripts is only used when
+    # its last point is the latest price of the page, otherwise it is not the price chart
+    end_date = end_date or date.today()
+
+    if "noDataPlacehoder" in html:
+        raise NoDataError("no data for commodity")
+
+    rows = parse_script_series(html, end_date)
+    mismatch = bool(rows) and not matches_latest_price(rows, html)
+
+    if not rows or mismatch:
+        rows = parse_svg_series(html, end_date)
+
+    if not rows:
+        raise ValueError("chart series does not match the latest price" if mismatch else "no chart data in page")
+
+    return rows
+
+class CommodityFetcher:
+    def __init__(self, base_url=BASE_URL, max_workers=MAX_WORKERS, rate=RATE, burst=BURST, retries=RETRIES, fetch=download):
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.retries = retries
+        self.fetch = fetch
+        self.bucket = TokenBucket(rate, burst)
+
+    def url(self, commodity):
+        return f"{self.base_url}/{commodity_file_name(commodity)}"
+
+    def fetch_one(self, commodity):
+        # the page html, None when it could not be downloaded
+        for attempt in range(self.retries):
+            self.bucket.acquire()
+
+            try:
+                return self.fetch(self.url(commodity))
+
+            except Exception as e:
+                if not should_retry(e):
+                    break
+
+        return None
+
+    def fetch_all(self, commodities):
+        # {commodity: html or None}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(commodities, executor.map(self.fetch_one, commodities)))
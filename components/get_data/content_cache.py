@@ -0,0 +1,171 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import threading
+import datetime
+import sqlite3
+import os
+
+from components.logging.logging import write_to_log
+
+# article text by canonical url, shared by all companies and runs. the same story often shows up in
+# the news of several companies and is only downloaded once. a failed fetch is kept for FAILED_TTL so
+# a broken link is not asked for by every company, after that it is tried again. when the texts take
+# more than MAX_BYTES the least recently used ones are dropped.
+
+CONTENT_CACHE_PATH = "data/content_cache.sqlite"
+MAX_BYTES = 200 * 1024 * 1024
+FAILED_TTL = datetime.timedelta(hours=12)
+
+# query parameters that only say where a click came from
+TRACKING_PARAMS = {"gclid", "fbclid", "ocid", "cmpid", "ref", "mc_cid", "mc_eid", "guccounter", "guce_referrer", "guce_referrer_sig"}
+
+# one cache per process, sqlite connections can not be shared with a forked process. the lock makes
+# the content workers that ask for it at the same time wait for the one that makes it
+_cache = None
+_cache_lock = threading.Lock()
+
+def canonical_url(url):
+    # scheme and host in lower case, no default port, fragment or tracking parameters, sorted query.
+    # a link that can not be parsed, like one with a port that is not a number, is its own key
+    try:
+        return parse_canonical_url(url)
+
+    except ValueError:
+        return url.strip()
+
+def parse_canonical_url(url):
+    parts = urlsplit(url.strip())
+
+    # google result links can point at a redirect with the article in q
+    if parts.netloc.lower().endswith("google.com") and parts.path == "/url":
+        params = dict(parse_qsl(parts.query))
+        target = params.get("q") or params.get("url")
+
+        if target:
+            return parse_canonical_url(target)
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+
+    if parts.port and not (scheme == "http" and parts.port == 80) and not (scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS)
+    path = parts.path.rstrip("/") or "/"
+
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+class ContentCache:
+    def __init__(self, path=CONTENT_CACHE_PATH, max_bytes=MAX_BYTES, failed_ttl=FAILED_TTL):
+        self.max_bytes = max_bytes
+        self.failed_ttl = failed_ttl
+        self.lock = threading.Lock()
+        self.counts = {"hits": 0, "failed_hits": 0, "misses": 0, "evicted": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS contents (url TEXT PRIMARY KEY, text TEXT, status TEXT, fetched TEXT, used TEXT, size INTEGER)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS contents_used ON contents (used)")
+        self.connection.commit()
+
+    def get_many(self, urls):
+        # {canonical url: text} for the urls that are cached, text is None for a recent failure.
+        # failures older than failed_ttl count as misses so they are fetched again
+        urls = list(dict.fromkeys(urls))
+        now = datetime.datetime.now()
+        found = {}
+
+        with self.lock:
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                rows = self.connection.execute(f"SELECT url, text, status, fetched FROM contents WHERE url IN ({','.join('?' * len(chunk))})", chunk)
+
+                for url, text, status, fetched in rows:
+                    if status == "ok":
+                        found[url] = text
+
+                    elif now - datetime.datetime.fromisoformat(fetched) < self.failed_ttl:
+                        found[url] = None
+
+            self.connection.executemany("UPDATE contents SET used = ? WHERE url = ?", [(now.isoformat(), url) for url in found])
+            self.connection.commit()
+
+            self.counts["hits"] += sum(1 for text in found.values() if text is not None)
+            self.counts["failed_hits"] += sum(1 for text in found.values() if text is None)
+            self.counts["misses"] += len(urls) - len(found)
+
+        return found
+
+    def put_many(self, results):
+        # results is {canonical url: text}, None for a failed fetch
+        now = datetime.datetime.now().isoformat()
+
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO contents VALUES (?, ?, ?, ?, ?, ?)",
+                [(url, text or "", "ok" if text is not None else "failed", now, now, len((text or "").encode("utf-8")))
+                 for url, text in results.items()]
+            )
+            self.connection.commit()
+
+        self.evict()
+
+    def evict(self):
+        # drops the least recently used texts until the cache is under max_bytes
+        with self.lock:
+            total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM contents").fetchone()[0]
+
+            if total <= self.max_bytes:
+                return 0
+
+            removed = []
+
+            for url, size in self.connection.execute("SELECT url, size FROM contents ORDER BY used"):
+                if total <= self.max_bytes:
+                    break
+
+                removed.append((url,))
+                total -= size
+
+            self.connection.executemany("DELETE FROM contents WHERE url = ?", removed)
+            self.connection.commit()
+            self.counts["evicted"] += len(removed)
+
+        return len(removed)
+
+    def report(self):
+        counts = dict(self.counts)
+        lookups = counts["hits"] + counts["failed_hits"] + counts["misses"]
+
+        write_to_log(f"""Article content cache: {counts['hits']} hits, {counts['failed_hits']} recent failures, {counts['misses']} misses, {counts['hits'] / max(lookups, 1):.0%} hit rate, {counts['evicted']} evicted at: {datetime.datetime.now()}""")
+
+        return counts
+
+def get_content_cache():
+    global _cache
+
+    if _cache is None or _cache[0] != os.getpid():
+        with _cache_lock:
+            if _cache is None or _cache[0] != os.getpid():
+                _cache = (os.getpid(), ContentCache())
+
+    return _cache[1]
+
+def reset_after_fork():
+    # a forked child makes its own cache, the lock could have been held by a thread it does not have
+    global _cache_lock
+    _cache_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+if __name__ == "__main__":
+    # run from the project root with: python -m components.get_data.content_cache
+    cache = get_content_cache()
+
+    with cache.lock:
+        count, size, failed = cache.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0), SUM(status = 'failed') FROM contents").fetchone()
+
+    print(f"{count} articles, {failed or 0} failed, {size / 1024 / 1024:.1f} MB of {cache.max_bytes / 1024 / 1024:.0f} MB")
@@ -0,0 +1,159 @@
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver import ChromeOptions
+from selenium import webdriver
+from stem import Signal
+import threading
+import datetime
+import random
+import queue
+import time
+
+from components.logging.logging import write_to_log
+
+# keeps headless chrome instances alive across companies instead of starting chrome for every company
+# and every retry. a driver is handed to one company at a time and goes back to the pool after it,
+# it is quit and replaced by a new one after MAX_PAGES pages or when google shows it the consent or
+# sorry page. a new driver gets a new tor ip and user agent, like a new chrome did before.
+# images, fonts and stylesheets are never downloaded, the titles and links are in the html.
+
+POOL_SIZE = 3        # chrome instances alive at the same time, also the companies scraped in parallel
+MAX_PAGES = 25       # pages a driver loads before it is replaced
+TOR_PROXY = "socks5://127.0.0.1:9150"
+BLOCKED_URLS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.css"]
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.75 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:99.0) Gecko/20100101 Firefox/99.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.1108.62 Safari/537.36 Edg/98.0.1108.62"
+]
+
+def renew_tor_ip(controller):
+    controller.authenticate("oadjaoi123")
+    controller.signal(Signal.NEWNYM)
+
+def chrome_options(user_agent, proxy=None):
+    options = ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--incognito")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-infobars")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument(f"--user-agent={user_agent}")
+    options.page_load_strategy = "eager"
+
+    if proxy:
+        options.add_argument(f"--proxy-server={proxy}")
+
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+        "profile.managed_default_content_settings.fonts": 2
+    })
+
+    return options
+
+class PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.recycle = False
+
+    def get(self, pool, url):
+        # loads a page and marks the driver for replacement when google has noticed it
+        start_time = time.time()
+        self.driver.get(url)
+        self.pages += 1
+
+        pool.count("page_seconds", time.time() - start_time)
+        pool.count("pages")
+
+        if "https://consent.google.com/" in self.driver.current_url or "https://www.google.com/sorry/index" in self.driver.current_url:
+            self.recycle = True
+
+class DriverPool:
+    def __init__(self, size=POOL_SIZE, max_pages=MAX_PAGES, controller=None, proxy=TOR_PROXY, user_agents=USER_AGENTS):
+        self.size = size
+        self.max_pages = max_pages
+        self.controller = controller
+        self.proxy = proxy
+        self.user_agents = user_agents
+
+        # one chromedriver binary for all drivers, every driver runs its own chromedriver process
+        self.driver_path = ChromeDriverManager().install()
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.counts = {"started": 0, "recycled": 0, "startup_seconds": 0, "pages": 0, "page_seconds": 0}
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def start_driver(self):
+        start_time = time.time()
+
+        if self.controller is not None:
+            # stem is not thread safe and tor only gives a new circuit every few seconds anyway
+            with self.lock:
+                renew_tor_ip(self.controller)
+
+        driver = webdriver.Chrome(service=Service(self.driver_path), options=chrome_options(random.choice(self.user_agents), self.proxy))
+
+        # the prefs do not cover everything, chrome drops the rest of the blocked files by url
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+
+        except Exception as e:
+            write_to_log(f"""Could not block resources in the news driver at: {datetime.datetime.now()}
+Error: {e}""")
+
+        self.count("started")
+        self.count("startup_seconds", time.time() - start_time)
+
+        return PooledDriver(driver)
+
+    def acquire(self):
+        # the pool is used by at most size threads, so an idle driver or a new one is always fine
+        try:
+            return self.idle.get_nowait()
+
+        except queue.Empty:
+            return self.start_driver()
+
+    def release(self, pooled, failed=False):
+        # a driver that failed, was noticed by google or has loaded enough pages is replaced
+        if failed or pooled.recycle or pooled.pages >= self.max_pages:
+            self.count("recycled")
+            self.quit(pooled)
+
+        else:
+            self.idle.put(pooled)
+
+    def quit(self, pooled):
+        try:
+            pooled.driver.quit()
+
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                self.quit(self.idle.get_nowait())
+
+            except queue.Empty:
+                break
+
+    def report(self):
+        counts = dict(self.counts)
+
+        write_to_log(f"""News driver pool of {self.size} at: {datetime.datetime.now()}
+Drivers started: {counts['started']} in {counts['startup_seconds']:.1f} s, {counts['startup_seconds'] / max(counts['started'], 1):.1f} s each, {counts['recycled']} recycled
+Pages loaded: {counts['pages']} in {counts['page_seconds']:.1f} s, {counts['page_seconds'] / max(counts['pages'], 1):.1f} s each""")
+
+        return counts
@@ -2,39 +2,59 @@ from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.chrome.service import Service
-from datetime import date, timedelta, datetime
+from datetime import date, datetime
 from selenium.webdriver import ChromeOptions
 from selenium.webdriver.common.by import By
 from selenium.webdriver import Chrome
 from time import sleep
-from re import findall
 import csv
 import os
 
+from components.get_data.commodity_fetcher import CommodityFetcher, NoDataError, parse_commodity_page, is_up_to_date, commodity_file_name
 from components.logging.logging import write_to_log
 from components.misc.progress_bar import print_progress_bar
 
 # import plotly.express as px
 # from pyvirtualdisplay import Display
 
-def get_latest_price(driver):
+def start_browser(): 
+    options = ChromeOptions()
+    options.add_argument("--incognito")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-infobars")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--page-load-strategy=eager")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_argument("--window-position=-1920,0")
+
+    driver = Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    
+    sleep(2)
+    
+    driver.get(f"https://tradingeconomics.com/commodity/Gold")
+    
     try:
-        price_element = driver.find_element(By.XPATH, "//table[@class='table']/tbody/tr[1]/td[2]")
-        return float(price_element.text)
+        reject_button = driver.find_element(By.XPATH, "//p[@class='fc-button-label']")
+        reject_button.click()
     
-    except Exception as e:
-        write_to_log(f"""Error getting latest price for commodity:{e}""")
-        return None
-
-def transform_price(latest_price, data_points):
-    max_y = max(y for _, y in data_points)
-    inverted_points = [(x, max_y - y + 1) for x, y in data_points]
-    scale_factor = latest_price / inverted_points[-1][1]
+    except: 
+        pass
     
-    return [(x, y * scale_factor) for x, y in inverted_points]
+    return driver
 
-def get_date(x, end_date, num_points):
-    return end_date - timedelta(days=int(num_points - x - 1))
+def render_page(driver, commodity): 
+    # the html after the chart has been drawn, it is read by the same parser as the plain http pages 
+    driver.get(f"https://tradingeconomics.com/commodity/{commodity_file_name(commodity)}")
+    
+    if not driver.find_elements(By.CLASS_NAME, "noDataPlacehoder"):
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "g.highcharts-series.highcharts-series-0.highcharts-line-series"))
+        )
+        
+    return driver.page_source
 
 def save_to_csv(data, filename):
     file_exists = os.path.isfile(filename)
@@ -56,7 +76,18 @@ def save_to_csv(data, filename):
             csv_writer.writerow(["Date", "Price"])
             csv_writer.writerows(data)
 
-def get_commodity_data(commodities):
+def save_commodity(commodity, html):
+    if html is None: 
+        raise Exception("failed to download the page")
+    
+    transformed_data = parse_commodity_page(html, date.today())
+    save_to_csv(transformed_data, f"data/raw_data/raw_commodity/{commodity_file_name(commodity)}.csv")
+    
+    return transformed_data
+
+def get_commodity_data(commodities, force=False, fetcher=None):
+    # commodities whose csv already has today's row are skipped unless force is set. the others are 
+    # downloaded without a browser, chrome is only started for the pages that could not be read that way 
     write_to_log(f"Commodity scraping start at: {datetime.now()}")
     
     # for os with no gui 
@@ -67,80 +98,70 @@ def get_commodity_data(commodities):
     index = 0 
     fails = 0 
     successes = 0
-
-    options = ChromeOptions()
-    options.add_argument("--incognito")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-infobars")
-    options.add_argument("--disable-extensions")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--page-load-strategy=eager")
-    options.add_argument("--blink-settings=imagesEnabled=false")
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_argument("--window-position=-1920,0")
-
-    driver = Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    
-    sleep(2)
     
-    driver.get(f"https://tradingeconomics.com/commodity/Gold")
+    stale = [commodity for commodity in commodities if force or not is_up_to_date(commodity)]
+    successes += len(commodities) - len(stale)
     
-    try:
-        reject_button = driver.find_element(By.XPATH, "//p[@class='fc-button-label']")
-        reject_button.click()
+    write_to_log(f"Skipped {len(commodities) - len(stale)} commodities that are up to date at: {datetime.now()}")
     
-    except: 
-        pass
+    pages = (fetcher or CommodityFetcher()).fetch_all(stale) if stale else {}
+    browser_commodities = []
 
-    for commodity in commodities:
-        print_progress_bar(index, len(commodities), description="Scraping commodity: ")
+    for commodity in stale:
+        print_progress_bar(index, len(stale), description="Scraping commodity: ")
         index += 1 
         
         try:
-            commodity_name = commodity.replace(" ", "-").lower()
-            driver.get(f"https://tradingeconomics.com/commodity/{commodity_name}")
+            data[commodity] = save_commodity(commodity, pages[commodity])
+            successes += 1 
             
-            if driver.find_elements(By.CLASS_NAME, "noDataPlacehoder"):
-                write_to_log(f"commodity {commodity} not found")
-                continue
+        except NoDataError: 
+            write_to_log(f"commodity {commodity} not found")
             
-            latest_price = get_latest_price(driver)
-            if latest_price is None:
-                raise Exception("failed to get latest price")
-
-            # extract graph data
-            graph = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "g.highcharts-series.highcharts-series-0.highcharts-line-series"))
-            )
-            data_string = graph.find_element(By.TAG_NAME, "path").get_attribute("d")
-            data_points = [(float(x), float(y)) for _, x, y in findall(r"([ML]) (-?\d+\.?\d*) (-?\d+\.?\d*)", data_string)]
-
-            # transform and save data
-            end_date = date.today()
-            transformed_data = [
-                (get_date(i, end_date, len(data_points)).strftime("%Y-%m-%d"), y)
-                for i, (_, y) in enumerate(transform_price(latest_price, data_points))
-            ]
-
-            csv_filename = f"data/raw_data/raw_commodity/{commodity_name}.csv"
-            save_to_csv(transformed_data, csv_filename)
-            
-            data[commodity] = transformed_data
-            sleep(1)
+        except Exception as e:
+            browser_commodities.append(commodity)
             
-            successes += 1 
+    if browser_commodities: 
+        write_to_log(f"Falling back to the browser for {len(browser_commodities)} commodities at: {datetime.now()}")
+        
+        try: 
+            driver = start_browser()
             
-        except Exception as e:
-            write_to_log(f"""Error getting commodity data for {commodity}
+        except Exception as e: 
+            driver = None 
+            write_to_log(f"""Could not start the browser for commodity scraping
 Error: {e}
 At: {datetime.now()}""")
-            sleep(2)
             
-            fails += 1 
-            continue            
+        index = 0 
+        
+        for commodity in browser_commodities: 
+            print_progress_bar(index, len(browser_commodities), description="Scraping commodity in the browser: ")
+            index += 1 
+            
+            try:
+                if driver is None: 
+                    raise Exception("no browser")
+                
+                data[commodity] = save_commodity(commodity, render_page(driver, commodity))
+                sleep(1)
+                
+                successes += 1 
+                
+            except NoDataError: 
+                write_to_log(f"commodity {commodity} not found")
+                
+            except Exception as e:
+                write_to_log(f"""Error getting commodity data for {commodity}
+Error: {e}
+At: {datetime.now()}""")
+                sleep(2)
+                
+                fails += 1 
+                continue            
 
-    driver.quit()
+        if driver is not None: 
+            driver.quit()
 
     write_to_log(f"Commodity scraping done with {fails} fails and {successes} successes")
 
@@ -149,4 +170,4 @@ At: {datetime.now()}""")
 Scrapes done: {successes + fails}
 Total commodities: {len(commodities)}""")
         
-    return data
\ No newline at end of file
+    return data
@@ -7,7 +7,141 @@ import logging
 from components.logging.logging import write_to_log
 from components.misc.progress_bar import print_progress_bar
 
-def get_historical_data(symbols, names, period):
+def read_last_row(filename):
+    # date of the last row in a raw csv and where that row starts, without reading the whole file
+    with open(filename, "rb") as file:
+        file.seek(0, 2)
+        size = file.tell()
+        block = min(size, 4096)
+        file.seek(size - block)
+        tail = file.read(block).rstrip(b"\r\n")
+        file.close()
+
+    start = tail.rfind(b"\n") + 1
+
+    try:
+        date = datetime.datetime.strptime(tail[start:].split(b",")[0].decode()[:10], "%Y-%m-%d").date()
+
+    except ValueError:
+        return None, None  # only the header
+
+    return date, size - block + start
+
+def symbol_frame(data, symbol):
+    df = pd.DataFrame({
+        "Date": data.index,
+        "Open": data[("Open", symbol)],
+        "High": data[("High", symbol)],
+        "Low": data[("Low", symbol)],
+        "Close": data[("Close", symbol)],
+        "Volume": data[("Volume", symbol)]
+    })
+
+    # a multi ticker download has rows for every date any of the tickers traded
+    df = df.dropna(subset=["Close"]).reset_index(drop=True)
+    df["Date"] = pd.to_datetime(df["Date"]).dt.strftime("%Y-%m-%d")
+
+    if not df["Volume"].isna().any():
+        df["Volume"] = df["Volume"].round().astype("int64")
+
+    return df
+
+def append_rows(filename, df, last_date, last_row_start):
+    # only writes the rows from the last stored date on, the last stored row is replaced since it
+    # can be from a day that had not closed yet
+    new_rows = df[df["Date"] >= last_date.strftime("%Y-%m-%d")]
+
+    if len(new_rows) == 0:
+        return 0
+
+    with open(filename, "r+b") as file:
+        if new_rows["Date"].iloc[0] == last_date.strftime("%Y-%m-%d"):
+            file.truncate(last_row_start)
+
+        else:
+            file.seek(-1, 2)
+            if file.read(1) not in (b"\n", b"\r"):
+                file.write(b"\n")
+
+        file.close()
+
+    new_rows.to_csv(filename, mode="a", header=False, index=False, lineterminator="\n")
+
+    return len(new_rows)
+
+def get_historical_data_bulk(symbols, names, period, chunk_size=50, downloader=download):
+    # one multi ticker download per chunk of symbols, symbols that already have data only get
+    # the days from their last stored date on
+    write_to_log(f"Historical bulk scraping start at: {datetime.datetime.now()}")
+
+    prices = {}
+    fails = 0
+    successes = 0
+    groups = {}
+
+    for symbol in symbols:
+        filename = f"data/raw_data/raw_historical/{names[symbols.index(symbol)]}.csv"
+        last_date, last_row_start = read_last_row(filename) if os_path.exists(filename) else (None, None)
+        groups.setdefault(last_date, []).append((symbol, filename, last_date, last_row_start))
+
+    chunks = [group[n:n + chunk_size] for group in groups.values() for n in range(0, len(group), chunk_size)]
+    index = 0
+
+    for chunk in chunks:
+        print_progress_bar(index, len(chunks), description="Scraping historical: ")
+        index += 1
+
+        chunk_symbols = [symbol for symbol, _, _, _ in chunk]
+        last_date = chunk[0][2]
+
+        try:
+            if last_date is None:
+                data = downloader(chunk_symbols, period=period, interval="1d", progress=False, group_by="column")
+            else:
+                data = downloader(chunk_symbols, start=last_date.strftime("%Y-%m-%d"), interval="1d", progress=False, group_by="column")
+
+        except Exception as e:
+            write_to_log(f"""Error getting historical data for {chunk_symbols}
+Error: {e}
+At: {datetime.datetime.now()}""")
+            fails += len(chunk)
+            continue
+
+        for symbol, filename, last_date, last_row_start in chunk:
+            try:
+                df = symbol_frame(data, symbol) if len(data) > 0 else pd.DataFrame(columns=["Date", "Open", "High", "Low", "Close", "Volume"])
+
+                if last_date is not None:
+                    append_rows(filename, df, last_date, last_row_start)
+
+                elif len(df) > 0:
+                    df.to_csv(filename, index=False)
+
+                prices[symbol] = df.to_dict("list")
+                successes += 1
+
+            except Exception as e:
+                write_to_log(f"""Error getting historical data for {symbol}
+Error: {e}
+At: {datetime.datetime.now()}""")
+                fails += 1
+
+    write_to_log(f"Historical bulk scraping done with {fails} fails and {successes} successes in {len(chunks)} downloads")
+
+    if successes + fails != len(symbols): 
+        write_to_log(f"""Something is wrong in historical scraping, the times scraped do not match the number of companies. 
+Scrapes done: {successes + fails}
+Total companies: {len(symbols)}""")
+        
+        if fails > successes: 
+            raise Exception("Something is very wrong with historical scraping")
+
+    return prices
+
+def get_historical_data(symbols, names, period, bulk=False, chunk_size=50, downloader=download):
+    if bulk:
+        return get_historical_data_bulk(symbols, names, period, chunk_size, downloader)
+
     write_to_log(f"Historical scraping start at: {datetime.datetime.now()}")
     
     prices = {}
@@ -22,7 +156,7 @@ def get_historical_data(symbols, names, period):
         try: 
             prices[symbol] = {}
             
-            data = download(symbol, period=period, interval="1d", progress=False)
+            data = downloader(symbol, period=period, interval="1d", progress=False)
 
             if len(data) > 0:
                 df = pd.DataFrame({
@@ -1,80 +1,65 @@
 import datetime
 from urllib.parse import quote
-from gnews import GNews
 import random
-import json
 import time
-from stem import Signal
+import queue
+import threading
 from stem.control import Controller
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # for selenium scraping 
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver import ChromeOptions
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium import webdriver
-from collections import OrderedDict
-
-# for article sentiment analysis 
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-import re
 
+from components.get_data.article_fetcher import fetch_contents, ArticleFetcher
+from components.get_data.content_cache import get_content_cache
+from components.store.news_store import get_news_store
+from components.get_data.driver_pool import DriverPool, POOL_SIZE
+from components.get_data.news_pipeline import StageStats, take_batch, DONE, QUEUE_SIZE, FETCH_WORKERS
+from components.sentiment.sentiment_engine import get_sentiment_engine, SENTIMENT_SOURCE
 from components.logging.logging import write_to_log
 from components.misc.progress_bar import print_progress_bar  
 
-def renew_tor_ip(controller):
-    controller.authenticate("oadjaoi123")
-    controller.signal(Signal.NEWNYM)
-
 def random_delay(min_seconds=1, max_seconds=3):
     time.sleep(random.uniform(min_seconds, max_seconds))
 
-def fetch_article_titles(company_name, period, controller, user_agents, tor_proxy, service):
+def fetch_article_titles(company_name, period, pool):
     dates = []
-
-    try: 
-        with open(f"data/raw_data/raw_news/{company_name}.json", "r") as file:
-            news_data = json.load(file)
-            file.close()
-            
-    except:
-        news_data = {}
+    store = get_news_store()
+    scraped = store.dates(company_name)
 
     for n in range(period):
         date = datetime.datetime.now() - datetime.timedelta(days=n)
         date = date.strftime('%Y-%m-%d')
         
-        if date not in news_data: 
+        if date not in scraped: 
             dates.append(date)
             
-    if dates != []: 
-        renew_tor_ip(controller)
-        random_user_agent = random.choice(user_agents)
+    if dates == []: 
+        return store.load(company_name)
+    
+    # a driver from the pool, it goes back or is replaced when the company is done 
+    pooled = pool.acquire()
+    failed = True 
+    
+    try: 
+        scrape_dates(company_name, dates, store, pool, pooled)
+        failed = False 
+        
+    finally: 
+        pool.release(pooled, failed)
 
-        options = ChromeOptions()
-        options.add_argument("--incognito")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--disable-infobars")
-        options.add_argument("--disable-extensions")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--page-load-strategy=eager")
-        options.add_argument(f"--user-agent={random_user_agent}")
-        options.add_argument(f'--proxy-server={tor_proxy}')
-        options.add_argument("--window-position=-1920,0")
+    return store.load(company_name)
 
-        driver = webdriver.Chrome(service=service, options=options)
-    else: 
-        return news_data
+def scrape_dates(company_name, dates, store, pool, pooled): 
+    driver = pooled.driver
 
     for date in dates:
         date_str = datetime.datetime.strptime(date, '%Y-%m-%d').strftime('%m/%d/%Y')
-        news_data[date] = {}
+        articles_data = {}
         
         random_delay(1, 2)
         
-        driver.get(f"https://www.google.com/search?q={company_name}&tbm=nws&hl=en&gl=us&tbs=cdr:1,cd_min:{date_str},cd_max:{date_str}")
+        pooled.get(pool, f"https://www.google.com/search?q={company_name}&tbm=nws&hl=en&gl=us&tbs=cdr:1,cd_min:{date_str},cd_max:{date_str}")
         
         if "https://consent.google.com/" in driver.current_url:
             for i in range(3): 
@@ -88,8 +73,7 @@ def fetch_article_titles(company_name, period, controller, user_agents, tor_prox
                     random_delay(1, 2)
                     
         elif "https://www.google.com/sorry/index" in driver.current_url:
-            driver.quit()
-            int("google blocking")
+            raise Exception("google blocking")
 
         for i in range(4): 
             if driver.find_elements(By.CLASS_NAME, "XIzzdf") != []: 
@@ -111,7 +95,7 @@ def fetch_article_titles(company_name, period, controller, user_agents, tor_prox
                 
             link = driver.find_elements(By.CLASS_NAME, "WlydOe")[i].get_attribute("href")
             
-            news_data[date][i] = {
+            articles_data[i] = {
                 "title": title,
                 "link": link,
                 "snippet": snippet,
@@ -119,18 +103,12 @@ def fetch_article_titles(company_name, period, controller, user_agents, tor_prox
                 "sentiment": None,
                 "probability": None,
                 "content": None,
+                "content_fetched": False,
                 "description": None
             }  
             
-        news_data = OrderedDict(sorted(news_data.items(), key=lambda x: datetime.datetime.strptime(x[0], "%Y-%m-%d"), reverse=True))
-
-        with open(f"data/raw_data/raw_news/{company_name}.json", "w") as file:
-            json.dump(news_data, file, indent=4)
-            file.close()
-
-    driver.quit()
-
-    return news_data
+        # only the new date is written, the dates scraped before are not touched 
+        store.add_date(company_name, date, articles_data)
           
 # def fetch_article_titles(company_name, period): 
 #     dates = []
@@ -202,192 +180,199 @@ def fetch_article_titles(company_name, period, controller, user_agents, tor_prox
 #     return news_data
 
 def get_article_content(company, links):
-    google_news = GNews(language="en", max_results=10)
-    # MAX_RETRIES = 3
+    # fetches the missing content of one company, links that are in the content cache are not downloaded 
+    fetch_contents({company: links}, cache=get_content_cache())
+    get_news_store().update({company: links}, ["content", "content_fetched"])
+        
+    return links
 
+def fill_article_content(companies, fetcher=None):
+    # fetches the content of the articles earlier runs skipped or failed, for when it is needed later. 
+    # only those articles are loaded and written back 
+    store = get_news_store()
+    news = store.unfetched(companies)
     
-    for date_str, articles in links.items():
-        for i, article in articles.items():
-            if article["content"] is not None:
-                continue
-            
-            try:
-                article_text = google_news.get_full_article(article["link"]).text
-            except Exception as e:
-                article_text = ""
-
-            article["content"] = article_text
+    fetch_contents(news, fetcher, get_content_cache())
+    store.update(news, ["content", "content_fetched"])
             
-            # for attempt in range(MAX_RETRIES):
-            #     try:
-            #         link = article["link"]
-            #         snippet = article["snippet"]
-            #         driver.get(link)
-                    
-            #         WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                    
-            #         # use newspaper3k to extract article content
-            #         article_obj = Article(link)
-            #         article_obj.download()
-            #         article_obj.parse()
-            #         article_text = article_obj.text
-                    
-            #         if (SequenceMatcher(None, snippet, article_text).ratio() < 0.5 and ("cookie" in article_text.lower() or "cookies" in article_text.lower())):
-            #             try:
-            #                 accept_button = WebDriverWait(driver, 5).until(
-            #                     EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Accept') or contains(text(), 'OK') or contains(text(), 'Godkänn alla') or contains(text(), 'consent') or contains(text(), 'Consent') or contains(text(), 'Godkänn') or contains(text(), 'Acceptera') or contains(text(), 'Tillåt') or contains(text(), 'Godkänn alla cookies') or contains(text(), 'Accept all cookies') or contains(text(), 'Acceptera alla') or contains(text(), 'Acceptera alla cookies') or contains(text(), 'Accept all') or contains(text(), 'Accept all cookies')]"))
-            #                 )
-            #                 accept_button.click()
-            #                 driver.get(link)
-                            
-            #                 WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                            
-            #                 # Re-extract article content after handling cookie consent
-            #                 article_obj = Article(link)
-            #                 article_obj.download()
-            #                 article_obj.parse()
-            #                 article_text = article_obj.text
-                            
-            #             except Exception as e:
-            #                 pass
-                        
-            #         if article_text == "":
-            #             try:
-            #                 article_text = google_news.get_full_article(driver.current_url).text
-            #             except Exception as e:
-            #                 article_text = "Error"
-
-            #         article["content"] = article_text
-            #         print(article_text)
-            #         break
-
-            #     except Exception as e:
-            #         if attempt < MAX_RETRIES - 1:
-            #             random_delay()
-            #         else:
-            #             article["content"] = "Error"
-
-            random_delay()
-
-    with open(f"data/raw_data/raw_news/{company}.json", "w") as file:
-        json.dump(links, file, indent=4)
+    return news
 
 def estimate_sentiment(news):
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-    model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert").to(device)
-    labels = ["positive", "negative", "neutral"]
-
-    if news:
-        tokens = tokenizer(news, return_tensors="pt", padding=True).to(device)
-        result = model(tokens["input_ids"], attention_mask=tokens["attention_mask"])["logits"]
-        result = torch.nn.functional.softmax(torch.sum(result, 0), dim=-1)
-        probability = result[torch.argmax(result)].item()
-        sentiment = labels[torch.argmax(result)]
-        
-        return probability, sentiment
-    
-    else:
-        return 0, labels[-1]
+    # the model is loaded once per process by the shared engine
+    return get_sentiment_engine().score([news])[0]
 
 def perform_sentiment_analysis(company):
-    with open(f"data/raw_data/raw_news/{company}.json", "r") as file:
-        json_data = json.load(file)
-        file.close()
-
-    for date in json_data:
-        for article in json_data[date]:
-            try:
-                if json_data[date][article].get("score") is not None:
-                    continue
-
-                content = json_data[date][article]["title"]
-                content = content.replace(".", ". ").replace(" ", " ").replace("\n", " ")
-
-                # if content in ("error", "", "null") or content is None or len(content) < 30:
-                #     content = json_data[date][article]["title"]
-                #     content = content.replace(".", ". ").replace(" ", " ").replace("\n", " ")
-                #     if content in ("error", "", "null") or content is None:
-                #         continue
+    return get_sentiment_engine().score_companies([company])[company]
 
-                content = re.sub(r"[^\x00-\x7F]+", " ", content)
-                try:
-                    probability, sentiment = estimate_sentiment(content)
-                    
-                except:
+def fetch_company_titles(company, period, pool): 
+    # the dates written before a failed try are kept, so a retry only scrapes the ones still missing 
+    for i in range(10): 
+        try:      
+            return fetch_article_titles(company, period, pool)
+            
+        except Exception as e: 
+            if i == 9: 
+                write_to_log(f"""Failed to get news titles for {company} at: {datetime.datetime.now()}
+Error: {e}""")
+                raise 
+
+def title_worker(company, period, pool, stats, fetch_queue): 
+    # the company goes on even when its titles failed, its older unscored headlines are still scored 
+    start_time = time.time()
+    
+    try: 
+        return fetch_company_titles(company, period, pool)
+    
+    finally: 
+        stats.add("titles", "busy", time.time() - start_time)
+        stats.add("titles", "companies", 1)
+        stats.put("titles", fetch_queue, company)
+        
+def content_worker(fetch_queue, score_queue, stats, fetch_content, fetcher): 
+    while True: 
+        company = stats.take("content", fetch_queue)
+        
+        if company is DONE: 
+            stats.put("content", score_queue, DONE)
+            return 
+        
+        start_time = time.time()
+        
+        if fetch_content: 
+            try: 
+                fill_article_content([company], fetcher)
+                
+            except Exception as e: 
+                write_to_log(f"""Failed to fetch news article content of {company} at: {datetime.datetime.now()}
+Error: {e}""")
+                stats.fail([company])
+                
+        stats.add("content", "busy", time.time() - start_time)
+        stats.add("content", "companies", 1)
+        stats.put("content", score_queue, company)
+        
+def score_worker(score_queue, stats, producers, scored): 
+    # loads the model while the first companies are still being scraped, every batch tries again if it fails 
+    try: 
+        get_sentiment_engine()
+        
+    except Exception as e: 
+        write_to_log(f"""Failed to load the sentiment model at: {datetime.datetime.now()}
+Error: {e}""")
+    
+    done = 0 
+    
+    while done < producers: 
+        batch = take_batch(stats, "sentiment", score_queue)
+        batch_companies = [company for company in batch if company is not DONE]
+        done += len(batch) - len(batch_companies)
+        
+        if batch_companies == []: 
+            continue 
+        
+        start_time = time.time()
+        
+        try: 
+            scored.update(get_sentiment_engine().score_companies(batch_companies))
+            
+        except Exception as e: 
+            write_to_log(f"""Failed to run sentiment analysis on news at: {datetime.datetime.now()}
+Error: {e}""")
+            
+            if len(batch_companies) == 1: 
+                stats.fail(batch_companies)
+            
+            else: 
+                # one company at a time so only the companies that fail on their own are counted as fails 
+                for company in batch_companies: 
                     try: 
-                        content = content[:2000].rsplit(" ", 1)[0]
-                        probability, sentiment = estimate_sentiment(content)
+                        scored.update(get_sentiment_engine().score_companies([company]))
                         
-                    except: 
-                        content = content[:1500].rsplit(" ", 1)[0]
-                        probability, sentiment = estimate_sentiment(content)     
-                
-                json_data[date][article]["score"] = probability
-                json_data[date][article]["finbert_sentiment"] = sentiment
-
-            except:
-                continue
-
-    with open(f"data/raw_data/raw_news/{company}.json", "w") as file:
-        json.dump(json_data, file, indent=4)  
-        file.close()
-
-    return json_data
-
-def get_news_data(companies, period):
+                    except Exception as e: 
+                        write_to_log(f"""Failed to run sentiment analysis on {company} news at: {datetime.datetime.now()}
+Error: {e}""")
+                        stats.fail([company])
+            
+        stats.add("sentiment", "busy", time.time() - start_time)
+        stats.add("sentiment", "companies", len(batch_companies))
+
+def get_news_data(companies, period, content="lazy", pool_size=POOL_SIZE):
+    # content is eager to always fetch the article content, lazy to only fetch it when the sentiment is 
+    # scored on the content, or skip. skipped articles keep content_fetched False for fill_article_content 
+    # pool_size companies are scraped at the same time, each with a chrome from the driver pool. a company 
+    # goes on to the content fetchers and the sentiment model as soon as its titles are done, see news_pipeline.py 
     write_to_log(f"News scraping start at: {datetime.datetime.now()}")
     
     news = {}
+    scored = {}
     fails = 0
     index = 0 
     successes = 0  
+    succeeded = set()
+    
+    fetch_content = not (content == "skip" or (content == "lazy" and SENTIMENT_SOURCE == "title"))
+    
+    if not fetch_content: 
+        write_to_log(f"Skipped fetching article content, content mode {content} and sentiment source {SENTIMENT_SOURCE} at: {datetime.datetime.now()}")
+    
+    pool = DriverPool(pool_size, controller=Controller.from_port(port=9051))
+    stats = StageStats(["titles", "content", "sentiment"])
+    fetch_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    score_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    
+    # one fetcher for all content workers so the per domain rate limits hold over all of them 
+    fetcher = ArticleFetcher()
+    workers = [threading.Thread(target=content_worker, args=(fetch_queue, score_queue, stats, fetch_content, fetcher)) for _ in range(FETCH_WORKERS)]
+    workers.append(threading.Thread(target=score_worker, args=(score_queue, stats, FETCH_WORKERS, scored)))
+    
+    for worker in workers: 
+        worker.start()
     
-    service = Service(ChromeDriverManager().install())
-    controller = Controller.from_port(port=9051)
-    tor_proxy = "socks5://127.0.0.1:9150"
-    user_agents = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.75 Safari/537.36",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:99.0) Gecko/20100101 Firefox/99.0",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Safari/605.1.15",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.1108.62 Safari/537.36 Edg/98.0.1108.62"
-    ]
+    print_progress_bar(index, len(companies), description="Scraping news: ")
     
-    for company in companies:
-        print_progress_bar(index, len(companies), description="Scraping news: ")
-        index += 1 
-         
-        news[company] = {}
+    try: 
+        with ThreadPoolExecutor(max_workers=pool_size) as executor: 
+            futures = {executor.submit(title_worker, company, period, pool, stats, fetch_queue): company for company in companies}
+            
+            for future in as_completed(futures): 
+                company = futures[future]
+                news[company] = {}
+                index += 1 
+                print_progress_bar(index, len(companies), description="Scraping news: ")
+                
+                try: 
+                    news[company] = future.result()
+                    succeeded.add(company)
+                    successes += 1   
         
-        try: 
-            for i in range(10): 
-                try:      
-                    # get news article titles 
-                    titles = fetch_article_titles(company, period, controller, user_agents, tor_proxy, service)
-                    news[company] = titles
+                except Exception as e: 
+                    fails += 1
+                    write_to_log(f"Failed to process {company} news at: {datetime.datetime.now()}")
                     
-                    break
-                    
-                except: 
-                    if i == 9: 
-                        write_to_log(f"Failed to get news titles for {company} at: {datetime.datetime.now()}")
-                
-            # get news article content 
-            content = get_article_content(company, titles)
-            news[company] = content
+    finally: 
+        pool.close()
+        pool.report()
+        
+        # the content workers stop when they see DONE and pass it on to the scorer 
+        for _ in range(FETCH_WORKERS): 
+            fetch_queue.put(DONE)
             
-            # get sentiment from content 
-            sentiment = perform_sentiment_analysis(company)     
-            news[company] = sentiment
-                        
-            successes += 1   
-
-        except Exception as e: 
-            fails += 1
-            write_to_log(f"Failed to process {company} news at: {datetime.datetime.now()}")
+        for worker in workers: 
+            worker.join()
             
-        finally: 
-            time.sleep(1)
+        stats.report()
+        
+        if fetch_content: 
+            get_content_cache().report()
+    
+    # the scored news has the sentiment the titles from the scrapers do not have yet 
+    news.update(scored)
+    
+    # a company whose content or sentiment failed after its titles is a fail, like when it was all one loop 
+    for company in sorted(succeeded & stats.failed): 
+        successes -= 1 
+        fails += 1 
+        write_to_log(f"Failed to process {company} news at: {datetime.datetime.now()}")
 
     write_to_log(f"""News scraping done with {successes} successes and {fails} fails at: {datetime.datetime.now()}""")
     
@@ -397,4 +382,3 @@ Scrapes done: {successes + fails}
 Total companies: {len(companies)}""")            
 
     return news
-
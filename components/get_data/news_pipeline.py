@@ -0,0 +1,79 @@
+import threading
+import datetime
+import queue
+import time
+
+from components.logging.logging import write_to_log
+
+# pieces of the streaming news stage. companies flow from the title scrapers to the content fetchers
+# to one scoring worker through bounded queues, a stage that is ahead blocks on a full queue so the
+# next stage is never buried under work. every stage counts the companies it handled, the time it
+# worked, the time it waited for input and the time it was blocked on the next stage. a company whose
+# content or sentiment failed is kept in failed so it is counted as a fail like before the pipeline.
+
+QUEUE_SIZE = 8        # companies waiting between two stages
+FETCH_WORKERS = 2     # threads fetching article content, every one fetches many articles at once
+SCORE_BATCH = 16      # companies scored by the model in one go
+SCORE_WAIT = 2        # seconds the scorer waits for more companies before it scores a smaller batch
+
+# put on a queue when the stage before it is done
+DONE = None
+
+class StageStats:
+    def __init__(self, stages):
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.stages = {stage: {"companies": 0, "busy": 0, "idle": 0, "blocked": 0} for stage in stages}
+        self.failed = set()
+
+    def add(self, stage, name, amount):
+        with self.lock:
+            self.stages[stage][name] += amount
+
+    def fail(self, companies):
+        with self.lock:
+            self.failed.update(companies)
+
+    def take(self, stage, source):
+        # blocks until the stage before has something, the wait is idle time
+        start_time = time.time()
+        item = source.get()
+        self.add(stage, "idle", time.time() - start_time)
+
+        return item
+
+    def put(self, stage, target, item):
+        # blocks while the next stage is full, the wait is backpressure
+        start_time = time.time()
+        target.put(item)
+        self.add(stage, "blocked", time.time() - start_time)
+
+    def report(self):
+        seconds = time.time() - self.start_time
+        lines = [f"{stage}: {counts['companies']} companies, {counts['companies'] / max(seconds, 1e-9):.2f} per s, busy {counts['busy']:.1f} s, idle {counts['idle']:.1f} s, blocked {counts['blocked']:.1f} s"
+                 for stage, counts in self.stages.items()]
+
+        write_to_log(f"News pipeline done in {seconds:.1f} s at: {datetime.datetime.now()}\n" + "\n".join(lines))
+
+def take_batch(stats, stage, source, size=SCORE_BATCH, wait=SCORE_WAIT):
+    # the first company blocks, then up to size - 1 more are taken while they come within wait seconds
+    batch = [stats.take(stage, source)]
+
+    if batch[0] is DONE:
+        return batch
+
+    deadline = time.time() + wait
+
+    while len(batch) < size:
+        try:
+            item = source.get(timeout=max(deadline - time.time(), 0))
+
+        except queue.Empty:
+            break
+
+        batch.append(item)
+
+        if item is DONE:
+            break
+
+    return batch
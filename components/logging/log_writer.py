@@ -0,0 +1,224 @@
+from multiprocessing import util as multiprocessing_util
+import threading
+import datetime
+import atexit
+import queue
+import json
+import sys
+import os
+
+# append only json lines logs. every write_to_*_log call puts a record on a queue and a background
+# thread appends the records in batches, so a log call no longer reads and rewrites the whole file.
+# the file is locked while a batch is written so several processes can share a log, and it is
+# rotated when it gets too big or when the day changes. read_log gives the newest entries first,
+# like the old prepend logs.
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+LOG_DIR = "assets"
+MAX_BYTES = 5 * 1024 * 1024  # rotate when the log gets bigger than this
+FLUSH_INTERVAL = 0.5         # seconds the writer waits to collect more records before writing
+
+LOGS = {
+    "log": "log",
+    "prediction": "predictions_log",
+    "transaction": "transaction_log",
+}
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def lock_file(file):
+    if os.name == "nt":
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+def unlock_file(file):
+    if os.name == "nt":
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+def rotated_name(path, date):
+    base = path[:-len(".jsonl")]
+    name = f"{base}.{date}.jsonl"
+    n = 1
+
+    while os.path.exists(name):
+        name = f"{base}.{date}.{n}.jsonl"
+        n += 1
+
+    return name
+
+def rotate_if_needed(path, max_bytes):
+    if not os.path.exists(path):
+        return
+
+    last_write = datetime.date.fromtimestamp(os.path.getmtime(path))
+
+    if os.path.getsize(path) > max_bytes or last_write != datetime.date.today():
+        os.replace(path, rotated_name(path, last_write.strftime("%Y-%m-%d")))
+
+class LogWriter:
+    def __init__(self, path, max_bytes=MAX_BYTES, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+
+        self.queue = queue.Queue()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name=f"log writer {os.path.basename(path)}", daemon=True)
+        self.thread.start()
+
+    def write(self, text):
+        self.queue.put({
+            "time": datetime.datetime.now().isoformat(),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "text": text
+        })
+
+    def run(self):
+        while True:
+            records = [self.queue.get()]
+
+            # collect whatever else comes in shortly after so it is written in one go
+            try:
+                while len(records) < 1000:
+                    records.append(self.queue.get(timeout=self.flush_interval))
+
+            except queue.Empty:
+                pass
+
+            stop = None in records
+            records = [record for record in records if record is not None]
+
+            try:
+                if records:
+                    self.append(records)
+
+            except Exception as e:
+                sys.stderr.write(f"Could not write to {self.path}: {e}\n")
+
+            for _ in range(len(records) + stop):
+                self.queue.task_done()
+
+            if stop:
+                return
+
+    def append(self, records):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = "".join(json.dumps(record) + "\n" for record in records)
+
+        with open(self.path + ".lock", "a+") as lock:
+            lock_file(lock)
+
+            try:
+                rotate_if_needed(self.path, self.max_bytes)
+
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(data)
+                    file.close()
+
+            finally:
+                unlock_file(lock)
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+            self.thread.join()
+
+def get_log_writer(name, log_dir=LOG_DIR):
+    with _writers_lock:
+        if name not in _writers:
+            _writers[name] = LogWriter(f"{log_dir}/{LOGS.get(name, name)}.jsonl")
+
+            # multiprocessing workers skip atexit when they finish, this makes them flush too
+            multiprocessing_util.Finalize(_writers[name], _writers[name].close, exitpriority=0)
+
+        return _writers[name]
+
+def reset_after_fork():
+    # a forked child gets the writers but not their threads, so it starts its own
+    global _writers_lock
+    _writers.clear()
+    _writers_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+@atexit.register
+def close_all():
+    for writer in list(_writers.values()):
+        writer.close()
+
+def read_lines_reversed(path, block_size=65536):
+    with open(path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        rest = b""
+
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            file.seek(position)
+
+            lines = (file.read(size) + rest).split(b"\n")
+            rest = lines.pop(0)
+
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8")
+
+        if rest.strip():
+            yield rest.decode("utf-8")
+
+        file.close()
+
+def log_files(name, log_dir=LOG_DIR):
+    # the current file first, then the rotated ones from newest to oldest
+    base = LOGS.get(name, name)
+    rotated = [filename for filename in os.listdir(log_dir) if filename.startswith(f"{base}.") and filename.endswith(".jsonl") and filename != f"{base}.jsonl"]
+
+    def age(filename):
+        parts = filename[len(base) + 1:-len(".jsonl")].split(".")
+        return parts[0], int(parts[1]) if len(parts) > 1 else 0
+
+    files = [f"{log_dir}/{filename}" for filename in sorted(rotated, key=age, reverse=True)]
+
+    return ([f"{log_dir}/{base}.jsonl"] if os.path.exists(f"{log_dir}/{base}.jsonl") else []) + files
+
+def read_log(name, limit=100, log_dir=LOG_DIR):
+    # newest entries first
+    entries = []
+
+    for path in log_files(name, log_dir):
+        for line in read_lines_reversed(path):
+            try:
+                entries.append(json.loads(line))
+
+            except ValueError:
+                continue
+
+            if len(entries) >= limit:
+                return entries
+
+    return entries
+
+if __name__ == "__main__":
+    # run from the project root with: python -m components.logging.log_writer [log|prediction|transaction] [entries]
+    name = sys.argv[1] if len(sys.argv) > 1 else "log"
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    for entry in read_log(name, limit):
+        print(entry["text"])
@@ -1,8 +1,5 @@
+from components.logging.log_writer import get_log_writer
+
+# appends a json lines record through a background writer, newest first view with: python -m components.logging.log_writer log
 def write_to_log(text):
-    with open("assets/log.txt", "r") as file:
-        prev_text = file.read()
-        file.close()
-        
-    with open("assets/log.txt", "w") as file:
-        file.write(text + "\n" + prev_text)
-        file.close()
\ No newline at end of file
+    get_log_writer("log").write(text)
\ No newline at end of file
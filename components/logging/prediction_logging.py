@@ -1,8 +1,5 @@
+from components.logging.log_writer import get_log_writer
+
+# appends a json lines record through a background writer, newest first view with: python -m components.logging.log_writer prediction
 def write_to_prediction_log(text):
-    with open("assets/predictions_log.txt", "r") as file:
-        prev_text = file.read()
-        file.close()
-        
-    with open("assets/predictions_log.txt", "w") as file:
-        file.write(text + "\n" + prev_text)
-        file.close()
\ No newline at end of file
+    get_log_writer("prediction").write(text)
\ No newline at end of file
@@ -2,11 +2,21 @@ import tkinter as tk
 from tkinter import ttk
 from ttkthemes import ThemedTk
 from screeninfo import get_monitors
-import uuid
+import threading
+import datetime
 
-# Dictionary to store progress windows, using unique IDs as keys
+from components.logging.logging import write_to_log
+
+# Dictionary to store progress windows, using the description as key so bars of stages running at the
+# same time do not write into each other's window
 progress_windows = {}
 
+# tkinter only works from the main thread. bars of worker threads leave their latest progress here and
+# the main thread draws it with pump_progress_bars while it waits for the pipeline stages
+pending_progress = {}
+pending_lock = threading.Lock()
+pump_failed = False
+
 class ProgressWindow:
     def __init__(self, total, description="Progress: ", decimals=1, length=300, theme='arc'):
         self.total = total
@@ -52,23 +62,51 @@ class ProgressWindow:
         self.root.destroy()
 
 def print_progress_bar(iteration, total, decimals=1, length=100, fill="█", description="Progress: "):
+    if threading.current_thread() is not threading.main_thread(): 
+        with pending_lock: 
+            pending_progress[description] = (iteration, total, decimals, length)
+            
+        return
+    
+    show_progress(iteration, total, decimals, length, description)
+
+def show_progress(iteration, total, decimals, length, description):
     global progress_windows
-    current_id = getattr(print_progress_bar, '_current_id', None)
     
-    if current_id is None or iteration == 0:
-        current_id = str(uuid.uuid4())  
-        print_progress_bar._current_id = current_id
-        progress_windows[current_id] = ProgressWindow(total, description, decimals, length * 3, theme='arc')
+    if description not in progress_windows or iteration == 0:
+        if description in progress_windows: 
+            progress_windows[description].close()
+            
+        progress_windows[description] = ProgressWindow(total, description, decimals, length * 3, theme='arc')
     
-    window = progress_windows[current_id]
+    window = progress_windows[description]
     window.update_progress(iteration)
     
     if iteration == total:
         window.close()
-        del progress_windows[current_id]
+        del progress_windows[description]
 
-        if hasattr(print_progress_bar, '_current_id'):
-            delattr(print_progress_bar, '_current_id')
+def pump_progress_bars():
+    # draws the progress the worker threads left since the last call, only from the main thread. 
+    # if the windows can not be drawn it is logged once and the pipeline goes on without them 
+    global pump_failed
+    
+    with pending_lock: 
+        updates = list(pending_progress.items())
+        pending_progress.clear()
+        
+    if pump_failed: 
+        return
+        
+    for description, (iteration, total, decimals, length) in updates: 
+        try: 
+            show_progress(iteration, total, decimals, length, description)
+            
+        except Exception as e: 
+            pump_failed = True 
+            write_to_log(f"""Could not draw the progress bars of the pipeline stages, they run without them at: {datetime.datetime.now()}
+Error: {e}""")
+            return
             
             
             
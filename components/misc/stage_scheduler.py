@@ -0,0 +1,156 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+import datetime
+import time
+
+from components.logging.logging import write_to_log
+
+# runs the pipeline as a dependency graph. every stage is a dict:
+#   {"name": "historical", "func": get_historical_data, "args": (...), "kwargs": {...},
+#    "deps": ["..."], "mode": "thread" or "process", "pass_results": False}
+# a stage starts as soon as all of its deps are done, stages that do not depend on each other run at
+# the same time. with pass_results the results of the deps are given to func first, in the order of deps.
+# process stages need a func and args that can be pickled. tick is called from the main thread about
+# every tick_interval seconds while it waits, for work that has to be done there like drawing progress.
+
+def stage(name, func, args=(), kwargs=None, deps=(), mode="thread", pass_results=False):
+    return {
+        "name": name,
+        "func": func,
+        "args": tuple(args),
+        "kwargs": kwargs or {},
+        "deps": list(deps),
+        "mode": mode,
+        "pass_results": pass_results
+    }
+
+def check_stages(stages):
+    names = [s["name"] for s in stages]
+
+    if len(set(names)) != len(names):
+        raise ValueError("Stage names have to be unique.")
+
+    for s in stages:
+        for dep in s["deps"]:
+            if dep not in names:
+                raise ValueError(f"Stage {s['name']} depends on unknown stage {dep}.")
+
+    # kahn's algorithm, anything left over is in a cycle
+    remaining = {s["name"]: set(s["deps"]) for s in stages}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+
+        if not ready:
+            raise ValueError(f"Stages have a dependency cycle: {sorted(remaining)}")
+
+        for name in ready:
+            del remaining[name]
+
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+def critical_path(stages, timings):
+    # walks back from the stage that finished last through the dep that finished last before it started,
+    # that chain is what decided the total run time
+    finished = {name: timing for name, timing in timings.items() if timing.get("end") is not None}
+
+    if not finished:
+        return []
+
+    deps = {s["name"]: s["deps"] for s in stages}
+    path = [max(finished, key=lambda name: finished[name]["end"])]
+
+    while True:
+        done_deps = [dep for dep in deps[path[-1]] if dep in finished]
+
+        if not done_deps:
+            break
+
+        path.append(max(done_deps, key=lambda name: finished[name]["end"]))
+
+    return list(reversed(path))
+
+def report(stages, timings, start_time, end_time):
+    path = critical_path(stages, timings)
+    lines = [f"Pipeline done in {end_time - start_time:.1f} s at: {datetime.datetime.now()}"]
+
+    for s in stages:
+        timing = timings.get(s["name"], {})
+
+        if timing.get("end") is not None:
+            lines.append(f"{s['name']}: {timing['end'] - timing['start']:.1f} s ({timing['status']}, started after {timing['start'] - start_time:.1f} s)")
+        else:
+            lines.append(f"{s['name']}: {timing.get('status', 'not run')}")
+
+    if path:
+        length = timings[path[-1]]["end"] - timings[path[0]]["start"]
+        lines.append(f"Critical path: {' -> '.join(path)} ({length:.1f} s)")
+
+    write_to_log("\n".join(lines))
+
+    return path
+
+def run_stages(stages, max_threads=8, max_processes=2, tick=None, tick_interval=0.1):
+    # gives back the results of every stage that finished, raises the first error once everything
+    # that could run has run
+    check_stages(stages)
+
+    by_name = {s["name"]: s for s in stages}
+    results = {}
+    timings = {}
+    errors = []
+    pending = list(by_name)
+    running = {}
+
+    start_time = time.time()
+
+    with ThreadPoolExecutor(max_workers=max_threads) as threads, ProcessPoolExecutor(max_workers=max_processes) as processes:
+        while pending or running:
+            for name in list(pending):
+                s = by_name[name]
+
+                # a failed or skipped dep means this stage can never run
+                if any(timings.get(dep, {}).get("status") in ("failed", "skipped") for dep in s["deps"]):
+                    timings[name] = {"status": "skipped"}
+                    pending.remove(name)
+
+                elif all(dep in results for dep in s["deps"]):
+                    args = tuple(results[dep] for dep in s["deps"]) + s["args"] if s["pass_results"] else s["args"]
+                    executor = processes if s["mode"] == "process" else threads
+
+                    timings[name] = {"start": time.time(), "status": "running"}
+                    running[executor.submit(s["func"], *args, **s["kwargs"])] = name
+                    pending.remove(name)
+
+            if not running:
+                continue
+
+            done, _ = wait(running, timeout=tick_interval if tick else None, return_when=FIRST_COMPLETED)
+
+            if tick:
+                tick()
+
+            for future in done:
+                name = running.pop(future)
+                timings[name]["end"] = time.time()
+
+                try:
+                    results[name] = future.result()
+                    timings[name]["status"] = "done"
+
+                except Exception as e:
+                    timings[name]["status"] = "failed"
+                    errors.append((name, e))
+                    write_to_log(f"""Stage {name} failed at: {datetime.datetime.now()}
+Error: {e}""")
+
+    # whatever the last stages left for the main thread
+    if tick:
+        tick()
+
+    report(stages, timings, start_time, time.time())
+
+    if errors:
+        name, error = errors[0]
+        raise Exception(f"stage {name} failed: {error}") from error
+
+    return results
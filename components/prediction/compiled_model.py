@@ -0,0 +1,151 @@
+import tensorflow as tf
+import numpy as np
+import datetime
+import os
+
+from components.prediction.prediction import probe_inputs, is_deterministic
+from components.logging.logging import write_to_log
+
+# model.predict builds a dataset, callbacks and a progress bar on every call, for a (1, 20, 1) input
+# that costs much more than the model itself. CompiledModel wraps the keras model in a tf.function
+# with a fixed signature for the nine inputs that is traced once when it is made, and TFLiteModel runs
+# an exported .tflite copy of the model on the lighter tflite runtime. both have the same predict and
+# inputs as the keras model so they can be given to make_predictions in its place.
+
+TFLITE_PATH = "assets/model.tflite"
+TOLERANCE = 1e-4  # largest difference to the keras output the tflite and compiled models may have
+SAMPLED_PASSES = 100  # passes averaged to compare a model whose outputs are random when predicting
+SAMPLED_LIMIT = 5     # largest difference of those means in standard errors
+
+def input_specs(model):
+    return [
+        tf.TensorSpec(shape=(None,) + tuple(tuple(layer.shape)[1:]), dtype=tf.as_dtype(layer.dtype), name=layer.name.split(":")[0])
+        for layer in model.inputs
+    ]
+
+class CompiledModel:
+    def __init__(self, model):
+        self.model = model
+        self.inputs = model.inputs
+        self.specs = input_specs(model)
+
+        # training=False is what model.predict uses too, layers that are forced on stay on
+        self.function = tf.function(lambda *X: model(list(X), training=False), input_signature=self.specs)
+
+        # warm up, the only trace happens here and not in the first prediction
+        self.predict(probe_inputs(model, rows=1))
+
+    def predict(self, X, batch_size=None, verbose=0):
+        X = [np.asarray(x, dtype=spec.dtype.as_numpy_dtype).reshape((-1,) + tuple(spec.shape[1:])) for x, spec in zip(X, self.specs)]
+        batch_size = batch_size or len(X[0])
+
+        outputs = [np.asarray(self.function(*[x[start:start + batch_size] for x in X])) for start in range(0, len(X[0]), batch_size)]
+
+        return np.concatenate(outputs, axis=0)
+
+class TFLiteModel:
+    def __init__(self, model, path=TFLITE_PATH):
+        self.interpreter = tf.lite.Interpreter(model_path=path)
+        self.runner = self.interpreter.get_signature_runner()
+        self.output = list(self.runner.get_output_details())[0]
+
+        # the signature inputs in the keras input order, so make_predictions can give the inputs as a list
+        self.inputs = model.inputs
+        self.order = [spec.name for spec in input_specs(model)]
+
+    def predict(self, X, batch_size=None, verbose=0):
+        details = self.runner.get_input_details()
+        X = [np.asarray(x, dtype=details[name]["dtype"]).reshape((-1,) + tuple(details[name]["shape"][1:])) for x, name in zip(X, self.order)]
+        batch_size = batch_size or len(X[0])
+
+        outputs = []
+        for start in range(0, len(X[0]), batch_size):
+            # the signature runner resizes the inputs to the batch
+            result = self.runner(**{name: x[start:start + batch_size] for name, x in zip(self.order, X)})
+            outputs.append(np.asarray(result[self.output]))
+
+        return np.concatenate(outputs, axis=0)
+
+def export_tflite(model, path=TFLITE_PATH):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    # recurrent and random layers need the tf ops that tflite does not have built in
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+    converter._experimental_lower_tensor_list_ops = False
+
+    with open(path, "wb") as file:
+        file.write(converter.convert())
+        file.close()
+
+    return path
+
+def check_accuracy(model, other, rows=64, seed=0):
+    # largest absolute difference between the keras model and other on the same random inputs,
+    # a model with layers that stay random when predicting never gets below the tolerance
+    X = probe_inputs(model, rows, seed)
+
+    return float(np.max(np.abs(np.asarray(model.predict(X, verbose=0)) - other.predict(X))))
+
+def check_sampled_accuracy(model, other, rows=16, passes=SAMPLED_PASSES, seed=0):
+    # for models with layers that stay random when predicting, the largest difference between the means
+    # of passes predictions of both models in standard errors of that difference
+    X = probe_inputs(model, rows, seed)
+    a = np.array([np.asarray(model.predict(X, verbose=0)) for _ in range(passes)])
+    b = np.array([np.asarray(other.predict(X)) for _ in range(passes)])
+    error = np.sqrt((a.var(axis=0) + b.var(axis=0)) / passes) + 1e-12
+
+    return float(np.max(np.abs(a.mean(axis=0) - b.mean(axis=0)) / error))
+
+def load_compiled_model(model, tolerance=TOLERANCE, sampled_limit=SAMPLED_LIMIT):
+    # the compiled model if it gives the same outputs as model.predict, otherwise the keras model
+    try:
+        compiled = CompiledModel(model)
+
+        if is_deterministic(model):
+            difference, limit = check_accuracy(model, compiled), tolerance
+        else:
+            difference, limit = check_sampled_accuracy(model, compiled), sampled_limit
+
+        if difference <= limit:
+            write_to_log(f"Using the compiled model, difference to keras: {difference:.2e} at: {datetime.datetime.now()}")
+            return compiled
+
+        write_to_log(f"The compiled model differs from keras by {difference:.2e}, using the keras model at: {datetime.datetime.now()}")
+
+    except Exception as e:
+        write_to_log(f"""Failed to compile the model, using the keras model:
+Error: {e}
+At: {datetime.datetime.now()}""")
+
+    return model
+
+def load_lite_model(model, model_path="assets/model.h5", path=TFLITE_PATH, tolerance=TOLERANCE):
+    # exports the model when there is no export or it is older than the model, gives back the compiled
+    # keras model, or the keras model itself, if the tflite model does not give the same outputs
+    try:
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(model_path):
+            export_tflite(model, path)
+
+        lite_model = TFLiteModel(model, path)
+        difference = check_accuracy(model, lite_model)
+
+        if difference <= tolerance:
+            write_to_log(f"Using the tflite model, largest difference to keras: {difference:.2e} at: {datetime.datetime.now()}")
+            return lite_model
+
+        write_to_log(f"The tflite model differs from keras by {difference:.2e}, using the compiled keras model at: {datetime.datetime.now()}")
+
+    except Exception as e:
+        write_to_log(f"""Failed to load the tflite model, using the compiled keras model:
+Error: {e}
+At: {datetime.datetime.now()}""")
+
+    return load_compiled_model(model)
+
+if __name__ == "__main__":
+    # run from the project root with: python -m components.prediction.compiled_model
+    from keras.models import load_model
+
+    model = load_model("assets/model.h5")
+    export_tflite(model)
+    print(f"Exported to {TFLITE_PATH}, largest difference to keras: {check_accuracy(model, TFLiteModel(model)):.2e}")
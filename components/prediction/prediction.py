@@ -5,10 +5,137 @@ from components.logging.logging import write_to_log
 from components.logging.prediction_logging import write_to_prediction_log
 from components.misc.progress_bar import print_progress_bar  
 
+def build_model_inputs(companies, price_data, news_data, commodity_1_data, commodity_2_data, 
+                       commodity_3_data, name_data, rsi_data, macd_data, obv_data):
+    # stacks every company into one array per model input, row n is companies[n]
+    def stack(data):
+        return np.array([np.asarray(data[company], dtype=np.float32).reshape(-1) for company in companies]).reshape(len(companies), -1, 1)
+    
+    return [
+        stack(price_data),                                                                  # (n, 20, 1)
+        stack(news_data),                                                                   # (n, 20, 1)
+        stack(commodity_1_data),                                                            # (n, 20, 1)
+        stack(commodity_2_data),                                                            # (n, 20, 1)
+        stack(commodity_3_data),                                                            # (n, 20, 1)
+        np.array([name_data[company] for company in companies]).reshape(len(companies), 1), # (n, 1)
+        stack(rsi_data),                                                                    # (n, 20, 1)
+        stack(macd_data),                                                                   # (n, 20, 1)
+        stack(obv_data)                                                                     # (n, 20, 1)
+    ]
+
+def predict_passes(model, X, num_iterations=100, max_batch_size=4096):
+    # every company is repeated num_iterations times so all monte carlo passes for all 
+    # companies go through the model as a few large batches instead of one call per pass 
+    num_companies = len(X[0])
+    total_rows = num_companies * num_iterations
+    num_batches = -(-total_rows // max_batch_size)
+    
+    outputs = []
+    index = 0 
+    
+    for start in range(0, total_rows, max_batch_size):
+        print_progress_bar(index, num_batches, description="Model predicting: ")
+        index += 1 
+        
+        rows = np.arange(start, min(start + max_batch_size, total_rows)) // num_iterations
+        batch = [x[rows] for x in X]
+        outputs.append(np.asarray(model.predict(batch, batch_size=len(rows), verbose=0)))
+        
+    print_progress_bar(num_batches, num_batches, description="Model predicting: ")
+    
+    # (companies, passes, outputs)
+    return np.concatenate(outputs, axis=0).reshape(num_companies, num_iterations, -1)
+
+def predict_batched(model, X, num_iterations=100, max_batch_size=4096):
+    outputs = predict_passes(model, X, num_iterations, max_batch_size)
+    
+    return outputs.mean(axis=1), outputs.std(axis=1)
+
+def probe_inputs(model, rows=4, seed=0):
+    # random inputs in the shapes the model takes, only used to look at how the model behaves 
+    rng = np.random.default_rng(seed)
+    
+    return [rng.normal(size=(rows,) + tuple(dim or 1 for dim in tuple(layer.shape)[1:])).astype(np.float32) for layer in model.inputs]
+
+def is_deterministic(model, X=None, passes=3):
+    # true if repeated passes give the same output, then there is no uncertainty to sample 
+    X = probe_inputs(model) if X is None else X
+    first = np.asarray(model.predict(X, verbose=0))
+    
+    for _ in range(passes - 1): 
+        if not np.array_equal(first, np.asarray(model.predict(X, verbose=0))): 
+            return False
+        
+    return True
+
+def sampling_policy(model, chunk_size=10, max_iterations=100, tolerance=1e-3):
+    # checked once when the model is loaded, given to make_predictions as sampling 
+    return {
+        "deterministic": is_deterministic(model), 
+        "chunk_size": chunk_size, 
+        "max_iterations": max_iterations, 
+        "tolerance": tolerance
+    }
+
+def predict_adaptive(model, X, sampling, max_batch_size=4096):
+    # gives back mean, std and the passes used per company. a deterministic model gets one pass, 
+    # otherwise passes are added in chunks until the mean and std of a company change less than 
+    # the tolerance between two chunks, or max_iterations is reached 
+    num_companies = len(X[0])
+    
+    if sampling["deterministic"]: 
+        outputs = predict_passes(model, X, 1, max_batch_size)
+        return outputs[:, 0], np.zeros_like(outputs[:, 0]), np.ones(num_companies, dtype=int)
+    
+    samples = None
+    passes = np.zeros(num_companies, dtype=int)
+    last_mean = None
+    last_std = None
+    active = np.arange(num_companies)
+    
+    while len(active): 
+        # every active company has had the same number of passes 
+        chunk = min(sampling["chunk_size"], sampling["max_iterations"] - passes[active[0]])
+        outputs = predict_passes(model, [x[active] for x in X], chunk, max_batch_size)
+        
+        if samples is None: 
+            samples = np.empty((num_companies, sampling["max_iterations"], outputs.shape[2]), dtype=outputs.dtype)
+            
+        samples[active, passes[active[0]]:passes[active[0]] + chunk] = outputs
+        passes[active] += chunk
+        
+        mean = samples[active, :passes[active[0]]].mean(axis=1)
+        std = samples[active, :passes[active[0]]].std(axis=1)
+        
+        done = passes[active] >= sampling["max_iterations"]
+        
+        if last_mean is not None: 
+            done |= (np.abs(mean - last_mean) <= sampling["tolerance"]).all(axis=1) & (np.abs(std - last_std) <= sampling["tolerance"]).all(axis=1)
+        
+        last_mean = mean[~done]
+        last_std = std[~done]
+        active = active[~done]
+        
+    mean = np.array([samples[n, :passes[n]].mean(axis=0) for n in range(num_companies)])
+    std = np.array([samples[n, :passes[n]].std(axis=0) for n in range(num_companies)])
+    
+    return mean, std, passes
+
+def summarize_predictions(predictions, top=10): 
+    # the number of predictions and the companies with the highest mean, the whole dict made every 
+    # record of the prediction log as big as all the companies together 
+    ranked = sorted(predictions, key=lambda company: float(predictions[company]["mean"][0]), reverse=True)
+    lines = [f"Predictions: {len(predictions)}, top {min(top, len(ranked))} by mean:"]
+    
+    for company in ranked[:top]: 
+        lines.append(f"{company}: mean {float(predictions[company]['mean'][0]):.4f}, std {float(predictions[company]['std'][0]):.4f}")
+    
+    return "\n".join(lines)
+
 # test if uncertainty is needed or if the ai is not that random. 
 def make_predictions(price_data, news_data, commodity_1_data, commodity_2_data, 
                      commodity_3_data, name_data, rsi_data, macd_data, obv_data, 
-                     model, company_names):
+                     model, company_names, batched=False, max_batch_size=4096, cache=None, sampling=None):
     write_to_log(f"Model prediction start at: {datetime.datetime.now()}")
     write_to_prediction_log(f"""===================
 Model prediction start at: {datetime.datetime.now()}
@@ -17,41 +144,99 @@ Model prediction start at: {datetime.datetime.now()}
     predictions = {}
     index = 0 
     
-    for company in company_names:
-        print_progress_bar(index, len(company_names), description="Model predicting: ")
-        index += 1 
+    num_iterations = 100 # how many times the ai is run, we then find how big the difference is each time and then check how sure the ai is of the prediction 
+    
+    # companies with the same inputs and model as an earlier run get the cached prediction 
+    companies = company_names
+    keys = {}
+    
+    if cache is not None: 
+        cache.reset_counts()
+        companies = []
+        
+        for company in company_names: 
+            keys[company] = cache.key([price_data[company], news_data[company], commodity_1_data[company], commodity_2_data[company], 
+                                       commodity_3_data[company], [name_data[company]], rsi_data[company], macd_data[company], obv_data[company]], 
+                                      num_iterations if sampling is None else f"adaptive {sampling}")
+            cached = cache.get(keys[company])
+            
+            if cached is not None: 
+                predictions[company] = {
+                    "mean": cached[0], 
+                    "std": cached[1]
+                }
+            else: 
+                companies.append(company)
+    
+    if sampling is not None and companies: 
+        X = build_model_inputs(companies, price_data, news_data, commodity_1_data, commodity_2_data,
+                               commodity_3_data, name_data, rsi_data, macd_data, obv_data)
+        mean_predictions, std_predictions, passes = predict_adaptive(model, X, sampling, max_batch_size)
+        
+        for n, company in enumerate(companies):
+            predictions[company] = {
+                "mean": mean_predictions[n].flatten(),
+                "std": std_predictions[n].flatten()
+            }
+            
+        write_to_log(f"Monte carlo used {passes.mean():.1f} passes per company on average ({passes.min()} to {passes.max()}), deterministic model: {sampling['deterministic']}")
+    
+    elif batched and companies:
+        X = build_model_inputs(companies, price_data, news_data, commodity_1_data, commodity_2_data,
+                               commodity_3_data, name_data, rsi_data, macd_data, obv_data)
+        mean_predictions, std_predictions = predict_batched(model, X, num_iterations, max_batch_size)
+
+        for n, company in enumerate(companies):
+            predictions[company] = {
+                "mean": mean_predictions[n].flatten(),
+                "std": std_predictions[n].flatten()
+            }
+
+    elif not batched and sampling is None:
+        for company in companies:
+            print_progress_bar(index, len(companies), description="Model predicting: ")
+            index += 1 
+        
+            company_predictions = []
+        
+            X = [
+                np.array(price_data[company]).reshape(1, -1, 1),       # (1, 20, 1)
+                np.array(news_data[company]).reshape(1, -1, 1),        # (1, 20, 1)
+                np.array(commodity_1_data[company]).reshape(1, -1, 1), # (1, 20, 1)
+                np.array(commodity_2_data[company]).reshape(1, -1, 1), # (1, 20, 1)
+                np.array(commodity_3_data[company]).reshape(1, -1, 1), # (1, 20, 1)
+                np.array([name_data[company]]).reshape(1, 1),          # (1, 1)
+                np.array(rsi_data[company]).reshape(1, -1, 1),         # (1, 20, 1)
+                np.array(macd_data[company]).reshape(1, -1, 1),        # (1, 20, 1)
+                np.array(obv_data[company]).reshape(1, -1, 1)          # (1, 20, 1)
+            ]
         
-        num_iterations = 100 # how many times the ai is run, we then find how big the difference is each time and then check how sure the ai is of the prediction 
-        company_predictions = []
-        
-        X = [
-            np.array(price_data[company]).reshape(1, -1, 1),       # (1, 20, 1)
-            np.array(news_data[company]).reshape(1, -1, 1),        # (1, 20, 1)
-            np.array(commodity_1_data[company]).reshape(1, -1, 1), # (1, 20, 1)
-            np.array(commodity_2_data[company]).reshape(1, -1, 1), # (1, 20, 1)
-            np.array(commodity_3_data[company]).reshape(1, -1, 1), # (1, 20, 1)
-            np.array([name_data[company]]).reshape(1, 1),          # (1, 1)
-            np.array(rsi_data[company]).reshape(1, -1, 1),         # (1, 20, 1)
-            np.array(macd_data[company]).reshape(1, -1, 1),        # (1, 20, 1)
-            np.array(obv_data[company]).reshape(1, -1, 1)          # (1, 20, 1)
-        ]
-        
-        for _ in range(num_iterations):
-             company_predictions.append(model.predict(X, verbose=0))
+            for _ in range(num_iterations):
+                 company_predictions.append(model.predict(X, verbose=0))
+            
+            company_predictions  = np.array(company_predictions)
+            mean_prediction = np.mean(company_predictions , axis=0)
+            std_prediction = np.std(company_predictions, axis=0)
+        
+            predictions[company] = {
+                "mean": mean_prediction.flatten(),
+                "std": std_prediction.flatten()
+            }
+    
+    if cache is not None: 
+        for company in companies: 
+            cache.put(keys[company], predictions[company]["mean"], predictions[company]["std"])
             
-        company_predictions  = np.array(company_predictions)
-        mean_prediction = np.mean(company_predictions , axis=0)
-        std_prediction = np.std(company_predictions, axis=0)
+        evicted = cache.evict()
+        write_to_log(f"Prediction cache had {cache.hits} hits and {cache.misses} misses, {evicted} old entries removed")
         
-        predictions[company] = {
-            "mean": mean_prediction.flatten(),
-            "std": std_prediction.flatten()
-        }
+        # same order as without the cache 
+        predictions = {company: predictions[company] for company in company_names}
     
     write_to_prediction_log(f"""
 ===================
 Prediction end at: {datetime.datetime.now()}
-Predictions: {predictions}
+{summarize_predictions(predictions)}
 ===================""")
     write_to_log(f"Prediction done with {len(predictions)} predictions at: {datetime.datetime.now()}")
     
@@ -0,0 +1,100 @@
+import numpy as np
+import hashlib
+import os
+
+# skips the monte carlo passes for companies whose inputs are the same as in an earlier run, like on
+# weekends or when a failed run is started again. the key is a hash of the model file, the number of
+# passes and the nine input arrays of the company. every entry is one small .npz file, a hit touches
+# the file so the least recently used entries are the ones removed when the cache gets too big.
+
+CACHE_DIR = "data/prediction_cache"
+MAX_BYTES = 50 * 1024 * 1024
+
+def file_hash(path):
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+
+        file.close()
+
+    return digest.hexdigest()
+
+class PredictionCache:
+    def __init__(self, model_path, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.model_hash = file_hash(model_path)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, inputs, num_iterations):
+        # inputs are the nine arrays of one company in the order the model takes them
+        digest = hashlib.sha256(f"{self.model_hash}:{num_iterations}".encode())
+
+        for data in inputs:
+            data = np.ascontiguousarray(data, dtype=np.float64)
+            digest.update(str(data.shape).encode())
+            digest.update(data.tobytes())
+
+        return digest.hexdigest()
+
+    def path(self, key):
+        return f"{self.cache_dir}/{key}.npz"
+
+    def get(self, key):
+        # gives back (mean, std) or None
+        try:
+            with np.load(self.path(key)) as data:
+                result = data["mean"], data["std"]
+
+            os.utime(self.path(key))
+            self.hits += 1
+
+            return result
+
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+
+    def put(self, key, mean, std):
+        tmp_path = f"{self.cache_dir}/{key}.tmp.npz"
+        np.savez(tmp_path, mean=np.asarray(mean), std=np.asarray(std))
+        os.replace(tmp_path, self.path(key))
+
+    def evict(self):
+        # removes the least recently used entries until the cache fits, gives back how many were removed
+        entries = []
+
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(".npz") and not filename.endswith(".tmp.npz"):
+                try:
+                    stat = os.stat(f"{self.cache_dir}/{filename}")
+                    entries.append((stat.st_mtime, stat.st_size, filename))
+
+                except OSError:
+                    continue
+
+        size = sum(entry[1] for entry in entries)
+        removed = 0
+
+        for _, file_size, filename in sorted(entries):
+            if size <= self.max_bytes:
+                break
+
+            try:
+                os.remove(f"{self.cache_dir}/{filename}")
+                size -= file_size
+                removed += 1
+
+            except OSError:
+                continue
+
+        return removed
+
+    def reset_counts(self):
+        self.hits = 0
+        self.misses = 0
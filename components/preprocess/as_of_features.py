@@ -0,0 +1,172 @@
+import numpy as np
+import datetime
+import csv
+
+from components.preprocess.commodity_panel import build_panel, select_commodities
+from components.preprocess.indicators import rsi_matrix, macd_matrix, obv_matrix
+from components.store.feature_store import open_store, parse_date
+
+# builds the model inputs preprocess_data would give for many as of dates in one pass.
+# every csv is read once, the indicators are computed once over the full series and every date
+# takes the prefix of the series up to and including that date. rsi, macd and obv only look back so
+# the prefix of the full indicator is the indicator of the prefix, and the scalers are fitted on the
+# prefix only, so nothing after an as of date ends up in its windows.
+# the rows of every csv are expected to be in date order, the way the scrapers write them.
+
+FEATURES = ["price", "news", "commodity_1", "commodity_2", "commodity_3", "rsi", "macd", "obv"]
+
+RSI_WINDOW = 14
+
+def load_dated(kind, entity, columns, store=None):
+    # (ordinal dates, values (columns x rows)) of the rows where every column is known
+    if store is not None and entity in store:
+        values = np.asarray(store.values[:, store.entity_index[entity], :])
+        keep = ~np.isnan(values).any(axis=0)
+
+        return store.start_date.toordinal() + np.flatnonzero(keep), values[:, keep]
+
+    dates = []
+    rows = []
+
+    with open(f"data/{kind}/{entity}.csv", "r") as file:
+        reader = csv.reader(file)
+        next(reader)  # skip header
+
+        for row in reader:
+            try:
+                date = datetime.datetime.strptime(row[0], "%Y-%m-%d").date()
+                values = [float(row[column]) for column in range(1, columns + 1)]
+
+            except (ValueError, IndexError):
+                continue
+
+            dates.append(date.toordinal())
+            rows.append(values)
+
+        file.close()
+
+    return np.array(dates, dtype=np.int64), np.array(rows, dtype=np.float64).reshape(-1, columns).T
+
+def prefix_windows(values, ends, days, scale=True):
+    # (dates x days), the last days values of values[:end] for every end, front padded with nan.
+    # with scale every row is scaled like a StandardScaler fitted on values[:end]
+    values = np.asarray(values, dtype=np.float64)
+    ends = np.clip(ends, 0, len(values))
+
+    positions = ends[:, None] - days + np.arange(days)[None, :]
+    windows = np.where(positions >= 0, values[np.clip(positions, 0, None)] if len(values) else np.nan, np.nan)
+
+    if not scale:
+        return windows
+
+    mask = np.arange(len(values))[None, :] < ends[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(mask, values[None, :], 0).sum(axis=1) / ends
+        std = np.sqrt(np.where(mask, (values[None, :] - mean[:, None]) ** 2, 0).sum(axis=1) / ends)
+
+    std[std == 0] = 1
+
+    return (windows - mean[:, None]) / std[:, None]
+
+def build_as_of_features(company_names, commodity_names, company_index, HISTORICAL_DAYS, dates):
+    # gives back {"dates", "companies", "features", "tensor": (dates x companies x HISTORICAL_DAYS x features),
+    # "names": (companies), "valid": (dates x companies)}. valid is False where preprocess_data would
+    # have failed the company, windows shorter than HISTORICAL_DAYS are front padded with nan
+    as_of = np.array([(parse_date(date) if isinstance(date, str) else date).toordinal() for date in dates], dtype=np.int64)
+
+    historical_store = open_store("historical")
+    news_store = open_store("news")
+    commodity_store = open_store("commodity")
+
+    tensor = np.full((len(as_of), len(company_names), HISTORICAL_DAYS, len(FEATURES)), np.nan)
+    valid = np.zeros((len(as_of), len(company_names)), dtype=bool)
+    names = np.array([int(index) for index in company_index])
+
+    # the commodities once, with their dates so every as of date can cut them
+    commodities = []
+    for commodity in commodity_names:
+        commodity = commodity.lower().replace(" ", "-")
+        commodity_dates, (prices,) = load_dated("commodity", commodity, 1, commodity_store)
+
+        # the same order load_commodity_panel sorts the csv rows in
+        order = np.lexsort((prices, commodity_dates))
+        commodities.append((commodity, commodity_dates[order], prices[order]))
+
+    prices = {}
+    price_ends = {}
+
+    for n, company in enumerate(company_names):
+        try:
+            price_dates, (price, volume) = load_dated("historical", company, 2, historical_store)
+
+        except Exception:
+            continue  # preprocess_data fails this company on every date
+
+        prices[company] = price
+        price_ends[company] = np.searchsorted(price_dates, as_of, side="right")
+
+        try:
+            news_dates, (news,) = load_dated("news", company, 1, news_store)
+
+        except Exception:
+            continue
+
+        ends = price_ends[company]
+        news_ends = np.searchsorted(news_dates, as_of, side="right")
+
+        # rsi needs window + 1 prices and the news scaler needs at least one score
+        valid[:, n] = (ends >= RSI_WINDOW + 1) & (news_ends >= 1)
+
+        if not valid[:, n].any():
+            continue
+
+        tensor[:, n, :, FEATURES.index("price")] = prefix_windows(price, ends, HISTORICAL_DAYS)
+        tensor[:, n, :, FEATURES.index("news")] = prefix_windows(news, news_ends, HISTORICAL_DAYS)
+        tensor[:, n, :, FEATURES.index("macd")] = prefix_windows(macd_matrix(price)[0][0], ends, HISTORICAL_DAYS)
+        tensor[:, n, :, FEATURES.index("obv")] = prefix_windows(obv_matrix(price, volume)[0], ends, HISTORICAL_DAYS)
+
+        # rsi starts at the window:th price, so a prefix of end prices has end - window rsi values
+        if len(price) >= RSI_WINDOW + 1:
+            tensor[:, n, :, FEATURES.index("rsi")] = prefix_windows(rsi_matrix(price)[0], ends - RSI_WINDOW, HISTORICAL_DAYS)
+
+    # the closest commodities change with the cutoff, so they are picked again for every date
+    for d, date in enumerate(as_of):
+        cut = [np.searchsorted(commodity_dates, date, side="right") for _, commodity_dates, _ in commodities]
+        panel = build_panel([name for name, _, _ in commodities], [series[:end].tolist() for (_, _, series), end in zip(commodities, cut)])
+
+        best = select_commodities(panel, {company: prices[company][:price_ends[company][d]].tolist() for company in prices}, HISTORICAL_DAYS)
+
+        for n, company in enumerate(company_names):
+            if not valid[d, n] or company not in best:
+                continue
+
+            for k, series in enumerate(best[company]):
+                if series:
+                    tensor[d, n, -len(series):, FEATURES.index(f"commodity_{k + 1}")] = series
+
+    return {
+        "dates": [datetime.date.fromordinal(int(date)) for date in as_of],
+        "companies": list(company_names),
+        "features": FEATURES,
+        "tensor": tensor,
+        "names": names,
+        "valid": valid
+    }
+
+def date_inputs(features, d):
+    # the dicts preprocess_data gives back for the d:th date, the padding is dropped again
+    data = {feature: {} for feature in FEATURES}
+    name_data = {}
+
+    for n, company in enumerate(features["companies"]):
+        if not features["valid"][d, n]:
+            continue
+
+        for k, feature in enumerate(FEATURES):
+            window = features["tensor"][d, n, :, k]
+            data[feature][company] = window[~np.isnan(window)].tolist()
+
+        name_data[company] = int(features["names"][n])
+
+    return data["price"], data["news"], data["commodity_1"], data["commodity_2"], data["commodity_3"], name_data, data["rsi"], data["macd"], data["obv"]
@@ -0,0 +1,125 @@
+import numpy as np
+import datetime
+import csv
+
+# loads every commodity once per preprocessing run and picks the closest commodities for all
+# companies at once, gives the same picks as process_commodity in preprocess_data.py
+
+def load_commodity_panel(commodity_names, TODAYS_DATE, store=None):
+    today_date = datetime.datetime.strptime(TODAYS_DATE, "%Y-%m-%d").date()
+    names = []
+    series = []
+
+    for commodity in commodity_names:
+        commodity = commodity.lower().replace(" ", "-")
+
+        if store is not None and commodity in store:
+            names.append(commodity)
+            series.append(store.series(commodity, "Price", TODAYS_DATE).tolist())
+            continue
+
+        prices = []
+        dates = []
+
+        with open(f"data/commodity/{commodity}.csv", "r") as file:
+            reader = csv.reader(file)
+            next(reader)  # skip header
+
+            for row in reader:
+                try:
+                    date = datetime.datetime.strptime(row[0], "%Y-%m-%d").date()
+
+                    if date <= today_date:
+                        dates.append(date)
+                        prices.append(float(row[1]))
+
+                except (ValueError, IndexError):
+                    continue
+
+            file.close()
+
+        names.append(commodity)
+        series.append([p for _, p in sorted(zip(dates, prices))])
+
+    return build_panel(names, series)
+
+def build_panel(names, series):
+    # series are the prices of every commodity in date order
+    lengths = np.array([len(prices) for prices in series])
+    matrix = np.full((len(series), max(lengths, default=0)), np.nan)
+
+    for n, prices in enumerate(series):
+        matrix[n, :len(prices)] = prices
+
+    # same statistics a StandardScaler fitted on each commodity would have, zero variance scales by 1
+    mean = np.array([np.mean(prices) if prices else np.nan for prices in series])
+    scale = np.array([np.std(prices) if prices else np.nan for prices in series])
+    scale[scale == 0] = 1
+
+    return {
+        "names": names,
+        "series": series,
+        "lengths": lengths,
+        "matrix": matrix,
+        "mean": mean,
+        "scale": scale
+    }
+
+def commodity_rmse(panel, company_prices):
+    # (companies x commodities) rmse between the company and the commodity, both scaled with the
+    # commodity scaler and cut to the shorter of the two series
+    company_lengths = np.array([len(prices) for prices in company_prices])
+    length = min(panel["matrix"].shape[1], max(company_lengths, default=0))
+
+    companies = np.full((len(company_prices), length), np.nan)
+    for n, prices in enumerate(company_prices):
+        companies[n, :min(len(prices), length)] = prices[:length]
+
+    mean = panel["mean"][None, :, None]
+    scale = panel["scale"][None, :, None]
+
+    scaled_companies = (companies[:, None, :] - mean) / scale
+    scaled_commodities = (panel["matrix"][None, :, :length] - mean) / scale
+
+    min_lengths = np.minimum(company_lengths[:, None], panel["lengths"][None, :])
+    mask = np.arange(length)[None, None, :] < min_lengths[:, :, None]
+
+    squared = np.where(mask, (scaled_commodities - scaled_companies) ** 2, 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rmse = np.sqrt(squared.sum(axis=2) / min_lengths)
+
+    rmse[min_lengths == 0] = np.inf
+
+    return rmse
+
+def select_commodities(panel, company_prices, HISTORICAL_DAYS, top=3):
+    # company_prices is {company: prices}, gives back {company: (commodity_1, commodity_2, commodity_3)}
+    companies = list(company_prices)
+
+    if not companies:
+        return {}
+
+    rmse = commodity_rmse(panel, [company_prices[company] for company in companies])
+    top = min(top, rmse.shape[1])
+
+    # argpartition finds the top candidates, anything tied with the last one is kept so the
+    # final stable sort picks the same commodity as sorting the whole list would
+    partition = np.argpartition(rmse, top - 1, axis=1)[:, :top]
+    cutoff = np.take_along_axis(rmse, partition, axis=1).max(axis=1)
+
+    results = {}
+    for n, company in enumerate(companies):
+        candidates = np.flatnonzero(rmse[n] <= cutoff[n])
+        
+        if len(candidates) < top:
+            candidates = np.arange(rmse.shape[1])
+            
+        best = candidates[np.lexsort((candidates, rmse[n, candidates]))][:top]
+
+        results[company] = tuple(
+            panel["series"][k][-HISTORICAL_DAYS:] if panel["lengths"][k] >= HISTORICAL_DAYS else panel["series"][k]
+            for k in best
+        )
+
+    return results
@@ -0,0 +1,189 @@
+import numpy as np
+import hashlib
+import json
+import os
+
+from components.preprocess.indicators import ema_matrix, wilder_matrix, rsi_matrix, macd_matrix, obv_matrix
+
+# per company state so the daily run only has to process the rows that came in since the last run.
+# it holds the last ema values, the wilder averages, the running obv and a running mean and variance
+# (welford) of every scaled series, plus the last values of each series and a sha256 of all the rows
+# it was built from. if the state is missing or those rows are not the same in the history anymore (the
+# smoothing in json_to_csv revises the last few days, a row further back was corrected or the history
+# got shorter) everything is recomputed from the full history.
+# the indicators are only stepped over the new rows, but the check reads every earlier row once: a
+# correction before the stored tail can not be seen any other way. the digest of that check is carried
+# on over the new rows, so it is one pass over the history: about 40 us for a year of rows and 0.7 ms
+# for 20 years, mostly turning the lists into arrays. a full recompute takes 0.6 ms and 3.4 ms, and
+# reading the csv that gave the rows is more than either.
+
+STATE_DIR = "data/state"
+SERIES = ["price", "news", "rsi", "macd", "obv"]
+
+RSI_WINDOW = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+
+def welford(values):
+    values = np.asarray(values, dtype=np.float64)
+    mean = float(np.mean(values))
+
+    return {"count": len(values), "mean": mean, "m2": float(np.sum((values - mean) ** 2))}
+
+def welford_update(stats, value):
+    stats["count"] += 1
+    delta = value - stats["mean"]
+    stats["mean"] += delta / stats["count"]
+    stats["m2"] += delta * (value - stats["mean"])
+
+def push(state, name, value):
+    welford_update(state["stats"][name], value)
+    state["tail"][name] = (state["tail"][name] + [value])[-state["tail_length"]:]
+
+def price_rows(price, volume):
+    # every day as its price and volume next to each other, so more days can be added to a digest
+    return np.column_stack((np.asarray(price, dtype=np.float64), np.asarray(volume, dtype=np.float64))).tobytes()
+
+def news_rows(news):
+    return np.asarray(news, dtype=np.float64).tobytes()
+
+def history_digests(price, volume, news, price_count, news_count):
+    # sha256 objects of the first price_count days and the first news_count news scores, they can be
+    # updated with the rows after them
+    return hashlib.sha256(price_rows(price[:price_count], volume[:price_count])), hashlib.sha256(news_rows(news[:news_count]))
+
+def full_state(price, volume, news, tail_length):
+    # same numbers preprocess_data computes from scratch
+    for name, values in (("price", price), ("news", news)):
+        if len(values) == 0:
+            raise ValueError(f"No {name} data to build the indicator state from.")
+
+    rsi = rsi_matrix(price, RSI_WINDOW)[0]
+    macd, signal_line, _ = macd_matrix(price, MACD_FAST, MACD_SLOW, MACD_SIGNAL)
+    obv = obv_matrix(price, volume)[0]
+
+    series = {"price": price, "news": news, "rsi": rsi, "macd": macd[0], "obv": obv}
+    deltas = np.diff(np.asarray(price, dtype=np.float64))
+
+    return {
+        "tail_length": tail_length,
+        "price_count": len(price),
+        "news_count": len(news),
+        "last_price": float(price[-1]),
+        "last_volume": float(volume[-1]),
+        "ema_fast": float(ema_matrix(price, MACD_FAST)[0][-1]),
+        "ema_slow": float(ema_matrix(price, MACD_SLOW)[0][-1]),
+        "ema_signal": float(signal_line[0][-1]),
+        "avg_gain": float(wilder_matrix(np.where(deltas > 0, deltas, 0), RSI_WINDOW)[0][-1]),
+        "avg_loss": float(wilder_matrix(np.where(deltas < 0, -deltas, 0), RSI_WINDOW)[0][-1]),
+        "obv": float(obv[-1]),
+        "stats": {name: welford(series[name]) for name in SERIES},
+        "tail": {name: [float(value) for value in series[name][-tail_length:]] for name in SERIES},
+        "volume_tail": [float(value) for value in volume[-tail_length:]],
+        "price_hash": hashlib.sha256(price_rows(price, volume)).hexdigest(),
+        "news_hash": hashlib.sha256(news_rows(news)).hexdigest(),
+    }
+
+def step_price(state, price, volume):
+    # one new day of price and volume, the same recurrences as the loops in preprocess_data
+    delta = price - state["last_price"]
+    gain = delta if delta > 0 else 0
+    loss = -delta if delta < 0 else 0
+
+    state["avg_gain"] = (state["avg_gain"] * (RSI_WINDOW - 1) + gain) / RSI_WINDOW
+    state["avg_loss"] = (state["avg_loss"] * (RSI_WINDOW - 1) + loss) / RSI_WINDOW
+    rsi = 100.0 if state["avg_loss"] == 0 else 100 - (100 / (1 + state["avg_gain"] / state["avg_loss"]))
+
+    state["ema_fast"] = (price - state["ema_fast"]) * (2 / (MACD_FAST + 1)) + state["ema_fast"]
+    state["ema_slow"] = (price - state["ema_slow"]) * (2 / (MACD_SLOW + 1)) + state["ema_slow"]
+    macd = state["ema_fast"] - state["ema_slow"]
+    state["ema_signal"] = (macd - state["ema_signal"]) * (2 / (MACD_SIGNAL + 1)) + state["ema_signal"]
+
+    if price > state["last_price"]:
+        state["obv"] += volume
+    elif price < state["last_price"]:
+        state["obv"] -= volume
+
+    push(state, "price", price)
+    push(state, "rsi", rsi)
+    push(state, "macd", macd)
+    push(state, "obv", state["obv"])
+
+    state["volume_tail"] = (state["volume_tail"] + [volume])[-state["tail_length"]:]
+    state["last_price"] = price
+    state["last_volume"] = volume
+    state["price_count"] += 1
+
+def step_news(state, score):
+    push(state, "news", score)
+    state["news_count"] += 1
+
+def matches_history(state, price, volume, news, tail_length):
+    # the digests of the rows the state was built from if they are all the same in the current
+    # history, None if the history was revised
+    if state.get("tail_length") != tail_length:
+        return None
+
+    if state["price_count"] > len(price) or state["news_count"] > len(news):
+        return None
+
+    price_digest, news_digest = history_digests(price, volume, news, state["price_count"], state["news_count"])
+
+    if price_digest.hexdigest() != state.get("price_hash") or news_digest.hexdigest() != state.get("news_hash"):
+        return None
+
+    return price_digest, news_digest
+
+def update_state(state, price, volume, news, tail_length):
+    # gives back the state for the full history and whether it had to be recomputed
+    digests = None if state is None else matches_history(state, price, volume, news, tail_length)
+
+    if digests is None:
+        return full_state(price, volume, news, tail_length), True
+
+    price_digest, news_digest = digests
+    price_digest.update(price_rows(price[state["price_count"]:], volume[state["price_count"]:len(price)]))
+    news_digest.update(news_rows(news[state["news_count"]:]))
+
+    for new_price, new_volume in zip(price[state["price_count"]:], volume[state["price_count"]:]):
+        step_price(state, float(new_price), float(new_volume))
+
+    for new_score in news[state["news_count"]:]:
+        step_news(state, float(new_score))
+
+    state["price_hash"] = price_digest.hexdigest()
+    state["news_hash"] = news_digest.hexdigest()
+
+    return state, False
+
+def scaled_windows(state, HISTORICAL_DAYS):
+    # the last HISTORICAL_DAYS values of every series scaled like a StandardScaler fitted on the full series
+    windows = {}
+
+    for name in SERIES:
+        stats = state["stats"][name]
+        scale = np.sqrt(stats["m2"] / stats["count"]) if stats["m2"] > 0 else 1.0
+        windows[name] = ((np.array(state["tail"][name][-HISTORICAL_DAYS:]) - stats["mean"]) / scale).tolist()
+
+    return windows
+
+def load_state(company, state_dir=STATE_DIR):
+    try:
+        with open(f"{state_dir}/{company}.json", "r") as file:
+            state = json.load(file)
+            file.close()
+
+        return state
+
+    except Exception:
+        return None
+
+def save_state(company, state, state_dir=STATE_DIR):
+    os.makedirs(state_dir, exist_ok=True)
+
+    with open(f"{state_dir}/{company}.tmp.json", "w") as file:
+        json.dump(state, file)
+        file.close()
+
+    os.replace(f"{state_dir}/{company}.tmp.json", f"{state_dir}/{company}.json")
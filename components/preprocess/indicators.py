@@ -0,0 +1,100 @@
+from scipy.signal import lfilter
+import numpy as np
+
+# array versions of calculate_rsi, calculate_macd and calculate_obv in preprocess_data.py
+# all of them work on a 2d (companies x days) matrix so the whole universe is done in one call,
+# a 1d series is treated as a single company
+
+def as_matrix(data):
+    data = np.asarray(data, dtype=np.float64)
+
+    return data.reshape(1, -1) if data.ndim == 1 else data
+
+def ema_matrix(data, span):
+    # ema[t] = alpha * data[t] + (1 - alpha) * ema[t-1], starting at the first data point
+    data = as_matrix(data)
+    alpha = 2 / (span + 1)
+
+    # the filter state makes the first output equal to the first data point
+    zi = ((1 - alpha) * data[:, 0]).reshape(-1, 1)
+    ema, _ = lfilter([alpha], [1, -(1 - alpha)], data, axis=1, zi=zi)
+
+    return ema
+
+def wilder_matrix(data, window=14):
+    # wilder smoothing seeded with the simple average of the first window, the first value is for data[window - 1]
+    data = as_matrix(data)
+
+    averages = np.empty((data.shape[0], data.shape[1] - window + 1))
+    averages[:, 0] = data[:, :window].sum(axis=1) / window
+
+    if data.shape[1] > window:
+        alpha = 1 / window
+        averages[:, 1:], _ = lfilter([alpha], [1, -(1 - alpha)], data[:, window:], axis=1, zi=((1 - alpha) * averages[:, :1]))
+
+    return averages
+
+def rsi_matrix(prices, window=14):
+    prices = as_matrix(prices)
+
+    if prices.shape[1] < window + 1:
+        raise ValueError("Not enough data points to calculate RSI for the given window.")
+
+    deltas = np.diff(prices, axis=1)
+    avg_gain = wilder_matrix(np.where(deltas > 0, deltas, 0), window)
+    avg_loss = wilder_matrix(np.where(deltas < 0, -deltas, 0), window)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(avg_loss == 0, 100.0, 100 - (100 / (1 + avg_gain / avg_loss)))
+
+    return rsi
+
+def macd_matrix(prices, fast=12, slow=26, signal=9):
+    prices = as_matrix(prices)
+
+    macd = ema_matrix(prices, fast) - ema_matrix(prices, slow)
+    signal_line = ema_matrix(macd, signal)
+    histogram = macd - signal_line
+
+    return macd, signal_line, histogram
+
+def obv_matrix(prices, volume):
+    prices = as_matrix(prices)
+    volume = as_matrix(volume)
+
+    if prices.shape != volume.shape:
+        raise ValueError("Prices and volume must have the same length.")
+
+    signed_volume = np.sign(np.diff(prices, axis=1)) * volume[:, 1:]
+    obv = np.zeros_like(prices)
+    obv[:, 1:] = np.cumsum(signed_volume, axis=1)
+
+    return obv
+
+def company_indicators(historical, window=14):
+    # {company: (rsi, macd, obv)} for {company: (prices, volume)}. companies with the same number of days
+    # are stacked and done in one call, a group that can not be done gets its exception instead
+    groups = {}
+
+    for company, (prices, volume) in historical.items():
+        groups.setdefault((len(prices), len(volume)), []).append(company)
+
+    results = {}
+
+    for companies in groups.values():
+        try:
+            prices = np.array([historical[company][0] for company in companies], dtype=np.float64)
+            volume = np.array([historical[company][1] for company in companies], dtype=np.float64)
+
+            rsi = rsi_matrix(prices, window)
+            macd = macd_matrix(prices)[0]
+            obv = obv_matrix(prices, volume)
+
+            for n, company in enumerate(companies):
+                results[company] = (rsi[n], macd[n], obv[n])
+
+        except Exception as e:
+            for company in companies:
+                results[company] = e
+
+    return results
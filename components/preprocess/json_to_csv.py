@@ -4,6 +4,8 @@ import datetime
 import json
 import os
 
+from components.store.feature_store import update_store
+from components.store.news_store import get_news_store
 from components.logging.logging import write_to_log
 from components.misc.progress_bar import print_progress_bar
 
@@ -87,7 +89,7 @@ def load_day_data(company):
     save_to_processed_file(day_data, f"data/historical/{company}.csv")
 
 def load_news(company):
-    json_data = load_json_from_raw_file(f"data/raw_data/raw_news/{company}.json")
+    json_data = get_news_store().load(company)
 
     scores = []
     dates = []
@@ -148,6 +150,14 @@ def load_commodities(commodity):
 def json_to_csv():
     write_to_log(f"Json to CSV conversion start at: {datetime.datetime.now()}")
     
+    json_to_csv_historical()
+    json_to_csv_news()
+    json_to_csv_commodity()
+    
+    write_to_log(f"All CVS conversion done at: {datetime.datetime.now()}")
+
+# one function per data type so the pipeline can convert each type as soon as its scraping is done 
+def json_to_csv_historical():
     # process historical data
     index = 0 
     fails = 0 
@@ -172,22 +182,26 @@ AT: {datetime.datetime.now()}""")
             fails += 1 
             
     write_to_log(f"Historical data CSV conversion done with {fails} fails and {successes} successes")
+    
+    # keep the columnar feature store in sync with the new csv files 
+    update_store("historical")
 
+def json_to_csv_news():
     # process news data
     index = 0 
     fails = 0 
     successes = 0
     
-    for filename in os.listdir("data/raw_data/raw_news"):
-        print_progress_bar(index, len(os.listdir("data/raw_data/raw_news")), description="Converting news data to csv")
+    companies = get_news_store().companies()
+    
+    for company in companies:
+        print_progress_bar(index, len(companies), description="Converting news data to csv")
         index += 1 
         
         try: 
-            if filename.endswith(".json"):
-                company = filename.split(".json")[0]
-                load_news(company)
-                
-                successes += 1 
+            load_news(company)
+            
+            successes += 1 
                 
         except Exception as e: 
             write_to_log(f"""Failed to convert {company} news data to csv. 
@@ -197,7 +211,9 @@ AT: {datetime.datetime.now()}""")
             fails += 1 
 
     write_to_log(f"News data CSV conversion done with {fails} fails and {successes} successes")
+    update_store("news")
 
+def json_to_csv_commodity():
     # process commodity data
     index = 0 
     fails = 0 
@@ -222,4 +238,4 @@ AT: {datetime.datetime.now()}""")
             fails += 1 
             
     write_to_log(f"News data CSV conversion done with {fails} fails and {successes} successes")
-    write_to_log(f"All CVS conversion done at: {datetime.datetime.now()}")
\ No newline at end of file
+    update_store("commodity")
\ No newline at end of file
@@ -4,13 +4,21 @@ import datetime
 import csv
 import os
 
+from components.preprocess.commodity_panel import load_commodity_panel, select_commodities
+from components.store.feature_store import open_store
+from components.preprocess.incremental_state import load_state, save_state, update_state, scaled_windows
+from components.preprocess.indicators import company_indicators
 from components.logging.logging import write_to_log
 from components.misc.progress_bar import print_progress_bar
 
 # def write_to_log(text): 
 #     print(text)
     
-def process_historical(company_name, TODAYS_DATE):
+def process_historical(company_name, TODAYS_DATE, store=None):
+    if store is not None and company_name in store: 
+        price_data, volume_data = store.rows(company_name, TODAYS_DATE)
+        return price_data.tolist(), volume_data.tolist()
+    
     today_date = datetime.datetime.strptime(TODAYS_DATE, "%Y-%m-%d").date()
     price_data = []
     volume_data = []
@@ -96,7 +104,10 @@ def calculate_obv(prices, volume):
     
     return obv
 
-def process_news(company_name, TODAYS_DATE):
+def process_news(company_name, TODAYS_DATE, store=None):
+    if store is not None and company_name in store: 
+        return store.series(company_name, "Score", TODAYS_DATE).tolist()
+    
     today_date = datetime.datetime.strptime(TODAYS_DATE, "%Y-%m-%d").date()
     score_data = []
     
@@ -190,7 +201,7 @@ def process_commodity(commodity_names, company_price, HISTORICAL_DAYS, TODAYS_DA
     
     return tuple(results)
 
-def preprocess_data(company_names, commodity_names, company_index, HISTORICAL_DAYS, TODAYS_DATE):
+def preprocess_data(company_names, commodity_names, company_index, HISTORICAL_DAYS, TODAYS_DATE, incremental=False):
     write_to_log(f"Preprocessing data start at: {datetime.datetime.now()}")
     
     scalers = {
@@ -206,6 +217,7 @@ def preprocess_data(company_names, commodity_names, company_index, HISTORICAL_DA
     index = 0 
     fails = 0 
     successes = 0
+    recomputes = 0
     
     price_data = {}
     news_data = {}
@@ -217,31 +229,78 @@ def preprocess_data(company_names, commodity_names, company_index, HISTORICAL_DA
     macd_data = {}
     obv_data = {}
     
+    # load all prices and the commodities once so the closest commodities for every company are found in one go 
+    historical = {}
+    best_commodities = {}
+    
+    # the columnar store is used when it is up to date with the csv files, otherwise the csv files are read 
+    historical_store = open_store("historical")
+    news_store = open_store("news")
+    commodity_store = open_store("commodity")
+    
+    for company in company_names:
+        try: 
+            historical[company] = process_historical(company, TODAYS_DATE, historical_store)
+            
+        except Exception: 
+            continue # logged when the company is processed below 
+        
+    try: 
+        commodity_panel = load_commodity_panel(commodity_names, TODAYS_DATE, commodity_store)
+        best_commodities = select_commodities(commodity_panel, {company: historical[company][0] for company in historical}, HISTORICAL_DAYS)
+        
+    except Exception as e: 
+        write_to_log(f"""Failed to load commodity panel, falling back to per company commodity processing:
+Error: {e}
+At: {datetime.datetime.now()}""")
+    
+    # the indicators of every company in one call per history length instead of one call per company 
+    indicators = {} if incremental else company_indicators(historical)
+    
     for company in company_names:
         print_progress_bar(index, len(company_names), description="Preprocessing data: ")
         index += 1 
 
         try: 
-            price, volume = process_historical(company, TODAYS_DATE)
-            news = process_news(company, TODAYS_DATE)
-            commodity_1, commodity_2, commodity_3 = process_commodity(commodity_names, price, HISTORICAL_DAYS, TODAYS_DATE)
-            rsi = calculate_rsi(price)
-            macd, _, _ = calculate_macd(price)
-            obv = calculate_obv(price, volume)
+            price, volume = historical[company] if company in historical else process_historical(company, TODAYS_DATE, historical_store)
+            news = process_news(company, TODAYS_DATE, news_store)
+            
+            if company in best_commodities: 
+                commodity_1, commodity_2, commodity_3 = best_commodities[company]
+                
+            else: 
+                commodity_1, commodity_2, commodity_3 = process_commodity(commodity_names, price, HISTORICAL_DAYS, TODAYS_DATE)
+                
+            if incremental: 
+                # only the rows that came in since the last run are processed, the state is rebuilt if the history changed 
+                state, recomputed = update_state(load_state(company), price, volume, news, HISTORICAL_DAYS)
+                save_state(company, state)
+                recomputes += recomputed
+                
+                windows = scaled_windows(state, HISTORICAL_DAYS)
+                price, news, rsi, macd, obv = windows["price"], windows["news"], windows["rsi"], windows["macd"], windows["obv"]
+                
+            else: 
+                result = indicators.get(company) or company_indicators({company: (price, volume)})[company]
+                
+                if isinstance(result, Exception): 
+                    raise result
+                
+                rsi, macd, obv = result
             
-            # convert lists to NumPy arrays for scaling
-            price = np.array(price).reshape(-1, 1)
-            news = np.array(news).reshape(-1, 1)
-            rsi = np.array(rsi).reshape(-1, 1)
-            macd = np.array(macd).reshape(-1, 1)
-            obv = np.array(obv).reshape(-1, 1)
+                # convert lists to NumPy arrays for scaling
+                price = np.array(price).reshape(-1, 1)
+                news = np.array(news).reshape(-1, 1)
+                rsi = np.array(rsi).reshape(-1, 1)
+                macd = np.array(macd).reshape(-1, 1)
+                obv = np.array(obv).reshape(-1, 1)
 
-            # scale
-            price = scalers["prices"].fit_transform(price).flatten().tolist()
-            news = scalers["news"].fit_transform(news).flatten().tolist()
-            rsi = scalers["rsi"].fit_transform(rsi).flatten().tolist()
-            macd = scalers["macd"].fit_transform(macd).flatten().tolist()
-            obv = scalers["obv"].fit_transform(obv).flatten().tolist()
+                # scale
+                price = scalers["prices"].fit_transform(price).flatten().tolist()
+                news = scalers["news"].fit_transform(news).flatten().tolist()
+                rsi = scalers["rsi"].fit_transform(rsi).flatten().tolist()
+                macd = scalers["macd"].fit_transform(macd).flatten().tolist()
+                obv = scalers["obv"].fit_transform(obv).flatten().tolist()
             
             price_data[company] = price[-HISTORICAL_DAYS:]
             news_data[company] = news[-HISTORICAL_DAYS:]
@@ -265,6 +324,9 @@ At: {datetime.datetime.now()}""")
 
     write_to_log(f"""Preprocessing done with {successes} successes and {fails} fails at: {datetime.datetime.now()}""")
     
+    if incremental: 
+        write_to_log(f"Incremental preprocessing had to recompute the full history for {recomputes} companies")
+    
     if successes + fails != len(company_names): 
         write_to_log(f"""Something is wrong with preprocessing, the companies processed do not match the number of companies. 
 Done: {successes + fails}
@@ -0,0 +1,97 @@
+from transformers import AutoModelForSequenceClassification
+import torch
+import os
+
+# the ways finbert can run. all of them are made from the same checkpoint and give logits for the
+# same labels, the quantized and exported ones are kept in data/models so they are only made once.
+#   fp32: the model as it is published, on the gpu if there is one
+#   int8: linear layers dynamically quantized to int8, cpu only
+#   onnx: exported to onnx and run with onnxruntime on the cpu, needs the onnxruntime package
+
+MODEL_DIR = "data/models"
+BACKENDS = ["fp32", "int8", "onnx"]
+
+def model_path(model_name, backend, model_dir=MODEL_DIR):
+    extension = "onnx" if backend == "onnx" else "pt"
+
+    return f"{model_dir}/{model_name.replace('/', '--')}-{backend}.{extension}"
+
+def load_fp32(model_name):
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    return model
+
+def load_int8(model_name, model_dir=MODEL_DIR):
+    path = model_path(model_name, "int8", model_dir)
+
+    if os.path.exists(path):
+        model = torch.load(path, weights_only=False)
+
+    else:
+        model = torch.quantization.quantize_dynamic(load_fp32(model_name), {torch.nn.Linear}, dtype=torch.qint8)
+
+        os.makedirs(model_dir, exist_ok=True)
+        torch.save(model, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    model.eval()
+
+    return model
+
+def export_onnx(model_name, path):
+    model = load_fp32(model_name)
+    model.config.return_dict = False
+
+    input_ids = torch.ones((1, 8), dtype=torch.long)
+    attention_mask = torch.ones((1, 8), dtype=torch.long)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    torch.onnx.export(
+        model, (input_ids, attention_mask), path + ".tmp",
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"}, "logits": {0: "batch"}},
+        opset_version=14
+    )
+    os.replace(path + ".tmp", path)
+
+class OnnxClassifier:
+    # called like the torch model, gives back {"logits": tensor}
+    def __init__(self, path):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, input_ids, attention_mask=None):
+        logits = self.session.run(["logits"], {
+            "input_ids": input_ids.cpu().numpy(),
+            "attention_mask": attention_mask.cpu().numpy()
+        })[0]
+
+        return {"logits": torch.from_numpy(logits)}
+
+def load_onnx(model_name, model_dir=MODEL_DIR):
+    path = model_path(model_name, "onnx", model_dir)
+
+    if not os.path.exists(path):
+        export_onnx(model_name, path)
+
+    return OnnxClassifier(path)
+
+def load_backend(model_name, backend="fp32", model_dir=MODEL_DIR):
+    # gives back (model, device), only fp32 runs on the gpu
+    if backend == "fp32":
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        return load_fp32(model_name).to(device), device
+
+    if backend == "int8":
+        return load_int8(model_name, model_dir), torch.device("cpu")
+
+    if backend == "onnx":
+        return load_onnx(model_name, model_dir), torch.device("cpu")
+
+    raise ValueError(f"Unknown sentiment backend {backend}, use one of {BACKENDS}.")
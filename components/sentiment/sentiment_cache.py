@@ -0,0 +1,95 @@
+import unicodedata
+import threading
+import datetime
+import hashlib
+import sqlite3
+import os
+
+# scores of headlines that have been through the model before, shared by all companies and runs.
+# the key is a hash of the model id and the normalized headline, so the same wire headline under
+# several companies or dates is only scored once. every lookup is counted per day in the stats
+# table together with the model time the hits saved.
+
+CACHE_PATH = "data/sentiment_cache.sqlite"
+
+def normalize_headline(text):
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+def headline_key(text, model_id):
+    return hashlib.sha256(f"{model_id}\n{normalize_headline(text)}".encode("utf-8")).hexdigest()
+
+class SentimentCache:
+    def __init__(self, model_id, path=CACHE_PATH):
+        self.model_id = model_id
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        # wal lets the news process and other readers use the cache at the same time
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, model TEXT, score REAL, label TEXT, created TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS stats (day TEXT, model TEXT, hits INTEGER, misses INTEGER, saved_seconds REAL, PRIMARY KEY (day, model))")
+        self.connection.commit()
+
+    def get_many(self, texts):
+        # {text: (score, label)} for the texts that are cached
+        keys = {headline_key(text, self.model_id): text for text in texts}
+        found = {}
+
+        with self.lock:
+            items = list(keys)
+
+            # sqlite limits the number of parameters of one query
+            for start in range(0, len(items), 500):
+                chunk = items[start:start + 500]
+                rows = self.connection.execute(f"SELECT key, score, label FROM scores WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+
+                for key, score, label in rows:
+                    found[keys[key]] = (score, label)
+
+        return found
+
+    def put_many(self, results):
+        # results is {text: (score, label)}
+        now = datetime.datetime.now().isoformat()
+
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+                [(headline_key(text, self.model_id), self.model_id, score, label, now) for text, (score, label) in results.items()]
+            )
+            self.connection.commit()
+
+    def record(self, hits, misses, seconds_per_headline):
+        # counts a lookup, a hit saves about the time the model needs for one headline
+        day = datetime.date.today().strftime("%Y-%m-%d")
+
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+
+            self.connection.execute("INSERT OR IGNORE INTO stats VALUES (?, ?, 0, 0, 0)", (day, self.model_id))
+            self.connection.execute(
+                "UPDATE stats SET hits = hits + ?, misses = misses + ?, saved_seconds = saved_seconds + ? WHERE day = ? AND model = ?",
+                (hits, misses, hits * seconds_per_headline, day, self.model_id)
+            )
+            self.connection.commit()
+
+    def stats(self, days=30):
+        # [(day, hits, misses, hit rate, saved seconds)], newest first
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT day, hits, misses, saved_seconds FROM stats WHERE model = ? ORDER BY day DESC LIMIT ?", (self.model_id, days)
+            ).fetchall()
+
+        return [(day, hits, misses, hits / (hits + misses) if hits + misses else 0, saved) for day, hits, misses, saved in rows]
+
+if __name__ == "__main__":
+    # run from the project root with: python -m components.sentiment.sentiment_cache
+    from components.sentiment.sentiment_engine import MODEL_NAME
+
+    for day, hits, misses, rate, saved in SentimentCache(MODEL_NAME).stats():
+        print(f"{day}: {hits} hits, {misses} misses, {rate:.0%} hit rate, {saved:.1f} s of model time saved")
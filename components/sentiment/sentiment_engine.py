@@ -0,0 +1,126 @@
+from transformers import AutoTokenizer
+import threading
+import datetime
+import torch
+import time
+import re
+
+from components.sentiment.sentiment_backends import load_backend
+from components.sentiment.sentiment_cache import SentimentCache, CACHE_PATH, normalize_headline
+from components.store.news_store import get_news_store
+from components.logging.logging import write_to_log
+
+MODEL_NAME = "ProsusAI/finbert"
+LABELS = ["positive", "negative", "neutral"]
+BACKEND = "fp32"  # fp32, int8 or onnx, see sentiment_backends.py. python -m components.benchmark.sentiment_benchmark compares them
+SENTIMENT_SOURCE = "title"  # the article field that is scored, title or content. content falls back to the title when it is empty
+
+# one engine per process, the model is only loaded the first time it is asked for
+_engine = None
+_engine_lock = threading.Lock()
+
+def clean_text(text):
+    text = text.replace(".", ". ").replace(" ", " ").replace("\n", " ")
+
+    return re.sub(r"[^\x00-\x7F]+", " ", text)
+
+class SentimentEngine:
+    def __init__(self, model_name=MODEL_NAME, batch_size=32, max_length=512, cache_path=CACHE_PATH, backend=BACKEND):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.backend = backend
+
+        # headlines scored before, by any company, are taken from the cache. cache_path None turns it off.
+        # the backends can give slightly different scores so each one has its own entries
+        self.cache = SentimentCache(model_name if backend == "fp32" else f"{model_name}:{backend}", cache_path) if cache_path else None
+        self.seconds_per_headline = 0
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model, self.device = load_backend(model_name, backend)
+
+    def run_model(self, texts):
+        # (probability, sentiment) for every text, in the same order as texts
+        results = [None] * len(texts)
+
+        # sorting by length keeps the padding in each batch small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+
+                tokens = self.tokenizer([texts[i] for i in batch], return_tensors="pt", padding=True,
+                                        truncation=True, max_length=self.max_length).to(self.device)
+                logits = self.model(tokens["input_ids"], attention_mask=tokens["attention_mask"])["logits"]
+                probabilities = torch.nn.functional.softmax(logits, dim=-1)
+                best = torch.argmax(probabilities, dim=-1)
+
+                for row, i in enumerate(batch):
+                    results[i] = (probabilities[row, best[row]].item(), LABELS[best[row].item()])
+
+        return results
+
+    def score(self, texts):
+        # returns (probability, sentiment) for every text, in the same order as texts
+        # the tokenizer ignores extra whitespace, so copies that only differ in it are scored once
+        texts = [normalize_headline(text) for text in texts]
+        unique = list(dict.fromkeys(text for text in texts if text))
+        known = self.cache.get_many(unique) if self.cache is not None else {}
+        missing = [text for text in unique if text not in known]
+
+        start_time = time.time()
+        scored = dict(zip(missing, self.run_model(missing)))
+
+        if missing:
+            self.seconds_per_headline = (time.time() - start_time) / len(missing)
+
+        if self.cache is not None:
+            self.cache.put_many(scored)
+            self.cache.record(len(known), len(missing), self.seconds_per_headline)
+
+        scored.update(known)
+
+        return [scored[text] if text else (0, LABELS[-1]) for text in texts]
+
+    def score_companies(self, companies):
+        # scores every unscored headline of every company in one go, only those articles are read from
+        # and written back to the news store
+        news = get_news_store().unscored(companies)
+        pending = []
+
+        for company in companies:
+            for date in news[company]:
+                for article in news[company][date]:
+                    text = news[company][date][article].get(SENTIMENT_SOURCE)
+
+                    if not isinstance(text, str) or not text:
+                        text = news[company][date][article].get("title")
+
+                    if isinstance(text, str):
+                        pending.append((company, date, article, clean_text(text)))
+
+        hits = self.cache.hits if self.cache is not None else 0
+        scores = self.score([text for _, _, _, text in pending])
+        hits = self.cache.hits - hits if self.cache is not None else 0
+
+        for (company, date, article, _), (probability, sentiment) in zip(pending, scores):
+            news[company][date][article]["score"] = probability
+            news[company][date][article]["finbert_sentiment"] = sentiment
+
+        get_news_store().update(news, ["score", "finbert_sentiment"])
+
+        write_to_log(f"Sentiment analysis scored {len(pending)} headlines for {len(news)} companies, {hits} unique headlines from the cache saved about {hits * self.seconds_per_headline:.1f} s at: {datetime.datetime.now()}")
+
+        return get_news_store().load_many(companies)
+
+def get_sentiment_engine():
+    global _engine
+
+    # the lock keeps two threads from loading the model at the same time, the second one waits for the first
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SentimentEngine()
+
+    return _engine
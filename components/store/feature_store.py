@@ -0,0 +1,166 @@
+import numpy as np
+import datetime
+import json
+import csv
+import os
+
+from components.logging.logging import write_to_log
+
+# columnar copy of the csv files in data/historical, data/news and data/commodity.
+# every data type is one .npy file of shape (fields, entities, days) on a daily date axis plus a
+# .json with the entity index, the fields and the first date. missing days are nan.
+# the .npy is opened memory mapped so slicing the last n days of all entities does not copy anything.
+
+STORE_DIR = "data/store"
+
+KINDS = {
+    "historical": {"directory": "data/historical", "fields": ["Adj Close", "Volume"]},
+    "news": {"directory": "data/news", "fields": ["Score"]},
+    "commodity": {"directory": "data/commodity", "fields": ["Price"]},
+}
+
+def parse_date(date):
+    return datetime.datetime.strptime(date[:10], "%Y-%m-%d").date()
+
+class FeatureStore:
+    def __init__(self, kind, store_dir=STORE_DIR):
+        with open(f"{store_dir}/{kind}.json", "r") as file:
+            meta = json.load(file)
+            file.close()
+
+        self.kind = kind
+        self.fields = meta["fields"]
+        self.entities = meta["entities"]
+        self.entity_index = {entity: n for n, entity in enumerate(self.entities)}
+        self.start_date = parse_date(meta["start_date"])
+        self.values = np.load(f"{store_dir}/{kind}.npy", mmap_mode="r")
+
+    def __contains__(self, entity):
+        return entity in self.entity_index
+
+    def num_days(self):
+        return self.values.shape[2]
+
+    def date_index(self, date):
+        # index of the last day on or before date, -1 if date is before the store starts
+        date = parse_date(date) if isinstance(date, str) else date
+
+        return min((date - self.start_date).days, self.num_days() - 1)
+
+    def dates(self):
+        return [self.start_date + datetime.timedelta(days=n) for n in range(self.num_days())]
+
+    def window(self, field, days, until=None):
+        # (entities x days) view of the last days up to and including until, no copy
+        end = self.num_days() if until is None else max(self.date_index(until) + 1, 0)
+
+        return self.values[self.fields.index(field), :, max(end - days, 0):end]
+
+    def series(self, entity, field, until=None):
+        # all known values of one entity up to and including until, in date order
+        end = self.num_days() if until is None else max(self.date_index(until) + 1, 0)
+        values = self.values[self.fields.index(field), self.entity_index[entity], :end]
+
+        return values[~np.isnan(values)]
+
+    def rows(self, entity, until=None):
+        # the days where all fields are known, like the rows the csv reader would keep
+        end = self.num_days() if until is None else max(self.date_index(until) + 1, 0)
+        values = self.values[:, self.entity_index[entity], :end]
+
+        return values[:, ~np.isnan(values).any(axis=0)]
+
+def read_csv_series(filename, fields):
+    dates = []
+    values = []
+
+    with open(filename, "r") as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        columns = [header.index(field) for field in fields]
+
+        for row in reader:
+            try:
+                date = parse_date(row[0])
+                row_values = [float(row[column]) for column in columns]
+
+            except (ValueError, IndexError):
+                continue
+
+            dates.append(date)
+            values.append(row_values)
+
+        file.close()
+
+    return dates, values
+
+def import_csv(kind, store_dir=STORE_DIR):
+    directory = KINDS[kind]["directory"]
+    fields = KINDS[kind]["fields"]
+
+    entities = []
+    series = []
+
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".csv"):
+            continue
+
+        entities.append(filename.split(".csv")[0])
+        series.append(read_csv_series(f"{directory}/{filename}", fields))
+
+    all_dates = [date for dates, _ in series for date in dates]
+    start_date = min(all_dates) if all_dates else datetime.date.today()
+    num_days = (max(all_dates) - start_date).days + 1 if all_dates else 0
+
+    values = np.full((len(fields), len(entities), num_days), np.nan)
+
+    for n, (dates, rows) in enumerate(series):
+        if dates:
+            # later rows win for duplicated dates, the same as reading the csv in order
+            values[:, n, [(date - start_date).days for date in dates]] = np.array(rows).T
+
+    os.makedirs(store_dir, exist_ok=True)
+
+    # write to temp files first so readers never see half a store
+    np.save(f"{store_dir}/{kind}.tmp.npy", values)
+    with open(f"{store_dir}/{kind}.tmp.json", "w") as file:
+        json.dump({"fields": fields, "entities": entities, "start_date": start_date.strftime("%Y-%m-%d")}, file)
+        file.close()
+
+    os.replace(f"{store_dir}/{kind}.tmp.npy", f"{store_dir}/{kind}.npy")
+    os.replace(f"{store_dir}/{kind}.tmp.json", f"{store_dir}/{kind}.json")
+
+    return len(entities), num_days
+
+def update_store(kind, store_dir=STORE_DIR):
+    try:
+        num_entities, num_days = import_csv(kind, store_dir)
+        write_to_log(f"Feature store {kind} imported with {num_entities} entities and {num_days} days at: {datetime.datetime.now()}")
+
+    except Exception as e:
+        write_to_log(f"""Failed to import {kind} data to the feature store.
+Error: {e}
+At: {datetime.datetime.now()}""")
+
+def import_csv_tree(store_dir=STORE_DIR):
+    for kind in KINDS:
+        update_store(kind, store_dir)
+
+def open_store(kind, store_dir=STORE_DIR):
+    # gives back None if the store is missing or older than any of its csv files, callers then read the csv files
+    try:
+        store_time = min(os.path.getmtime(f"{store_dir}/{kind}.npy"), os.path.getmtime(f"{store_dir}/{kind}.json"))
+        directory = KINDS[kind]["directory"]
+
+        for filename in os.listdir(directory):
+            if filename.endswith(".csv") and os.path.getmtime(f"{directory}/{filename}") > store_time:
+                return None
+
+        return FeatureStore(kind, store_dir)
+
+    except Exception:
+        return None
+
+if __name__ == "__main__":
+    # run from the project root with: python -m components.store.feature_store
+    import_csv_tree()
@@ -0,0 +1,193 @@
+import threading
+import datetime
+import sqlite3
+import json
+import os
+
+from components.logging.logging import write_to_log
+
+# the scraped news of all companies in one sqlite file instead of one json per company that was sorted
+# and rewritten completely after every scraped date, fetched article and sentiment run.
+# every article is one row keyed by (company, date, position), a scraped date is added in one
+# transaction and later updates only touch the fields of the articles that changed. dates that were
+# scraped are kept in their own table so a date without articles is not scraped again.
+# the json files of earlier runs are imported the first time the store is opened while it is empty,
+# or by hand with: python -m components.store.news_store
+
+NEWS_STORE_PATH = "data/news.sqlite"
+JSON_DIR = "data/raw_data/raw_news"
+
+FIELDS = ["title", "link", "snippet", "score", "sentiment", "probability", "content", "content_fetched", "description", "finbert_sentiment"]
+
+# one store per process, sqlite connections can not be shared with a forked process. the lock makes
+# the threads of the news stage that ask for it at the same time wait for the one that makes it
+_store = None
+_store_lock = threading.Lock()
+
+class NewsStore:
+    def __init__(self, path=NEWS_STORE_PATH):
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        # wal lets the news process write while the csv conversion and others read
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS dates (company TEXT, date TEXT, scraped TEXT, PRIMARY KEY (company, date))")
+        self.connection.execute(f"""CREATE TABLE IF NOT EXISTS articles (company TEXT, date TEXT, position INTEGER, {', '.join(FIELDS)},
+            PRIMARY KEY (company, date, position))""")
+        self.connection.commit()
+
+    def row_to_article(self, row):
+        article = dict(zip(FIELDS, row))
+
+        # sqlite has no booleans, None stays None for articles from before content_fetched existed
+        if article["content_fetched"] is not None:
+            article["content_fetched"] = bool(article["content_fetched"])
+
+        if article["finbert_sentiment"] is None:
+            del article["finbert_sentiment"]
+
+        return article
+
+    def is_empty(self):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM dates LIMIT 1").fetchone() is None
+
+    def companies(self):
+        with self.lock:
+            return [row[0] for row in self.connection.execute("SELECT DISTINCT company FROM dates ORDER BY company")]
+
+    def dates(self, company):
+        # every date of the company that has been scraped, with or without articles
+        with self.lock:
+            return {row[0] for row in self.connection.execute("SELECT date FROM dates WHERE company = ?", (company,))}
+
+    def add_date(self, company, date, articles, replace=True):
+        # articles is {position: {field: value}}, the date and its articles are written together
+        rows = [(company, date, int(position), *[article.get(field) for field in FIELDS]) for position, article in articles.items()]
+
+        with self.lock, self.connection:
+            if not replace and self.connection.execute("SELECT 1 FROM dates WHERE company = ? AND date = ?", (company, date)).fetchone():
+                return False
+
+            self.connection.execute("DELETE FROM articles WHERE company = ? AND date = ?", (company, date))
+            self.connection.execute("INSERT OR REPLACE INTO dates VALUES (?, ?, ?)", (company, date, datetime.datetime.now().isoformat()))
+            self.connection.executemany(f"INSERT INTO articles VALUES ({', '.join('?' * (len(FIELDS) + 3))})", rows)
+
+        return True
+
+    def query(self, companies, where=""):
+        # {company: {date: {position: article}}} with the newest date first, like the json files.
+        # positions are strings because that is what they were once a json file had been loaded
+        news = {company: {} for company in companies}
+
+        with self.lock:
+            for company in companies:
+                # a filtered query only gives back the dates that have matching articles
+                if not where:
+                    for (date,) in self.connection.execute("SELECT date FROM dates WHERE company = ? ORDER BY date DESC", (company,)):
+                        news[company][date] = {}
+
+                rows = self.connection.execute(
+                    f"SELECT date, position, {', '.join(FIELDS)} FROM articles WHERE company = ? {where} ORDER BY date DESC, position",
+                    (company,)
+                )
+
+                for date, position, *row in rows:
+                    news[company].setdefault(date, {})[str(position)] = self.row_to_article(row)
+
+        return news
+
+    def load(self, company):
+        return self.query([company])[company]
+
+    def load_many(self, companies):
+        return self.query(companies)
+
+    def unscored(self, companies):
+        # only the articles that have not been through the sentiment model
+        return self.query(companies, "AND score IS NULL")
+
+    def unfetched(self, companies):
+        # only the articles whose content was skipped or failed
+        return self.query(companies, "AND link IS NOT NULL AND (content IS NULL OR content_fetched = 0)")
+
+    def update(self, news, fields):
+        # writes the given fields of every article in news, nothing else in the store is touched
+        rows = [
+            (*[news[company][date][article].get(field) for field in fields], company, date, int(article))
+            for company in news for date in news[company] for article in news[company][date]
+        ]
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                f"UPDATE articles SET {', '.join(f'{field} = ?' for field in fields)} WHERE company = ? AND date = ? AND position = ?", rows
+            )
+
+        return len(rows)
+
+def get_news_store():
+    global _store
+
+    if _store is None or _store[0] != os.getpid():
+        with _store_lock:
+            if _store is None or _store[0] != os.getpid():
+                store = NewsStore()
+
+                # a new store starts with the history of the json files, otherwise the scraper only fills
+                # the last PERIOD days and the news csv files lose everything before that
+                if store.is_empty() and os.path.isdir(JSON_DIR):
+                    import_json_tree(store=store)
+
+                _store = (os.getpid(), store)
+
+    return _store[1]
+
+def reset_after_fork():
+    # a forked child makes its own store, the lock could have been held by a thread it does not have
+    global _store_lock
+    _store_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+def import_json_tree(directory=JSON_DIR, store=None):
+    # imports the raw news json files, dates that are already in the store are kept as they are
+    store = store or get_news_store()
+    imported = 0
+    skipped = 0
+
+    if not os.path.isdir(directory):
+        return imported
+
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+
+        company = filename.split(".json")[0]
+
+        try:
+            with open(f"{directory}/{filename}", "r") as file:
+                json_data = json.load(file)
+                file.close()
+
+            for date in json_data:
+                if store.add_date(company, date, json_data[date], replace=False):
+                    imported += 1
+
+                else:
+                    skipped += 1
+
+        except Exception as e:
+            write_to_log(f"""Failed to import {company} news into the news store at: {datetime.datetime.now()}
+Error: {e}""")
+
+    write_to_log(f"Imported {imported} dates of news into the news store, {skipped} were already there at: {datetime.datetime.now()}")
+
+    return imported
+
+if __name__ == "__main__":
+    # run from the project root with: python -m components.store.news_store
+    print(f"Imported {import_json_tree()} dates")
@@ -1,4 +1,3 @@
-from keras.models import load_model
 from dotenv import load_dotenv
 import datetime
 import time
@@ -6,13 +5,16 @@ import json
 import os
 
 from components.misc.clear_console import clear_console
+from components.misc.stage_scheduler import stage, run_stages
+from components.misc.progress_bar import pump_progress_bars
 from components.logging.logging import write_to_log 
 from components.get_data.get_news_data import get_news_data
 from components.get_data.get_commodity_data import get_commodity_data
 from components.get_data.get_historical_data import get_historical_data
-from components.preprocess.json_to_csv import json_to_csv
+from components.preprocess.json_to_csv import json_to_csv_historical, json_to_csv_news, json_to_csv_commodity
 from components.preprocess.preprocess_data import preprocess_data
-from components.prediction.prediction import make_predictions
+from components.prediction.prediction import make_predictions, sampling_policy
+from components.prediction.prediction_cache import PredictionCache
 from components.execute_trades.execute_trades import execute_trades
 
 # <Stock Trading AI Predictor>
@@ -38,6 +40,7 @@ from components.execute_trades.execute_trades import execute_trades
 ################
 
 # DO NOT CHANGE, have been tested +1m times to be the best. Maybe make so that it runs that every month? 
+# rerun the search with: python -m components.backtesting.parameter_sweep [grid|random|halving] [count or steps]
 DIVERSIFICATION = 6                        # number of stocks to invest in each day
 STOP_LOSS = 0.17591568344978034            # stop loss percentage
 TAKE_PROFIT = 0.2656486232205517           # take profit percentage
@@ -52,6 +55,9 @@ PERIOD = 8            # the days it will scrape, can be changed if you want more
 PREDICTION_DAYS = 1   # number of days forward it will predict, hardcoded in the ai to be one, DO NOT CHANGE  
 HISTORICAL_DAYS = 20  # the number of data points in the past it predicts with, ie data from the past 20 days for all data points, also hardcoded, DO NOT CHANGE
 TODAYS_DATE = datetime.datetime.now().strftime('%Y-%m-%d')
+HISTORICAL_CHUNK_SIZE = 50       # tickers per yfinance download, only the days since the last stored one are downloaded 
+INCREMENTAL_PREPROCESSING = True  # only processes the days added since the last run, keeps its state in data/state 
+NEWS_CONTENT = "lazy"  # eager, lazy or skip. lazy only downloads article bodies when the sentiment is scored on the content 
 
 ####################
 ### data loading ###
@@ -94,35 +100,84 @@ ALPACA_ENDPOINT = "https://paper-api.alpaca.markets"
 ###################
 
 # model vars, also do not change
-model = load_model("assets/model.h5")
+MODEL_PATH = "assets/model.h5"
+
+BATCHED_PREDICTION = True  # runs all the monte carlo passes for all companies as a few big batches instead of one model call per pass
+MAX_BATCH_SIZE = 4096      # max rows per model call when batched, lower it if it runs out of memory
+PREDICTION_CACHE = True    # reuses the prediction of a company when the model and its inputs are the same as in an earlier run, kept in data/prediction_cache
+ADAPTIVE_SAMPLING = True   # one pass if the model gives the same output every time, otherwise passes in chunks until the mean and std are stable
+MC_CHUNK_SIZE = 10         # passes added per company at a time
+MC_MAX_ITERATIONS = 100    # most passes per company
+MC_TOLERANCE = 1e-3        # mean and std have to change less than this between two chunks to stop
+
+COMPILED_INFERENCE = True  # calls the model through a compiled function traced once when it is loaded instead of model.predict, only used if it gives the same outputs as the keras model
+TFLITE_INFERENCE = False   # runs an exported assets/model.tflite instead, only used if it gives the same outputs as the keras model
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # suppress TensorFlow logs
 os.environ['KMP_AFFINITY'] = 'noverbose'  # suppress OpenMP logs
 
+def load_prediction_model(): 
+    # loaded in its own stage while the data is scraped and not when main is imported. on windows the
+    # news process imports main again and would load tensorflow and the model for nothing 
+    from keras.models import load_model
+    from components.prediction.compiled_model import load_compiled_model, load_lite_model
+    
+    model = load_model(MODEL_PATH)
+    
+    if TFLITE_INFERENCE: 
+        model = load_lite_model(model, MODEL_PATH)
+    elif COMPILED_INFERENCE: 
+        model = load_compiled_model(model)
+    
+    # checked once here since the model does not change while running 
+    sampling = sampling_policy(model, MC_CHUNK_SIZE, MC_MAX_ITERATIONS, MC_TOLERANCE) if ADAPTIVE_SAMPLING else None
+    
+    return model, sampling
+
+def predict_stage(preprocessed, model_setup): 
+    model, sampling = model_setup
+    cache = PredictionCache(MODEL_PATH) if PREDICTION_CACHE else None
+    return make_predictions(*preprocessed, model, company_names, batched=BATCHED_PREDICTION, max_batch_size=MAX_BATCH_SIZE, cache=cache, sampling=sampling)
+
+def trade_stage(predictions): 
+    return execute_trades(predictions, ALPACA_KEY, ALPACA_SECRET, 
+                          ALPACA_ENDPOINT, company_tickers, company_names,
+                          RISK_TOLERANCE, DIVERSIFICATION, STOP_LOSS, 
+                          TAKE_PROFIT, TRAILING_STOP_LOSS, REBALANCE_THRESHOLD, 
+                          CONFIDENCE_THRESHOLD, MONEY_TO_INVEST)
+
 def main(): 
     try: 
         write_to_log(f"""===================
 Program started at: {datetime.datetime.now()}
 ===================""")
         
-        ### webscraping
-        get_news_data(company_names, PERIOD)
-        get_commodity_data(commodity_names)
-        get_historical_data(company_tickers, company_names, "1y") 
-        
-        # ### preprocessing 
-        json_to_csv() # turning all the json data files to csv for better processing  
-        price_data, news_data, commodity_1_data, commodity_2_data, commodity_3_data, name_data, rsi_data, macd_data, obv_data = preprocess_data(company_names, commodity_names, company_index, HISTORICAL_DAYS, TODAYS_DATE)
+        # the pipeline as a dependency graph, stages that do not depend on each other run at the same time 
+        # and every data type is converted to csv as soon as its scraping is done. news runs in its own 
+        # process since the sentiment analysis is cpu heavy 
+        stages = [
+            ### webscraping
+            stage("news", get_news_data, (company_names, PERIOD), {"content": NEWS_CONTENT}, mode="process"),
+            stage("commodity", get_commodity_data, (commodity_names,)),
+            stage("historical", get_historical_data, (company_tickers, company_names, "1y"), {"bulk": True, "chunk_size": HISTORICAL_CHUNK_SIZE}),
+            
+            ### preprocessing 
+            stage("news csv", json_to_csv_news, deps=["news"]),
+            stage("commodity csv", json_to_csv_commodity, deps=["commodity"]),
+            stage("historical csv", json_to_csv_historical, deps=["historical"]),
+            stage("preprocess", preprocess_data, (company_names, commodity_names, company_index, HISTORICAL_DAYS, TODAYS_DATE), 
+                  {"incremental": INCREMENTAL_PREPROCESSING}, deps=["news csv", "commodity csv", "historical csv"]),
+            
+            ### predicting, the model loads while the data is scraped 
+            stage("model", load_prediction_model),
+            stage("predict", predict_stage, deps=["preprocess", "model"], pass_results=True),
+            
+            ### executing trades 
+            stage("trade", trade_stage, deps=["predict"], pass_results=True),
+        ]
         
-        ### predicting 
-        predictions = make_predictions(price_data, news_data, commodity_1_data, commodity_2_data, commodity_3_data, name_data, rsi_data, macd_data, obv_data, model, company_names)
-                  
-        ### executing trades 
-        execute_trades(predictions, ALPACA_KEY, ALPACA_SECRET, 
-                            ALPACA_ENDPOINT, company_tickers, company_names,
-                            RISK_TOLERANCE, DIVERSIFICATION, STOP_LOSS, 
-                            TAKE_PROFIT, TRAILING_STOP_LOSS, REBALANCE_THRESHOLD, 
-                            CONFIDENCE_THRESHOLD, MONEY_TO_INVEST)
+        # the stages in threads can not draw their progress bars, the main thread does it while it waits 
+        run_stages(stages, tick=pump_progress_bars)
         
     except Exception as e:
         write_to_log(f"""------------------
@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from components.logging import log_writer
+
+@pytest.fixture(autouse=True, scope="session")
+def working_dir(tmp_path_factory):
+    # the logs and data the code writes with relative paths go to a temporary directory, not the project
+    directory = tmp_path_factory.mktemp("run")
+    previous = os.getcwd()
+    os.chdir(directory)
+
+    yield directory
+
+    # the log writers append in the background, they have to be done before going back
+    log_writer.close_all()
+    log_writer._writers.clear()
+    os.chdir(previous)
@@ -0,0 +1,51 @@
+from datetime import date
+
+import pytest
+
+from components.get_data.commodity_fetcher import NoDataError, parse_commodity_page
+
+# run from the project root with: python -m pytest -q tests
+
+END_DATE = date(2025, 3, 10)
+
+def price_table(price):
+    return f'<table class="table"><tbody><tr><td>Gold</td><td>{price:,.2f}</td></tr></tbody></table>'
+
+def chart_script(prices):
+    points = ", ".join(f"[{n}, {price}]" for n, price in enumerate(prices))
+    return f'<script>Highcharts.chart("chart", {{"series": [{{"name": "Gold", "type": "line", "data": [{points}]}}]}});</script>'
+
+def svg_chart(ys):
+    path = " ".join(f"{'M' if n == 0 else 'L'} {n * 10} {y}" for n, y in enumerate(ys))
+    return f'<svg><g class="highcharts-series highcharts-series-0 highcharts-line-series"><path d="{path}"></path></g></svg>'
+
+def test_script_series():
+    rows = parse_commodity_page(price_table(2010) + chart_script([1990, 2000, 2010]), END_DATE)
+
+    assert rows == [("2025-03-08", 1990.0), ("2025-03-09", 2000.0), ("2025-03-10", 2010.0)]
+
+def test_other_data_arrays_before_the_chart():
+    widget = '<script>var related = {"data": [[1, 5.5], [2, 6.1]]};</script>'
+    rows = parse_commodity_page(widget + price_table(2010) + chart_script([1990, 2000, 2010]), END_DATE)
+
+    assert [price for _, price in rows] == [1990.0, 2000.0, 2010.0]
+
+def test_mismatched_series_uses_the_svg():
+    html = price_table(2010) + chart_script([5.5, 6.1, 6.0]) + svg_chart([30, 20, 10])
+    rows = parse_commodity_page(html, END_DATE)
+
+    assert len(rows) == 3
+    assert rows[-1][1] == pytest.approx(2010)
+
+def test_mismatched_series_goes_to_the_browser():
+    # a ValueError is what sends the commodity to the browser, NoDataError would skip it
+    with pytest.raises(ValueError, match="does not match"):
+        parse_commodity_page(price_table(2010) + chart_script([5.5, 6.1, 6.0]), END_DATE)
+
+def test_series_without_latest_price():
+    with pytest.raises(ValueError):
+        parse_commodity_page(chart_script([1990, 2000, 2010]), END_DATE)
+
+def test_no_data():
+    with pytest.raises(NoDataError):
+        parse_commodity_page('<div class="noDataPlacehoder"></div>', END_DATE)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+keras = tf.keras
+
+from components.prediction import compiled_model
+from components.prediction.compiled_model import CompiledModel, load_compiled_model
+from components.prediction.prediction import probe_inputs
+
+# run from the project root with: python -m pytest -q tests
+
+def small_model(dropout=False):
+    # the same kind of inputs as assets/model.h5, series of (20, 1) and a (1,) value
+    series = [keras.Input(shape=(20, 1), name=f"series_{n}") for n in range(2)]
+    value = keras.Input(shape=(1,), name="value")
+
+    x = keras.layers.Concatenate()([keras.layers.LSTM(8)(s) for s in series] + [value])
+
+    if dropout:
+        # on when predicting too, like the monte carlo dropout of the real model
+        x = keras.layers.Dropout(0.3)(x, training=True)
+
+    return keras.Model(series + [value], keras.layers.Dense(1)(x))
+
+def test_compiled_model_matches_predict():
+    model = small_model()
+    X = probe_inputs(model, rows=32, seed=1)
+
+    assert np.allclose(CompiledModel(model).predict(X), model.predict(X, verbose=0), atol=1e-5)
+
+def test_compiled_model_batches():
+    model = small_model()
+    compiled = CompiledModel(model)
+    X = probe_inputs(model, rows=10, seed=2)
+
+    assert np.allclose(compiled.predict(X, batch_size=3), compiled.predict(X), atol=1e-6)
+
+def test_load_compiled_model_uses_compiled():
+    model = small_model()
+
+    assert isinstance(load_compiled_model(model), CompiledModel)
+
+def test_load_compiled_model_with_dropout():
+    model = small_model(dropout=True)
+
+    assert isinstance(load_compiled_model(model), CompiledModel)
+
+def test_load_compiled_model_falls_back_on_error(monkeypatch):
+    def fail(model):
+        raise RuntimeError("trace failed")
+
+    monkeypatch.setattr(compiled_model, "CompiledModel", fail)
+    model = small_model()
+
+    assert load_compiled_model(model) is model
+
+def test_load_compiled_model_falls_back_on_difference(monkeypatch):
+    monkeypatch.setattr(compiled_model, "check_accuracy", lambda model, other: 1.0)
+    model = small_model()
+
+    assert load_compiled_model(model) is model
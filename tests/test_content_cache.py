@@ -0,0 +1,17 @@
+from components.get_data.content_cache import canonical_url
+
+# run from the project root with: python -m pytest -q tests
+
+def test_canonical_url():
+    assert canonical_url(" HTTPS://Example.com:443/News/?utm_source=x&b=2&a=1#top ") == "https://example.com/News?a=1&b=2"
+    assert canonical_url("http://example.com:8080/a") == "http://example.com:8080/a"
+
+def test_google_redirect():
+    assert canonical_url("https://www.google.com/url?q=https://Example.com/a/&sa=U") == "https://example.com/a"
+
+def test_malformed_port():
+    assert canonical_url("http://example.com:abc/a ") == "http://example.com:abc/a"
+    assert canonical_url("http://example.com:99999/a") == "http://example.com:99999/a"
+
+def test_malformed_host():
+    assert canonical_url("http://[::1/a") == "http://[::1/a"
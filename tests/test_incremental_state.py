@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from components.preprocess.incremental_state import full_state, update_state, scaled_windows
+
+# the state carried from day to day against the state recomputed from the full history
+# run from the project root with: python -m pytest -q tests
+
+TAIL_LENGTH = 40
+HISTORICAL_DAYS = 20
+
+def history(seed, days=300):
+    rng = np.random.default_rng(seed)
+    price = (100 * np.cumprod(1 + rng.normal(0, 0.02, days))).tolist()
+    volume = rng.integers(0, 5_000_000, days).astype(float).tolist()
+    news = rng.uniform(-1, 1, days).tolist()
+
+    return price, volume, news
+
+def assert_same_state(state, expected):
+    for key in ["price_count", "news_count", "price_hash", "news_hash"]:
+        assert state[key] == expected[key]
+
+    for key in ["last_price", "ema_fast", "ema_slow", "ema_signal", "avg_gain", "avg_loss", "obv"]:
+        assert state[key] == pytest.approx(expected[key], rel=1e-9, abs=1e-9)
+
+    windows = scaled_windows(state, HISTORICAL_DAYS)
+    expected_windows = scaled_windows(expected, HISTORICAL_DAYS)
+
+    for name in windows:
+        assert np.allclose(windows[name], expected_windows[name], rtol=1e-7, atol=1e-7)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_daily_updates_match_full_recompute(seed):
+    price, volume, news = history(seed)
+    state = full_state(price[:200], volume[:200], news[:200], TAIL_LENGTH)
+
+    for day in range(201, len(price) + 1):
+        state, recomputed = update_state(state, price[:day], volume[:day], news[:day], TAIL_LENGTH)
+
+        assert not recomputed
+        assert_same_state(state, full_state(price[:day], volume[:day], news[:day], TAIL_LENGTH))
+
+def test_several_days_at_once():
+    price, volume, news = history(3)
+    state = full_state(price[:250], volume[:250], news[:250], TAIL_LENGTH)
+    state, recomputed = update_state(state, price, volume, news[:260], TAIL_LENGTH)
+
+    assert not recomputed
+    assert_same_state(state, full_state(price, volume, news[:260], TAIL_LENGTH))
+
+def test_date_going_backwards():
+    # a run for an earlier date than the last one has a shorter history than the state
+    price, volume, news = history(4)
+    state = full_state(price, volume, news, TAIL_LENGTH)
+    state, recomputed = update_state(state, price[:290], volume[:290], news[:290], TAIL_LENGTH)
+
+    assert recomputed
+    assert_same_state(state, full_state(price[:290], volume[:290], news[:290], TAIL_LENGTH))
+
+def test_date_going_backwards_with_new_rows():
+    # the same number of rows as the state, but the last days are from another date
+    price, volume, news = history(5)
+    state = full_state(price[:280], volume[:280], news[:280], TAIL_LENGTH)
+    other_price, other_volume, other_news = history(6, days=5)
+
+    price = price[:275] + other_price
+    volume = volume[:275] + other_volume
+    news = news[:275] + other_news
+
+    state, recomputed = update_state(state, price, volume, news, TAIL_LENGTH)
+
+    assert recomputed
+    assert_same_state(state, full_state(price, volume, news, TAIL_LENGTH))
+
+def test_revised_row_before_the_tail():
+    # a correction further back than the stored tail still recomputes the state
+    price, volume, news = history(7)
+    state = full_state(price[:280], volume[:280], news[:280], TAIL_LENGTH)
+
+    price = list(price)
+    price[10] *= 1.01
+
+    state, recomputed = update_state(state, price, volume, news, TAIL_LENGTH)
+
+    assert recomputed
+    assert_same_state(state, full_state(price, volume, news, TAIL_LENGTH))
+
+def test_state_without_hash_is_recomputed():
+    price, volume, news = history(8)
+    state = full_state(price[:280], volume[:280], news[:280], TAIL_LENGTH)
+    del state["price_hash"]
+
+    state, recomputed = update_state(state, price, volume, news, TAIL_LENGTH)
+
+    assert recomputed
+    assert_same_state(state, full_state(price, volume, news, TAIL_LENGTH))
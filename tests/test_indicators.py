@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+# preprocess_data imports the progress bar window
+pytest.importorskip("ttkthemes")
+pytest.importorskip("screeninfo")
+
+from components.preprocess.indicators import rsi_matrix, macd_matrix, obv_matrix, company_indicators
+from components.preprocess.preprocess_data import calculate_rsi, calculate_macd, calculate_obv
+
+# the array kernels against the loops in preprocess_data.py they replaced
+# run from the project root with: python -m pytest -q tests
+
+def random_series(seed, days=250):
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.02, days))
+    volume = rng.integers(0, 10_000_000, days).astype(float)
+
+    return prices.tolist(), volume.tolist()
+
+def assert_same(kernel, loop):
+    assert np.allclose(np.asarray(kernel), np.asarray(loop, dtype=float), rtol=1e-9, atol=1e-9)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_series(seed):
+    prices, volume = random_series(seed)
+
+    assert_same(rsi_matrix(prices)[0], calculate_rsi(prices))
+
+    for kernel, loop in zip(macd_matrix(prices), calculate_macd(prices)):
+        assert_same(kernel[0], loop)
+
+    assert_same(obv_matrix(prices, volume)[0], calculate_obv(prices, volume))
+
+def test_matrix_matches_rows():
+    series = [random_series(seed) for seed in range(4)]
+    prices = np.array([s[0] for s in series])
+    volume = np.array([s[1] for s in series])
+
+    rsi, (macd, _, _), obv = rsi_matrix(prices), macd_matrix(prices), obv_matrix(prices, volume)
+
+    for n, (p, v) in enumerate(series):
+        assert_same(rsi[n], calculate_rsi(p))
+        assert_same(macd[n], calculate_macd(p)[0])
+        assert_same(obv[n], calculate_obv(p, v))
+
+def test_flat_prices():
+    prices = [50.0] * 40
+    volume = [1000.0] * 40
+
+    # no losses gives an rsi of 100, like rs = inf in the loop
+    assert_same(rsi_matrix(prices)[0], calculate_rsi(prices))
+    assert_same(macd_matrix(prices)[0][0], calculate_macd(prices)[0])
+    assert_same(obv_matrix(prices, volume)[0], calculate_obv(prices, volume))
+
+def test_only_losses():
+    prices = list(np.linspace(100, 60, 30))
+
+    assert_same(rsi_matrix(prices)[0], calculate_rsi(prices))
+
+def test_exact_window():
+    prices, _ = random_series(7, days=15)
+
+    assert_same(rsi_matrix(prices)[0], calculate_rsi(prices))
+
+def test_too_few_days():
+    prices, volume = random_series(8, days=10)
+
+    with pytest.raises(ValueError):
+        calculate_rsi(prices)
+
+    with pytest.raises(ValueError):
+        rsi_matrix(prices)
+
+    # macd and obv have no minimum length
+    assert_same(macd_matrix(prices)[0][0], calculate_macd(prices)[0])
+    assert_same(obv_matrix(prices, volume)[0], calculate_obv(prices, volume))
+
+def test_zero_volume():
+    prices, _ = random_series(9)
+    volume = [0.0] * len(prices)
+
+    assert_same(obv_matrix(prices, volume)[0], calculate_obv(prices, volume))
+
+def test_mismatched_volume():
+    with pytest.raises(ValueError):
+        obv_matrix([1.0, 2.0, 3.0], [1.0, 2.0])
+
+def test_company_indicators():
+    historical = {f"company {n}": random_series(n, days=250 if n % 2 else 200) for n in range(6)}
+    historical["short"] = random_series(10, days=10)
+
+    results = company_indicators(historical)
+
+    for company, (prices, volume) in historical.items():
+        if company == "short":
+            assert isinstance(results[company], ValueError)
+            continue
+
+        rsi, macd, obv = results[company]
+
+        assert_same(rsi, calculate_rsi(prices))
+        assert_same(macd, calculate_macd(prices)[0])
+        assert_same(obv, calculate_obv(prices, volume))